@@ -5,14 +5,18 @@ Main application entry point for the Portfolio Analysis Tool.
 File: src/app.py
 """
 
+import logging
+
 import dash
 from dash import html, dcc, Input, Output, State, MATCH, ALL
 import dash_bootstrap_components as dbc
-from layouts import landing, portfolio_builder, portfolio_monitor
+from layouts import landing, portfolio_builder, portfolio_monitor, performance
 from components.header import create_header
 from components.navigation import create_navigation
 from callbacks.portfolio_builder_callbacks import init_portfolio_builder_callbacks
 from callbacks.portfolio_monitor_callbacks import init_portfolio_monitor_callbacks
+from callbacks.performance_callbacks import init_performance_callbacks
+from services.telemetry import instrument_dash_app
 
 print("Starting Portfolio Analysis Tool...")  # Debug log
 
@@ -26,6 +30,9 @@ app = dash.Dash(
     suppress_callback_exceptions=True
 )
 
+# Callback timings, payload sizes and the /metrics endpoint
+instrument_dash_app(app)
+
 # Main app layout
 app.layout = html.Div([
 
@@ -56,10 +63,11 @@ print("App layout created")  # Debug log
     Output('current-page', 'data'),
     [Input('nav-home', 'n_clicks'),
      Input('nav-portfolio-builder', 'n_clicks'),
-     Input('nav-portfolio-monitor', 'n_clicks')],
+     Input('nav-portfolio-monitor', 'n_clicks'),
+     Input('nav-performance', 'n_clicks')],
     State('current-page', 'data')
 )
-def handle_navigation(home_clicks, builder_clicks, monitor_clicks, current):
+def handle_navigation(home_clicks, builder_clicks, monitor_clicks, performance_clicks, current):
     """Handle navigation from sidebar."""
     print("Navigation callback triggered")  # Debug log
     ctx = dash.callback_context
@@ -74,7 +82,8 @@ def handle_navigation(home_clicks, builder_clicks, monitor_clicks, current):
     page_mapping = {
         'nav-home': 'landing',
         'nav-portfolio-builder': 'portfolio-builder',
-        'nav-portfolio-monitor': 'portfolio-monitor'
+        'nav-portfolio-monitor': 'portfolio-monitor',
+        'nav-performance': 'performance'
     }
     
     return page_mapping.get(button_id, current)
@@ -92,6 +101,8 @@ def display_page(page):
         return portfolio_builder.layout
     elif page == 'portfolio-monitor':
         return portfolio_monitor.layout
+    elif page == 'performance':
+        return performance.layout
     else:  # Default to landing page
         return landing.layout
 
@@ -122,10 +133,12 @@ print("Initializing callbacks...")  # Debug log
 # Initialize all callbacks
 init_portfolio_builder_callbacks(app)
 init_portfolio_monitor_callbacks(app)
+init_performance_callbacks(app)
 
 print("All callbacks initialized")  # Debug log
 
 # Run the app
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     print("Starting server...")  # Debug log
     app.run_server(debug=True)
\ No newline at end of file
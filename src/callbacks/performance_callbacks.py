@@ -0,0 +1,148 @@
+"""
+Callbacks for the Performance view.
+File: src/callbacks/performance_callbacks.py
+"""
+
+from dash import Input, Output
+import plotly.graph_objects as go
+import logging
+from layouts.performance import create_callback_table
+from services.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_PHASES = ["queue", "send", "first_event", "last_event", "decode"]
+
+PHASE_LABELS = {
+    "queue": "Queue",
+    "send": "Send",
+    "first_event": "First Event",
+    "last_event": "Last Event",
+    "decode": "Decode",
+}
+
+def _chart_layout(fig, **kwargs):
+    """Apply the dashboard's chart styling."""
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=20, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#ffffff"),
+        legend=dict(orientation="h", y=-0.2),
+        **kwargs
+    )
+    return fig
+
+def create_phase_figure(histogram):
+    """Create grouped bars of p50 and p95 request latency per phase."""
+    operations = sorted({dict(key).get("operation") for key in histogram.series()})
+    fig = go.Figure()
+    for operation in operations:
+        for q, opacity in ((0.5, 1.0), (0.95, 0.5)):
+            values = [histogram.quantile(q, operation=operation, phase=phase) for phase in REQUEST_PHASES]
+            fig.add_trace(go.Bar(
+                name=f"{operation} p{int(q * 100)}",
+                x=[PHASE_LABELS[phase] for phase in REQUEST_PHASES],
+                y=[value * 1000 if value is not None else None for value in values],
+                opacity=opacity
+            ))
+    return _chart_layout(fig, barmode="group", yaxis_title="ms")
+
+def create_latency_histogram(histogram, phase="last_event"):
+    """Create a bar chart of request counts per latency bucket."""
+    labels = [f"≤{bound * 1000:g}ms" if bound < 1 else f"≤{bound:g}s" for bound in histogram.buckets]
+    labels.append(f">{histogram.buckets[-1]:g}s")
+    fig = go.Figure()
+    for key, series in sorted(histogram.series().items()):
+        key = dict(key)
+        if key.get("phase") != phase:
+            continue
+        fig.add_trace(go.Bar(name=key.get("operation"), x=labels, y=series["buckets"]))
+    return _chart_layout(fig, barmode="stack", yaxis_title="Requests")
+
+def create_usage_figure(hits, requests):
+    """Create bars of API hits and requests per request type."""
+    operations = sorted({dict(key).get("operation") for key in list(hits.values()) + list(requests.values())})
+    fig = go.Figure([
+        go.Bar(name="Hits", x=operations, y=[hits.total(operation=op) for op in operations]),
+        go.Bar(name="Requests", x=operations, y=[requests.total(operation=op) for op in operations]),
+    ])
+    return _chart_layout(fig, barmode="group")
+
+def create_cache_figure(cache_requests):
+    """Create stacked bars of cache lookups by result."""
+    caches = sorted({dict(key).get("cache") for key in cache_requests.values()})
+    results = sorted({dict(key).get("result") for key in cache_requests.values()})
+    colors = {"hit": "#00bc8c", "miss": "#e74c3c", "stale": "#f39c12"}
+    fig = go.Figure([
+        go.Bar(
+            name=result.title(), x=caches,
+            y=[cache_requests.total(cache=cache, result=result) for cache in caches],
+            marker_color=colors.get(result)
+        ) for result in results
+    ])
+    return _chart_layout(fig, barmode="stack")
+
+def summarize_callbacks(seconds, payload_bytes, errors):
+    """Return one row of timings and payload sizes per callback, slowest first."""
+    payloads = {dict(key).get("callback"): series for key, series in payload_bytes.series().items()}
+    rows = []
+    for key, series in seconds.series().items():
+        callback = dict(key).get("callback")
+        payload = payloads.get(callback)
+        rows.append({
+            "callback": callback,
+            "calls": series["count"],
+            "p50_ms": (seconds.quantile(0.5, callback=callback) or 0) * 1000,
+            "p95_ms": (seconds.quantile(0.95, callback=callback) or 0) * 1000,
+            "avg_kb": payload["sum"] / payload["count"] / 1024 if payload and payload["count"] else 0,
+            "errors": int(errors.total(callback=callback)),
+        })
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+def init_performance_callbacks(app):
+    """Initialize callbacks for the performance view."""
+    logger.debug("Initializing performance callbacks")
+    
+    @app.callback(
+        [Output("perf-requests", "children"),
+         Output("perf-hits", "children"),
+         Output("perf-cache-hit-rate", "children"),
+         Output("perf-callback-p95", "children"),
+         Output("perf-phase-chart", "figure"),
+         Output("perf-latency-histogram", "figure"),
+         Output("perf-usage-chart", "figure"),
+         Output("perf-cache-chart", "figure"),
+         Output("perf-callback-table", "children")],
+        Input("performance-interval", "n_intervals")
+    )
+    def update_performance(n_intervals):
+        """Read the metrics registry into the dashboard."""
+        telemetry = get_telemetry()
+        request_seconds = telemetry.histogram("pf_bloomberg_request_seconds")
+        requests = telemetry.counter("pf_bloomberg_requests_total")
+        hits = telemetry.counter("pf_bloomberg_hits_total")
+        cache_requests = telemetry.counter("pf_cache_requests_total")
+        callback_seconds = telemetry.histogram("pf_callback_seconds")
+        
+        lookups = cache_requests.total()
+        hit_rate = f"{cache_requests.total(result='hit') / lookups:.1%}" if lookups else "-"
+        
+        rows = summarize_callbacks(
+            callback_seconds,
+            telemetry.histogram("pf_callback_response_bytes"),
+            telemetry.counter("pf_callback_errors_total")
+        )
+        slowest = f"{rows[0]['p95_ms']:,.0f} ms" if rows else "-"
+        
+        return (
+            f"{requests.total():,.0f}",
+            f"{hits.total():,.0f}",
+            hit_rate,
+            slowest,
+            create_phase_figure(request_seconds),
+            create_latency_histogram(request_seconds),
+            create_usage_figure(hits, requests),
+            create_cache_figure(cache_requests),
+            create_callback_table(rows),
+        )
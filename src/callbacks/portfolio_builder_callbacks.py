@@ -6,13 +6,175 @@ Callbacks for the Portfolio Builder.
 File: src/callbacks/portfolio_builder_callbacks.py
 """
 
-from dash import html, Input, Output, State, ALL, MATCH, callback_context
+from dash import html, Input, Output, State, ALL, MATCH, Patch, callback_context, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 import json
 import logging
+import threading
+from collections import OrderedDict
+from components.portfolio.charts import (
+    create_performance_figure, create_rolling_figure, parse_relayout_range, performance_trace_data
+)
+from utils.calculations import RISK_FREE_RATE, calculate_metrics, calculate_rolling
+from utils.formatters import format_percent, format_ratio
 logger = logging.getLogger(__name__)
 
+# Rolling analytics are kept for this many recent portfolio jobs, so that
+# switching the metric or window only redraws the chart
+ROLLING_CACHE_JOBS = 8
+_rolling_analytics = OrderedDict()
+_rolling_lock = threading.Lock()
+
+def job_rolling_analytics(job):
+    """
+    Rolling analytics of a finished portfolio job for every window.
+    
+    Computed on first use and kept with the job ID, since a job's data
+    does not change once it has finished.
+    
+    Args:
+        job: Finished Job whose result holds the security data and portfolio
+        
+    Returns:
+        Dict of RollingAnalytics by window length
+    """
+    with _rolling_lock:
+        analytics = _rolling_analytics.get(job.id)
+        if analytics is not None:
+            _rolling_analytics.move_to_end(job.id)
+            return analytics
+    
+    securities = {k: v for k, v in job.result.items() if k != 'portfolio'}
+    analytics = calculate_rolling(securities, job.result.get('portfolio'))
+    with _rolling_lock:
+        _rolling_analytics[job.id] = analytics
+        while len(_rolling_analytics) > ROLLING_CACHE_JOBS:
+            _rolling_analytics.popitem(last=False)
+    return analytics
+
+def load_instruments(handle):
+    """
+    Selected instruments of a session.
+    
+    The selected-instruments store holds a session store handle rather
+    than the list itself, so it costs a few bytes per request.
+    
+    Args:
+        handle: Data of the selected-instruments store
+        
+    Returns:
+        List of instrument dicts, empty if none are selected or the entry expired
+    """
+    from services.session_store import get_session_store
+    return get_session_store().get(handle, [])
+
+def fetch_portfolio_data(job, securities, weights, start_date, end_date, currency, rebalance):
+    """
+    Background job downloading historical data and calculating the portfolio.
+    
+    Args:
+        job: The running Job, used for progress reporting and cancellation
+        securities: List of security identifiers
+        weights: Dictionary mapping securities to their weights (in percent)
+        start_date: Start date in YYYYMMDD format
+        end_date: End date in YYYYMMDD format
+        currency: Base currency for the data
+        rebalance: Portfolio rebalancing frequency
+        
+    Returns:
+        Dict with security data and the calculated portfolio
+    """
+    from services.bloomberg_client import get_bloomberg_client
+    client = get_bloomberg_client()
+    
+    # Cached data can still be served if the connection fails
+    if not client.is_connected:
+        client.connect()
+    
+    job.report_progress(0, len(securities), "Downloading historical data...")
+    data = client.get_historical_data(
+        securities=securities,
+        weights=weights,
+        start_date=start_date,
+        end_date=end_date,
+        currency=currency,
+        rebalance=rebalance,
+        progress_callback=job.report_progress,
+        cancel_event=job.cancel_event
+    )
+    job.check_cancelled()
+    
+    logger.info(f"Retrieved data for {len(data)} securities")
+    return data
+
+def create_job_status(completed, total):
+    """Create the progress display for a running portfolio job."""
+    return html.Div([
+        html.Div([
+            dbc.Spinner(
+                size="sm", 
+                color="primary",
+                spinner_class_name="me-2"
+            ),
+            f"Downloading historical data... ({completed}/{total} securities)"
+        ], className="text-primary mb-2"),
+        dbc.Progress(
+            value=100 * completed / total if total else 0,
+            striped=True,
+            animated=True,
+            style={"height": "6px"}
+        )
+    ])
+
+METRIC_COLUMNS = [
+    ("annualized_return", "Return", format_percent),
+    ("volatility", "Vol", format_percent),
+    ("sharpe_ratio", "Sharpe", format_ratio),
+    ("max_drawdown", "Max DD", format_percent),
+]
+
+def create_metrics_table(data):
+    """Create the collapsible performance metrics table from historical data."""
+    securities = {k: v for k, v in data.items() if k != 'portfolio'}
+    metrics = calculate_metrics(securities, data.get('portfolio'))
+    periods = list(metrics.columns.get_level_values("period").unique())
+    
+    header = html.Thead([
+        html.Tr([html.Th("Instrument", rowSpan=2)] + [
+            html.Th(period, colSpan=len(METRIC_COLUMNS), className="text-center")
+            for period in periods
+        ]),
+        html.Tr([
+            html.Th(label, className="text-end")
+            for _ in periods for _, label, _ in METRIC_COLUMNS
+        ])
+    ])
+    rows = []
+    for name, values in metrics.iterrows():
+        cells = [html.Td(name, className="fw-bold" if name == "Portfolio" else None)]
+        for period in periods:
+            for metric, _, formatter in METRIC_COLUMNS:
+                cells.append(html.Td(formatter(values[(period, metric)]), className="text-end"))
+        rows.append(html.Tr(cells))
+    
+    return html.Details([
+        html.Summary("Performance Metrics", className="h6 mt-3"),
+        dbc.Table(
+            [header, html.Tbody(rows)],
+            bordered=False,
+            hover=True,
+            responsive=True,
+            size="sm",
+            className="mt-2"
+        ),
+        html.Small(
+            f"Sharpe ratio uses a {RISK_FREE_RATE:.1%} risk-free rate. YTD returns are not annualized.",
+            className="text-muted"
+        )
+    ], open=True)
+
 def init_portfolio_builder_callbacks(app):
     """Initialize all callbacks for the portfolio builder."""
     
@@ -22,28 +184,31 @@ def init_portfolio_builder_callbacks(app):
          Input("search-input", "n_submit")],  # Trigger on Enter key
         [State("selected-instruments", "data")]
     )
-    def update_search_results(search_term, n_submit, selected_instruments):
+    def update_search_results(search_term, n_submit, selected_handle):
         """Update search results based on input."""
-        print(f"Search triggered with term: {search_term}")  # Debug log
+        logger.debug(f"Search triggered with term: {search_term}")
         
         if not search_term or len(search_term) < 3:  # Require at least 3 characters
             return []
             
         # Convert selected instruments to a set of tickers for easy lookup
-        selected_tickers = {inst["ticker"] for inst in (selected_instruments or [])}
+        selected_tickers = {inst["ticker"] for inst in load_instruments(selected_handle)}
         
         # Get Bloomberg client and search
         from services.bloomberg_client import get_bloomberg_client
         client = get_bloomberg_client()
         
-        # Ensure connection
-        if not client.is_connected and not client.connect():
-            return html.Div("Bloomberg connection failed", className="text-danger p-3")
+        # Ensure connection; cached searches are still answered without one
+        if not client.is_connected:
+            client.connect()
             
         try:
             # Search for instruments
             results = client.search_securities(search_term)
-            print(f"Found {len(results)} results")  # Debug log
+            logger.debug(f"Found {len(results)} results")
+            
+            if not results and not client.is_connected:
+                return html.Div("Bloomberg connection failed", className="text-danger p-3")
             
             if not results:
                 return html.Div(
@@ -86,7 +251,7 @@ def init_portfolio_builder_callbacks(app):
             ], className="mt-3")
             
         except Exception as e:
-            print(f"Error during search: {str(e)}")  # Debug log
+            logger.error(f"Error during search: {str(e)}")
             return html.Div(
                 f"Error performing search: {str(e)}", 
                 className="text-danger p-3"
@@ -95,21 +260,26 @@ def init_portfolio_builder_callbacks(app):
 
     
     @app.callback(
-    [Output("performance-chart", "figure"),
+    [Output("portfolio-job", "data"),
+     Output("portfolio-job-poll", "disabled"),
+     Output("cancel-portfolio-btn", "disabled"),
      Output("portfolio-status-message", "children")],
     [Input("generate-portfolio-btn", "n_clicks")],
     [State("selected-instruments", "data"),
      State("base-currency", "value"),
-     State("time-range", "value")],
+     State("time-range", "value"),
+     State("rebalance-frequency", "value")],
     prevent_initial_call=True)
     
-    def generate_portfolio(n_clicks, instruments, currency, time_range):
-        """Generate portfolio analysis when button is clicked."""
+    def generate_portfolio(n_clicks, selected_handle, currency, time_range, rebalance):
+        """Start a background job generating the portfolio analysis."""
         if not n_clicks:  # Button hasn't been clicked
-            return go.Figure(), ""
+            return None, True, True, ""
             
+        instruments = load_instruments(selected_handle)
+
         if not instruments:
-            return go.Figure(), html.Div(
+            return None, True, True, html.Div(
                 "Please select securities before generating portfolio analysis.",
                 className="text-warning"
             )
@@ -117,7 +287,7 @@ def init_portfolio_builder_callbacks(app):
         # Check if weights sum to 100%
         total_weight = sum(float(inst.get("weight", 0) or 0) for inst in instruments)
         if abs(total_weight - 100) > 0.01:
-            return go.Figure(), html.Div(
+            return None, True, True, html.Div(
                 "Portfolio weights must sum to 100% before generating analysis.",
                 className="text-danger"
             )
@@ -145,95 +315,130 @@ def init_portfolio_builder_callbacks(app):
         securities = [inst["ticker"] for inst in instruments]
         weights = {inst["ticker"]: float(inst.get("weight", 0)) for inst in instruments}
         
-        try:
-            # Show loading message
-            status = html.Div([
-                dbc.Spinner(
-                    size="sm", 
-                    color="primary",
-                    spinner_class_name="me-2"  # Changed from className to spinner_class_name
-                ),
-                "Downloading historical data..."
-            ], className="text-primary")
-            
-            # Get Bloomberg client
-            from services.bloomberg_client import get_bloomberg_client
-            client = get_bloomberg_client()
-            
-            data = client.get_historical_data(
-            securities=securities,
-            weights=weights,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            currency=currency
-            )
-            
-            print(f"Retrieved data for {len(data)} securities")
-            if 'portfolio' in data:
-                print(f"Portfolio data shape: {data['portfolio'].shape}")
-            else:
-                print("No portfolio data generated")
+        from services.job_manager import get_job_manager
+        job_id = get_job_manager().submit(
+            fetch_portfolio_data,
+            securities, weights, start_date_str, end_date_str, currency, rebalance or "none",
+            description=f"Portfolio of {len(securities)} securities ({time_range}, {currency})"
+        )
+        
+        job = {"id": job_id, "securities": securities, "weights": weights, "currency": currency}
+        return job, False, False, create_job_status(0, len(securities))
 
-            # Check for valid data
-            if not data:
-                return go.Figure(), html.Div(
-                    "No data available for the selected securities.",
-                    className="text-warning"
-                )
-            
-            # Create figure
-            fig = go.Figure()
-            
-            # Add individual security traces
-            for security in securities:
-                if security in data:
-                    df = data[security]
-                    fig.add_trace(go.Scatter(
-                        x=df.index,
-                        y=df['value'],
-                        name=f"{security} ({weights[security]}%)",
-                        mode='lines',
-                        opacity=0.7
-                    ))
-            
-            # Add portfolio trace if available
-            if 'portfolio' in data:
-                portfolio_df = data['portfolio']
-                fig.add_trace(go.Scatter(
-                    x=portfolio_df.index,
-                    y=portfolio_df['portfolio_value'],
-                    name='Portfolio Total',
-                    mode='lines',
-                    line=dict(width=3, color='yellow'),
-                ))
-            
-            # Update layout
-            fig.update_layout(
-                title="Portfolio Performance",
-                xaxis_title="Date",
-                yaxis_title=f"Total Return Index ({currency})",
-                hovermode='x unified',
-                showlegend=True,
-                template="plotly_dark",
-                height=500
+    @app.callback(
+    [Output("performance-chart", "figure"),
+     Output("metrics-table", "children"),
+     Output("portfolio-status-message", "children", allow_duplicate=True),
+     Output("portfolio-job-poll", "disabled", allow_duplicate=True),
+     Output("cancel-portfolio-btn", "disabled", allow_duplicate=True)],
+    [Input("portfolio-job-poll", "n_intervals")],
+    [State("portfolio-job", "data")],
+    prevent_initial_call=True)
+    
+    def poll_portfolio_job(n_intervals, job_info):
+        """Report progress of the portfolio job and render its result."""
+        from services.job_manager import Job, get_job_manager
+        job = get_job_manager().get((job_info or {}).get("id"))
+        
+        if job is None:
+            return no_update, no_update, html.Div(
+                "Portfolio generation job not found.",
+                className="text-warning"
+            ), True, True
+        
+        if not job.is_finished:
+            return no_update, no_update, create_job_status(job.completed, job.total or len(job_info["securities"])), False, False
+        
+        if job.status == Job.CANCELLED:
+            return go.Figure(), None, html.Div(
+                "Portfolio generation cancelled.",
+                className="text-muted"
+            ), True, True
+        
+        if job.status == Job.FAILED:
+            return go.Figure(), None, html.Div(
+                f"Error generating portfolio: {job.error}",
+                className="text-danger"
+            ), True, True
+        
+        data = job.result
+        if not data:
+            return go.Figure(), None, html.Div(
+                "No data available for the selected securities.",
+                className="text-warning"
+            ), True, True
+        
+        try:
+            fig = create_performance_figure(
+                data, job_info["securities"], job_info["weights"], job_info["currency"]
             )
-            
-            # Add range selector and slider
-            fig.update_xaxes(rangeslider_visible=True)
-            
+            metrics_table = create_metrics_table(data)
             success_message = html.Div(
                 "Portfolio analysis generated successfully!",
                 className="text-success"
             )
-            
-            return fig, success_message
+            return fig, metrics_table, success_message, True, True
                 
         except Exception as e:
-            print(f"Error generating portfolio: {str(e)}")
-            return go.Figure(), html.Div(
+            logger.error(f"Error generating portfolio: {str(e)}")
+            return go.Figure(), None, html.Div(
                 f"Error generating portfolio: {str(e)}",
                 className="text-danger"
-            )
+            ), True, True
+
+    @app.callback(
+    Output("performance-chart", "figure", allow_duplicate=True),
+    [Input("performance-chart", "relayoutData")],
+    [State("portfolio-job", "data")],
+    prevent_initial_call=True)
+    
+    def zoom_performance_chart(relayout_data, job_info):
+        """Resample the performance chart at full resolution for the visible range."""
+        from services.job_manager import Job, get_job_manager
+        x_range = parse_relayout_range(relayout_data)
+        job = get_job_manager().get((job_info or {}).get("id"))
+        if x_range is False or job is None or job.status != Job.DONE or not job.result:
+            return no_update
+        
+        # Only the trace data changes, so the layout and zoom state stay put
+        patched = Patch()
+        for i, (x, y) in enumerate(performance_trace_data(job.result, job_info["securities"], x_range)):
+            patched["data"][i]["x"] = x
+            patched["data"][i]["y"] = y
+        return patched
+
+    @app.callback(
+    Output("rolling-chart", "figure"),
+    [Input("rolling-metric", "value"),
+     Input("rolling-window", "value"),
+     Input("portfolio-job-poll", "disabled")],
+    [State("portfolio-job", "data")],
+    prevent_initial_call=True)
+    
+    def update_rolling_chart(metric, window, poll_disabled, job_info):
+        """Chart rolling analytics of the finished portfolio job."""
+        from services.job_manager import Job, get_job_manager
+        job = get_job_manager().get((job_info or {}).get("id"))
+        if job is None or job.status != Job.DONE or not job.result:
+            return go.Figure()
+        
+        try:
+            return create_rolling_figure(job_rolling_analytics(job)[window], metric)
+        except Exception as e:
+            logger.error(f"Error calculating rolling analytics: {str(e)}")
+            return go.Figure()
+
+    @app.callback(
+    Output("cancel-portfolio-btn", "disabled", allow_duplicate=True),
+    [Input("cancel-portfolio-btn", "n_clicks")],
+    [State("portfolio-job", "data")],
+    prevent_initial_call=True)
+    
+    def cancel_portfolio(n_clicks, job_info):
+        """Request cancellation of the running portfolio job."""
+        from services.job_manager import get_job_manager
+        get_job_manager().cancel((job_info or {}).get("id"))
+        return True
         
     def update_performance_chart(instruments, currency, time_range):
         """Update the performance chart based on selected portfolio."""
@@ -325,13 +530,52 @@ def init_portfolio_builder_callbacks(app):
             logger.error(f"Error updating chart: {str(e)}")
             return go.Figure()
 
+    @app.callback(
+        Output("save-portfolio-status", "children"),
+        Input("save-portfolio-btn", "n_clicks"),
+        [State("portfolio-name", "value"),
+         State("selected-instruments", "data"),
+         State("base-currency", "value"),
+         State("rebalance-frequency", "value")],
+        prevent_initial_call=True
+    )
+    def save_portfolio(n_clicks, name, selected_handle, currency, rebalance):
+        """Save the selected instruments and configuration as a named portfolio."""
+        if not n_clicks:
+            raise PreventUpdate
+        instruments = load_instruments(selected_handle)
+        name = (name or "").strip()
+        if not name:
+            return html.Div("Please enter a portfolio name.", className="text-warning")
+        if not instruments:
+            return html.Div("Please select securities before saving.", className="text-warning")
+        
+        from services.portfolio_service import get_portfolio_service
+        try:
+            portfolio_id = get_portfolio_service().save_portfolio(
+                name,
+                [dict(instrument, type=instrument.get("security_type")) for instrument in instruments],
+                base_currency=currency or "USD",
+                rebalance=rebalance or "none"
+            )
+        except Exception as e:
+            logger.error(f"Error saving portfolio: {str(e)}")
+            return html.Div(f"Could not save portfolio: {str(e)}", className="text-danger")
+        
+        logger.info(f"Saved portfolio {name} ({portfolio_id})")
+        return html.Div([
+            html.I(className="fas fa-check-circle me-2"),
+            f"Saved '{name}' with {len(instruments)} instruments."
+        ], className="text-success")
+
     # Add callback for allocation warning
     @app.callback(
         Output("allocation-alert", "color"),
         [Input("selected-instruments", "data")]
     )
-    def update_allocation_alert(instruments):
+    def update_allocation_alert(selected_handle):
         """Update allocation alert color based on total allocation."""
+        instruments = load_instruments(selected_handle)
         if not instruments:
             return "primary"
             
@@ -349,33 +593,30 @@ def init_portfolio_builder_callbacks(app):
         [State("selected-instruments", "data"),
          State({"type": "add-instrument", "index": ALL}, "id")]
     )
-    def update_selected_instruments(add_clicks, remove_clicks, weights, current_instruments, add_ids):
+    def update_selected_instruments(add_clicks, remove_clicks, weights, selected_handle, add_ids):
         """Handle adding and removing instruments and updating weights."""
         ctx = callback_context
         if not ctx.triggered:
-            return current_instruments or [], False
+            return no_update, False
             
         triggered_id = ctx.triggered[0]["prop_id"]
-        current_instruments = current_instruments or []
+        # Stored instruments are shared with other callbacks, so edit copies
+        selected = load_instruments(selected_handle)
+        current_instruments = [dict(inst) for inst in selected]
         
         if "add-instrument" in triggered_id:
             button_idx = next((i for i, clicks in enumerate(add_clicks) if clicks), None)
             if button_idx is not None:
                 ticker = add_ids[button_idx]["index"]
                 if not any(inst["ticker"] == ticker for inst in current_instruments):
-                    # Get Bloomberg client to fetch instrument details
+                    # Instrument details come from the search results cache
                     from services.bloomberg_client import get_bloomberg_client
                     client = get_bloomberg_client()
-                    results = client.search_securities(ticker)
+                    instrument = client.get_instrument(ticker)
                     
-                    if results:
-                        instrument = next(
-                            (r for r in results if r["ticker"] == ticker), 
-                            None
-                        )
-                        if instrument:
-                            instrument["weight"] = 0  # Initialize weight
-                            current_instruments.append(instrument)
+                    if instrument:
+                        instrument["weight"] = 0  # Initialize weight
+                        current_instruments.append(instrument)
                 
         elif "remove-instrument" in triggered_id:
             ticker = json.loads(triggered_id.split(".")[0])["index"]
@@ -398,15 +639,22 @@ def init_portfolio_builder_callbacks(app):
                          for inst in current_instruments)
         warning = abs(total_weight - 100) > 0.01  # Allow for small floating point differences
         
-        return current_instruments, warning
+        # Re-rendered weight inputs report their unchanged values; leaving the
+        # store alone then avoids another round of callbacks
+        if current_instruments == selected and selected_handle:
+            return no_update, warning
+        
+        from services.session_store import get_session_store
+        return get_session_store().put(current_instruments, selected_handle), warning
 
     @app.callback(
         [Output("selected-instruments-display", "children"),
          Output("total-allocation", "children")],
         [Input("selected-instruments", "data")]
     )
-    def update_selected_instruments_display(instruments):
+    def update_selected_instruments_display(selected_handle):
         """Update the display of selected instruments and total allocation."""
+        instruments = load_instruments(selected_handle)
         if not instruments:
             return html.Div(
                 "No instruments selected", 
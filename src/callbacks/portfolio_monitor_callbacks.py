@@ -3,208 +3,677 @@ Callbacks for the Portfolio Monitor view.
 File: src/callbacks/portfolio_monitor_callbacks.py
 """
 
-from dash import html, Input, Output, State, callback_context
-from layouts.portfolio_monitor import create_portfolio_summary, create_holdings_table, create_allocation_charts
-import plotly.graph_objects as go
+from dash import html, Input, Output, State, Patch, callback_context, no_update
+from dash.exceptions import PreventUpdate
+from layouts.portfolio_monitor import (
+    LIVE_COLUMNS, holdings_table_rows, create_trade_details, change_children, format_return, format_price
+)
 import plotly.express as px
 from datetime import datetime, timedelta
-import numpy as np
+import logging
+import threading
+from services.fx_engine import split_currency
+from services.reference_cache import get_reference_cache
+from utils.exposures import LOOKTHROUGH_FIELDS, ExposureEngine
 
-def generate_mock_portfolio_data(portfolio_id):
-    """Generate mock portfolio data for development."""
-    print(f"Generating mock data for portfolio: {portfolio_id}")  # Debug log
+logger = logging.getLogger(__name__)
+
+ALLOCATION_TITLES = {
+    "sector": "Sector Allocation",
+    "asset_class": "Asset Class Allocation",
+    "currency": "Currency Exposure",
+    "region": "Geographic Distribution",
+}
+
+# Days of valuations shown in the summary sparkline
+SPARKLINE_DAYS = 365
+
+# Exposure engine for the most recent holdings and reference data version
+_exposure_engine = {"key": None, "engine": None}
+
+# Look-through refresh job in flight per security, so repeated updates do
+# not queue the same refresh again
+_reference_refreshes = {}
+_reference_refresh_lock = threading.Lock()
+
+def update_valuations(portfolio_id):
+    """
+    Bring the stored daily valuations of a portfolio up to date.
+    
+    Only days after the last stored valuation are valued; without a
+    Bloomberg connection the stored valuations are used as they are.
+    """
+    from services.bloomberg_client import get_bloomberg_client
+    from services.valuation_service import get_valuation_service
+    client = get_bloomberg_client()
     
-    # Generate mock historical data
-    dates = [(datetime.now() - timedelta(days=x)).strftime('%Y-%m-%d') 
-            for x in range(30, 0, -1)]
-    base_value = 1000000
-    values = [base_value * (1 + np.random.normal(0, 0.02)) 
-             for _ in range(len(dates))]
+    # Cached prices can still be served if the connection fails
+    if not client.is_connected:
+        client.connect()
+    days = get_valuation_service().update(portfolio_id)
+    logger.info(f"Valued portfolio {portfolio_id} on {days} new days")
+
+def build_portfolio_data(portfolio, holdings):
+    """
+    Summary data of a portfolio from its stored valuations and current holdings.
     
+    The total value and P&L are those of the holdings, so they move with
+    live prices; the day change, returns and sparkline come from the daily
+    valuations.
+    """
+    from services.valuation_service import get_valuation_service
+    service = get_valuation_service()
+    history = service.history(portfolio["id"], datetime.now() - timedelta(days=SPARKLINE_DAYS))
+    performance = service.performance(portfolio["id"])
+    
+    total_value = sum(holding["market_value"] for holding in holdings)
+    invested = performance.get("invested", sum(holding.get("cost_basis", 0) for holding in holdings))
     portfolio_data = {
-        "id": portfolio_id,
-        "name": f"{portfolio_id.title()} Portfolio",
-        "total_value": values[-1],
-        "day_change": ((values[-1] / values[-2]) - 1) * 100,
-        "total_pnl": values[-1] - base_value,
-        "history_dates": dates,
-        "history_values": values
+        "id": portfolio["id"],
+        "name": portfolio["name"],
+        "total_value": total_value,
+        "day_change": performance.get("day_return", 0.0) * 100,
+        "total_pnl": total_value - invested,
+        "twr": performance["twr"] * 100 if performance else None,
+        "mwr": performance["mwr"] * 100 if performance.get("mwr") is not None else None,
+        "history_dates": history.index.strftime('%Y-%m-%d').tolist(),
+        "history_values": history["market_value"].tolist()
     }
     
-    print(f"Generated portfolio data: {portfolio_data['name']}")  # Debug log
+    logger.debug(f"Built portfolio data: {portfolio_data['name']}, {len(history)} days")
     return portfolio_data
 
-def generate_mock_holdings():
-    """Generate mock holdings data for development."""
-    print("Generating mock holdings data")  # Debug log
-    
-    holdings = [
-        {
-            "ticker": "AAPL US Equity",
-            "name": "Apple Inc",
-            "quantity": 1000,
-            "avg_cost": 150.00,
-            "current_price": 175.50,
-            "market_value": 175500.00,
-            "pnl_local": 25500.00,
-            "pnl_usd": 25500.00,
-            "pnl_percent": 17.00,
-            "weight": 15.5,
-            "sector": "Technology",
-            "region": "North America"
-        },
-        {
-            "ticker": "MSFT US Equity",
-            "name": "Microsoft Corp",
-            "quantity": 800,
-            "avg_cost": 200.00,
-            "current_price": 235.75,
-            "market_value": 188600.00,
-            "pnl_local": 28600.00,
-            "pnl_usd": 28600.00,
-            "pnl_percent": 14.30,
-            "weight": 16.8,
-            "sector": "Technology",
-            "region": "North America"
-        }
-    ]
+def build_holdings(portfolio, engine, method="average"):
+    """
+    Holdings of a portfolio from the positions of its trade ledger.
+    
+    Positions are valued at their latest stored price snapshot, or at the
+    price and FX rate of their last trade, until FX rates and live prices
+    are applied.
     
-    print(f"Generated {len(holdings)} holdings")  # Debug log
+    Args:
+        portfolio: Portfolio with its constituents
+        engine: PositionEngine of the portfolio
+        method: Cost basis method, 'average' or 'fifo'
+    """
+    from services.portfolio_service import get_portfolio_service
+    tickers = [position.ticker for position in engine.positions(open_only=True)]
+    snapshots = get_portfolio_service().latest_prices(tickers)
+    frame = engine.valuation(
+        {ticker: snapshot["price"] for ticker, snapshot in snapshots.items()},
+        {s["currency"]: s["fx_rate"] for s in snapshots.values() if s.get("currency") and s.get("fx_rate")},
+        method=method
+    )
+    
+    constituents = {c["ticker"]: c for c in portfolio.get("constituents", [])}
+    holdings = []
+    for ticker, values in zip(frame.index, frame.to_dict("records")):
+        constituent = constituents.get(ticker, {})
+        holdings.append({
+            "ticker": ticker,
+            "name": constituent.get("name") or ticker,
+            **values,
+            "asset_class": constituent.get("type"),
+        })
+    logger.debug(f"Built {len(holdings)} holdings from {engine.trade_count} trades")
     return holdings
 
+def reweight_holdings(holdings):
+    """Set the weights of holdings from their current market values."""
+    total = sum(abs(holding["market_value"]) for holding in holdings)
+    return [
+        dict(holding, weight=holding["market_value"] / total * 100 if total else 0.0)
+        for holding in holdings
+    ]
+
+def make_trade(service, portfolio_id, ticker, trade_date, quantity, price, currency=None, fx_rate=None, fees=None):
+    """
+    A trade entered in the monitor, with defaults filled in.
+    
+    The currency defaults to that of the position or constituent, the
+    date to today and the FX rate (USD per quoted unit) to the latest rate
+    from the FX engine.
+    
+    Raises:
+        ValueError: If no FX rate is given and none is available
+    """
+    if not currency:
+        position = service.position_engine(portfolio_id).position(ticker)
+        constituents = (service.get_portfolio(portfolio_id) or {}).get("constituents", [])
+        currency = position.currency if position else next(
+            (c["currency"] for c in constituents if c["ticker"] == ticker and c.get("currency")), "USD"
+        )
+    
+    if not fx_rate:
+        major, scale = split_currency(currency)
+        if major == "USD":
+            fx_rate = scale
+        else:
+            from services.bloomberg_client import get_bloomberg_client
+            from services.fx_engine import get_fx_engine
+            if not get_bloomberg_client().is_connected:
+                raise ValueError(f"Please enter the {currency} FX rate")
+            fx_rate = get_fx_engine().rates([currency], "USD")[currency]
+    
+    return {
+        "ticker": ticker,
+        "trade_date": trade_date or datetime.now().date().isoformat(),
+        "quantity": float(quantity),
+        "price": float(price),
+        "currency": currency,
+        "fx_rate": float(fx_rate),
+        "fees": float(fees or 0),
+        "note": "Manual entry",
+    }
+
+def revalue_holding(holding, price, fx_rate=None):
+    """
+    Return a copy of a holding valued at a new price and FX rate.
+    
+    Prices are in the holding's quote currency and FX rates are USD per
+    quoted unit. Local P&L is in the major currency (GBP for GBp); USD P&L
+    includes the FX move since purchase, with the cost converted at
+    avg_fx_rate.
+    """
+    fx_rate = holding.get("fx_rate", 1.0) if fx_rate is None else fx_rate
+    avg_fx_rate = holding.get("avg_fx_rate", fx_rate)
+    scale = split_currency(holding.get("currency", "USD"))[1]
+    quantity = holding["quantity"]
+    avg_cost = holding["avg_cost"]
+    return {
+        **holding,
+        "current_price": price,
+        "fx_rate": fx_rate,
+        "market_value": quantity * price * fx_rate,
+        "pnl_local": quantity * (price - avg_cost) * scale,
+        "pnl_usd": quantity * (price * fx_rate - avg_cost * avg_fx_rate),
+        "pnl_percent": (price / avg_cost - 1) * 100 * (1 if quantity >= 0 else -1) if avg_cost else 0.0,
+    }
+
+def apply_fx_rates(holdings):
+    """
+    Revalue holdings at the latest FX rates from the FX engine.
+    
+    Holdings keep the rates they have when Bloomberg is not available.
+    """
+    from services.bloomberg_client import get_bloomberg_client
+    from services.fx_engine import get_fx_engine
+    if not get_bloomberg_client().is_connected:
+        return holdings
+    
+    rates = get_fx_engine().rates([holding.get("currency", "USD") for holding in holdings], "USD")
+    return [
+        revalue_holding(holding, holding["current_price"], rates[holding.get("currency", "USD")])
+        for holding in holdings
+    ]
+
+def live_price_patch(holdings, prices):
+    """
+    Patch of the holdings table rows whose price changed.
+    
+    Rows are in the order of the holdings store; sorting the table in the
+    browser does not reorder its data.
+    
+    Args:
+        holdings: Holdings in table row order
+        prices: New prices by ticker
+        
+    Returns:
+        Tuple of the Patch assigning the live columns of the repriced rows,
+        or None if no holding was repriced, and the holdings with those
+        rows revalued
+    """
+    patched = Patch()
+    repriced = list(holdings)
+    updated = 0
+    for row, holding in enumerate(holdings):
+        if holding["ticker"] not in prices:
+            continue
+        repriced[row] = holding = revalue_holding(holding, prices[holding["ticker"]])
+        for column in LIVE_COLUMNS:
+            patched[row][column] = holding[column]
+        updated += 1
+    return (patched if updated else None), repriced
+
+def holdings_table_patch(rows, new_rows):
+    """
+    Patch turning the holdings table rows into new rows, matched by id.
+    
+    Rows of closed positions are deleted, rows of new positions inserted
+    at their place and only the changed cells of other rows assigned.
+    
+    Args:
+        rows: Rows the table holds
+        new_rows: Rows it should hold
+    
+    Returns:
+        The Patch, None if nothing changed, or the new rows if the kept
+        rows are in a different order
+    """
+    new_ids = {row["id"] for row in new_rows}
+    old = {row["id"]: row for row in rows}
+    if [row["id"] for row in rows if row["id"] in new_ids] != [row["id"] for row in new_rows if row["id"] in old]:
+        return new_rows
+    
+    patched = Patch()
+    changes = 0
+    for index in reversed(range(len(rows))):
+        if rows[index]["id"] not in new_ids:
+            del patched[index]
+            changes += 1
+    # After the deletions the kept rows are in place; inserting new rows in
+    # order keeps every later index aligned with new_rows
+    for index, row in enumerate(new_rows):
+        previous = old.get(row["id"])
+        if previous is None:
+            patched.insert(index, row)
+            changes += 1
+            continue
+        for column, value in row.items():
+            if previous.get(column) != value:
+                patched[index][column] = value
+                changes += 1
+    return patched if changes else None
+
+def live_portfolio_data(portfolio_data, holdings):
+    """Portfolio data with the total value and P&L of revalued holdings."""
+    total_value = sum(holding["market_value"] for holding in holdings)
+    return {
+        **portfolio_data,
+        "total_value": total_value,
+        "total_pnl": portfolio_data["total_pnl"] + total_value - portfolio_data["total_value"],
+    }
+
+def summary_totals(portfolio_data):
+    """Children of the summary's total value and total P&L."""
+    return (
+        f"${portfolio_data['total_value']:,.2f}",
+        change_children(portfolio_data["total_pnl"], f"${abs(portfolio_data['total_pnl']):,.2f}"),
+    )
+
+def subscribe_live_prices(holdings, owner=None):
+    """
+    Subscribe to live prices for the holdings and value them at the
+    latest prices already received.
+    
+    Args:
+        holdings: Holdings to subscribe to
+        owner: Key of the browser session, replacing its earlier subscriptions
+        
+    Returns:
+        Tuple of the revalued holdings and the price version they reflect,
+        or the unchanged holdings and None when live prices are unavailable
+    """
+    from services.bloomberg_client import get_bloomberg_client
+    from services.subscription_manager import get_subscription_manager
+    if not get_bloomberg_client().is_connected:
+        return holdings, None
+    
+    manager = get_subscription_manager()
+    tickers = [holding["ticker"] for holding in holdings]
+    manager.subscribe(tickers, owner)
+    if not manager.is_connected:
+        return holdings, None
+    
+    version = manager.version
+    prices = manager.last_prices(tickers)
+    return [
+        revalue_holding(holding, prices[holding["ticker"]]) if holding["ticker"] in prices else holding
+        for holding in holdings
+    ], version
+
+def refresh_reference_data(job, securities, fields):
+    """Background job refreshing reference data for the exposure engine."""
+    from services.bloomberg_client import get_bloomberg_client
+    client = get_bloomberg_client()
+    if client.is_connected:
+        client.get_reference_data(securities, fields)
+
+def get_exposure_engine(holdings):
+    """
+    Get the exposure engine for a set of holdings.
+    
+    The engine is built from cached look-through data only, so it never
+    waits on Bloomberg; missing or expired fields are refreshed in the
+    background and picked up by the next update.
+    """
+    cache = get_reference_cache()
+    securities = [holding["ticker"] for holding in holdings]
+    key = (tuple(securities), cache.version)
+    if _exposure_engine["key"] == key:
+        return _exposure_engine["engine"]
+    
+    reference_data = cache.get_many(securities, LOOKTHROUGH_FIELDS, allow_stale=True)
+    engine = ExposureEngine(securities, reference_data, {h["ticker"]: h for h in holdings})
+    _exposure_engine.update(key=key, engine=engine)
+    
+    missing = cache.missing(securities, LOOKTHROUGH_FIELDS)
+    if missing:
+        from services.bloomberg_client import get_bloomberg_client
+        if get_bloomberg_client().is_connected:
+            submit_reference_refresh(list(missing))
+    return engine
+
+def submit_reference_refresh(securities):
+    """
+    Queue a look-through refresh for the securities not already being refreshed.
+    
+    Returns:
+        Optional[str]: ID of the submitted job, or None if every security
+        has a refresh queued or running
+    """
+    from services.job_manager import get_job_manager
+    jobs = get_job_manager()
+    with _reference_refresh_lock:
+        for security, job_id in list(_reference_refreshes.items()):
+            job = jobs.get(job_id)
+            if job is None or job.is_finished:
+                del _reference_refreshes[security]
+        pending = [security for security in securities if security not in _reference_refreshes]
+        if not pending:
+            logger.debug(f"Look-through refresh already running for {len(securities)} holdings")
+            return None
+        job_id = jobs.submit(
+            refresh_reference_data, pending, LOOKTHROUGH_FIELDS,
+            description=f"Refresh look-through data for {len(pending)} holdings"
+        )
+        _reference_refreshes.update(dict.fromkeys(pending, job_id))
+    return job_id
+
+def create_allocation_figure(exposures, title):
+    """Create a donut chart of exposures (fractions by category)."""
+    fig = px.pie(
+        values=(exposures * 100).round(2).tolist(),
+        names=exposures.index.tolist(),
+        title=title,
+        hole=0.4,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_layout(
+        showlegend=True,
+        margin=dict(l=20, r=20, t=40, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    return fig
+
 def init_portfolio_monitor_callbacks(app):
     """Initialize callbacks for the portfolio monitor view."""
-    print("Initializing portfolio monitor callbacks...")  # Debug log
+    logger.debug("Initializing portfolio monitor callbacks")
     
+    @app.callback(
+        [Output("portfolio-selector", "options"),
+         Output("portfolio-selector", "value")],
+        Input("portfolio-selector", "id"),
+        State("portfolio-selector", "value")
+    )
+    def load_portfolio_options(selector_id, current):
+        """Populate the portfolio selector from the saved portfolios."""
+        from services.portfolio_service import get_portfolio_service
+        portfolios = get_portfolio_service().list_portfolios()
+        options = [{"label": p["name"], "value": str(p["id"])} for p in portfolios]
+        values = [option["value"] for option in options]
+        logger.debug(f"Loaded {len(options)} saved portfolios")
+        return options, current if current in values else (values[0] if values else None)
+
     @app.callback(
         [Output("portfolio-data", "data"),
-         Output("holdings-data", "data")],
+         Output("holdings-data", "data"),
+         Output("holdings-table", "data"),
+         Output("live-prices-version", "data"),
+         Output("live-prices-interval", "disabled")],
         [Input("portfolio-selector", "value"),
-         Input("refresh-data-btn", "n_clicks")]
+         Input("refresh-data-btn", "n_clicks"),
+         Input("cost-method", "value"),
+         Input("trades-version", "data")],
+        [State("portfolio-data", "data"),
+         State("holdings-data", "data")]
     )
-    def update_portfolio_data(portfolio_id, n_clicks):
-        """Update portfolio and holdings data."""
+    def update_portfolio_data(portfolio_id, n_clicks, method, trades_version, portfolio_handle, holdings_handle):
+        """
+        Update portfolio and holdings data.
+        
+        The data is kept in the session store; the stores in the page only
+        receive handles, whose version changes with every update. The
+        holdings table receives its full rows when another portfolio is
+        loaded, and otherwise a patch of the rows that changed.
+        """
+        from services.session_store import get_session_store
+        from services.subscription_manager import get_subscription_manager
+        store = get_session_store()
+        # The holdings key also owns the session's live price subscriptions
+        holdings_handle = holdings_handle or store.new_handle()
+        # What the table shows: the stored holdings follow the live price patches
+        previous_id = store.get(portfolio_handle, {}).get("id")
+        previous_holdings = store.get(holdings_handle)
         ctx = callback_context
         triggered = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
-        print(f"update_portfolio_data triggered by: {triggered}")  # Debug log
-        print(f"Portfolio ID: {portfolio_id}, n_clicks: {n_clicks}")  # Debug log
+        logger.debug(f"update_portfolio_data triggered by {triggered}, portfolio {portfolio_id}, n_clicks {n_clicks}")
         
         if not portfolio_id:
-            print("No portfolio_id provided")  # Debug log
-            return {}, []
+            logger.debug("No portfolio selected")
+            get_subscription_manager().release(holdings_handle["key"])
+            return store.put({}, portfolio_handle), store.put([], holdings_handle), [], 0, True
+            
+        from services.portfolio_service import get_portfolio_service
+        service = get_portfolio_service()
+        portfolio = service.get_portfolio(int(portfolio_id))
+        if portfolio is None:
+            logger.warning(f"Portfolio {portfolio_id} not found")
+            get_subscription_manager().release(holdings_handle["key"])
+            return store.put({}, portfolio_handle), store.put([], holdings_handle), [], 0, True
             
-        portfolio_data = generate_mock_portfolio_data(portfolio_id)
-        holdings_data = generate_mock_holdings()
+        try:
+            update_valuations(portfolio["id"])
+        except Exception as e:
+            logger.error(f"Valuations not updated: {str(e)}")
+        holdings_data = build_holdings(portfolio, service.position_engine(portfolio["id"]), method or "average")
         
-        print("Generated data successfully")  # Debug log
-        return portfolio_data, holdings_data
+        try:
+            holdings_data = apply_fx_rates(holdings_data)
+        except Exception as e:
+            logger.warning(f"FX rates unavailable: {str(e)}")
+        
+        try:
+            holdings_data, version = subscribe_live_prices(holdings_data, holdings_handle["key"])
+        except Exception as e:
+            logger.warning(f"Live prices unavailable: {str(e)}")
+            version = None
+        
+        holdings_data = reweight_holdings(holdings_data)
+        portfolio_data = build_portfolio_data(portfolio, holdings_data)
+        
+        rows = holdings_table_rows(holdings_data)
+        if previous_holdings is not None and previous_id == portfolio["id"]:
+            rows = holdings_table_patch(holdings_table_rows(previous_holdings), rows)
+        
+        logger.debug(f"Loaded {len(holdings_data)} holdings of portfolio {portfolio['id']}")
+        return (
+            store.put(portfolio_data, portfolio_handle),
+            store.put(holdings_data, holdings_handle),
+            no_update if rows is None else rows,
+            version or 0,
+            version is None,
+        )
 
     @app.callback(
-        Output("monitor-content", "children"),
-        [Input("portfolio-data", "data"),
-         Input("holdings-data", "data")]
+        [Output("add-trade-status", "children"),
+         Output("trades-version", "data")],
+        Input("add-trade-btn", "n_clicks"),
+        [State("portfolio-selector", "value"),
+         State("trade-ticker", "value"),
+         State("trade-date", "value"),
+         State("trade-quantity", "value"),
+         State("trade-price", "value"),
+         State("trade-currency", "value"),
+         State("trade-fx-rate", "value"),
+         State("trade-fees", "value"),
+         State("trades-version", "data")],
+        prevent_initial_call=True
     )
-    def update_monitor_content(portfolio_data, holdings_data):
-        """Update the main content area of the monitor."""
-        print("\nupdate_monitor_content called")  # Debug log
-        print(f"Portfolio data present: {bool(portfolio_data)}")  # Debug log
-        print(f"Holdings data present: {bool(holdings_data)}")  # Debug log
-
-        if not portfolio_data or not holdings_data:
-            print("No data available")  # Debug log
-            return html.Div("No portfolio data available", className="text-center p-4")
-
+    def add_trade(n_clicks, portfolio_id, ticker, trade_date, quantity, price, currency, fx_rate, fees, version):
+        """Record a trade entered by hand; only the traded position is updated."""
+        if not n_clicks:
+            raise PreventUpdate
+        ticker = (ticker or "").strip()
+        if not portfolio_id:
+            return html.Div("Please select a portfolio.", className="text-warning"), no_update
+        if not ticker or not quantity or price is None:
+            return html.Div("Please enter a ticker, quantity and price.", className="text-warning"), no_update
+        if float(price) < 0:
+            return html.Div("The price cannot be negative.", className="text-warning"), no_update
+        
+        from services.portfolio_service import get_portfolio_service
+        service = get_portfolio_service()
         try:
-            components = []
-            
-            # Create summary
-            print("Creating portfolio summary...")  # Debug log
-            summary = create_portfolio_summary(portfolio_data)
-            components.append(summary)
-            
-            # Create holdings table
-            print("Creating holdings table...")  # Debug log
-            holdings = create_holdings_table(holdings_data)
-            components.append(holdings)
-            
-            # Create allocation charts
-            print("Creating allocation charts...")  # Debug log
-            charts = create_allocation_charts()
-            components.append(charts)
-            
-            print("All components created successfully")  # Debug log
-            return html.Div(components)
-            
+            trade = make_trade(service, int(portfolio_id), ticker, trade_date, quantity, price, currency, fx_rate, fees)
+            service.add_trades(int(portfolio_id), [trade])
         except Exception as e:
-            print(f"Error updating monitor content: {str(e)}")  # Debug log
-            return html.Div(
-                f"Error loading portfolio data: {str(e)}", 
-                className="text-center p-4 text-danger"
-            )
+            logger.error(f"Error recording trade: {str(e)}")
+            return html.Div(f"Could not record trade: {str(e)}", className="text-danger"), no_update
+        
+        logger.info(f"Recorded trade {trade}")
+        side = "Bought" if trade["quantity"] > 0 else "Sold"
+        return html.Div([
+            html.I(className="fas fa-check-circle me-2"),
+            f"{side} {abs(trade['quantity']):,.0f} {ticker} at {format_price(trade['price'], trade['currency'])}."
+        ], className="text-success"), (version or 0) + 1
+
+    @app.callback(
+        Output("trade-details", "children"),
+        Input("holdings-table", "active_cell"),
+        [State("portfolio-selector", "value"),
+         State("cost-method", "value")],
+        prevent_initial_call=True
+    )
+    def show_trade_details(active_cell, portfolio_id, method):
+        """Show the trades and open lots of the selected holding below the table."""
+        if not active_cell or not active_cell.get("row_id") or not portfolio_id:
+            raise PreventUpdate
+        
+        from services.portfolio_service import get_portfolio_service
+        ticker = active_cell["row_id"]
+        position = get_portfolio_service().position_engine(int(portfolio_id)).position(ticker)
+        if position is None:
+            raise PreventUpdate
+        logger.debug(f"Showing {len(position.trades)} trades of {ticker}")
+        return html.Div([
+            html.H6(ticker, className="mb-2"),
+            create_trade_details(position, method or "average")
+        ])
+
+    @app.callback(
+        [Output("holdings-table", "data", allow_duplicate=True),
+         Output("live-prices-version", "data", allow_duplicate=True),
+         Output("summary-value", "children", allow_duplicate=True),
+         Output("summary-total-pnl", "children", allow_duplicate=True)],
+        Input("live-prices-interval", "n_intervals"),
+        [State("live-prices-version", "data"),
+         State("holdings-data", "data"),
+         State("portfolio-data", "data")],
+        prevent_initial_call=True
+    )
+    def push_live_prices(n_intervals, version, holdings_handle, portfolio_handle):
+        """Patch the cells of holdings whose price changed since the last update, and the summary totals."""
+        from services.session_store import get_session_store
+        from services.subscription_manager import get_subscription_manager
+        store = get_session_store()
+        owner = holdings_handle.get("key") if isinstance(holdings_handle, dict) else None
+        version, changes = get_subscription_manager().changes_since(version or 0, owner=owner)
+        holdings_data = store.get(holdings_handle, [])
+        if not changes or not holdings_data:
+            raise PreventUpdate
+        
+        patched, repriced = live_price_patch(holdings_data, changes)
+        if patched is None:
+            raise PreventUpdate
+        
+        # The stored data follows the ticks, so later deltas and the totals
+        # build on them; a portfolio loaded meanwhile is left alone
+        if not store.replace(holdings_handle, holdings_data, repriced):
+            raise PreventUpdate
+        portfolio_data = store.get(portfolio_handle, {})
+        if not portfolio_data:
+            return patched, version, no_update, no_update
+        live_data = live_portfolio_data(portfolio_data, repriced)
+        store.replace(portfolio_handle, portfolio_data, live_data)
+        return (patched, version, *summary_totals(live_data))
+
+    @app.callback(
+        [Output("monitor-content", "style"),
+         Output("monitor-empty", "style")],
+        Input("holdings-data", "data")
+    )
+    def toggle_monitor_content(holdings_handle):
+        """Show the monitor when there are holdings, otherwise the empty message."""
+        from services.session_store import get_session_store
+        holdings_data = get_session_store().get(holdings_handle, [])
+        logger.debug(f"toggle_monitor_content called with {len(holdings_data or [])} holdings")
+        if not holdings_data:
+            return {"display": "none"}, {}
+        return {}, {"display": "none"}
+
+    @app.callback(
+        [Output("summary-name", "children"),
+         Output("summary-value", "children"),
+         Output("summary-day-change", "children"),
+         Output("summary-total-pnl", "children"),
+         Output("summary-twr", "children"),
+         Output("summary-mwr", "children"),
+         Output("portfolio-sparkline", "figure")],
+        Input("portfolio-data", "data")
+    )
+    def update_portfolio_summary(portfolio_handle):
+        """Fill in the summary figures; only the sparkline's trace data is sent."""
+        from services.session_store import get_session_store
+        portfolio_data = get_session_store().get(portfolio_handle, {})
+        if not portfolio_data:
+            raise PreventUpdate
+        
+        sparkline = Patch()
+        sparkline["data"][0]["x"] = portfolio_data["history_dates"]
+        sparkline["data"][0]["y"] = portfolio_data["history_values"]
+        total_value, total_pnl = summary_totals(portfolio_data)
+        return (
+            portfolio_data["name"],
+            total_value,
+            change_children(portfolio_data["day_change"], f"{abs(portfolio_data['day_change']):.2f}%"),
+            total_pnl,
+            format_return(portfolio_data.get("twr")),
+            format_return(portfolio_data.get("mwr")),
+            sparkline,
+        )
 
     @app.callback(
         [Output("asset-allocation-chart", "figure"),
          Output("geographic-allocation-chart", "figure")],
-        [Input("holdings-data", "data")]
+        [Input("holdings-data", "data"),
+         Input("allocation-dimension", "value")]
     )
-    def update_allocation_charts(holdings_data):
-        """Update the allocation charts."""
-        print("\nupdate_allocation_charts called")  # Debug log
-        print(f"Holdings data present: {bool(holdings_data)}")  # Debug log
+    def update_allocation_charts(holdings_handle, dimension):
+        """Update the allocation charts from look-through exposures."""
+        from services.session_store import get_session_store
+        holdings_data = get_session_store().get(holdings_handle, [])
+        logger.debug(f"update_allocation_charts called with {len(holdings_data or [])} holdings")
         
         if not holdings_data:
-            print("No holdings data available")  # Debug log
             return {}, {}
             
         try:
-            # Prepare data for charts
-            sector_data = {}
-            region_data = {}
+            engine = get_exposure_engine(holdings_data)
             
-            for holding in holdings_data:
-                # Aggregate sector data
-                sector = holding.get("sector", "Other")
-                sector_data[sector] = sector_data.get(sector, 0) + holding["weight"]
-                
-                # Aggregate region data
-                region = holding.get("region", "Other")
-                region_data[region] = region_data.get(region, 0) + holding["weight"]
+            # Weight by market value so price moves are reflected immediately
+            exposures = engine.exposures([
+                holding.get("market_value", holding.get("weight", 0)) for holding in holdings_data
+            ])
+            dimension = dimension or "sector"
+            logger.debug(f"Processed holdings - {dimension}: {list(exposures[dimension].index)}")
             
-            print(f"Processed holdings - Sectors: {list(sector_data.keys())}")  # Debug log
+            allocation_fig = create_allocation_figure(exposures[dimension], ALLOCATION_TITLES[dimension])
+            region_fig = create_allocation_figure(exposures["region"], ALLOCATION_TITLES["region"])
             
-            # Create sector allocation chart
-            sector_fig = px.pie(
-                values=list(sector_data.values()),
-                names=list(sector_data.keys()),
-                title="Sector Allocation",
-                hole=0.4,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            sector_fig.update_layout(
-                showlegend=True,
-                margin=dict(l=20, r=20, t=40, b=20),
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)"
-            )
-            
-            # Create geographic allocation chart
-            region_fig = px.pie(
-                values=list(region_data.values()),
-                names=list(region_data.keys()),
-                title="Geographic Distribution",
-                hole=0.4,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            region_fig.update_layout(
-                showlegend=True,
-                margin=dict(l=20, r=20, t=40, b=20),
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)"
-            )
-            
-            print("Charts created successfully")  # Debug log
-            return sector_fig, region_fig
+            return allocation_fig, region_fig
             
         except Exception as e:
-            print(f"Error creating allocation charts: {str(e)}")  # Debug log
-            return {}, {}
\ No newline at end of file
+            logger.error(f"Error creating allocation charts: {str(e)}")
+            return {}, {}
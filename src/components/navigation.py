@@ -29,6 +29,12 @@ def create_navigation():
                 id="nav-portfolio-monitor",
                 className="nav-link"
             ),
+            dbc.NavLink(
+                [html.I(className="fas fa-tachometer-alt me-2"), "Performance"],
+                href="#",
+                id="nav-performance",
+                className="nav-link"
+            ),
         ],
         vertical=True,
         pills=True,
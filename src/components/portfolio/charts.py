@@ -0,0 +1,180 @@
+"""
+Chart components for portfolio analysis.
+File: src/components/portfolio/charts.py
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.calculations import RollingAnalytics
+from utils.downsampling import downsample
+
+# Points per trace are limited to about twice this many buckets
+PIXEL_BUDGET = 500
+
+# Decimal places sent to the browser
+VALUE_DECIMALS = 4
+
+ROLLING_LABELS = {
+    "volatility": "Volatility",
+    "sharpe_ratio": "Sharpe Ratio",
+    "beta": "Beta to Portfolio",
+    "drawdown": "Drawdown",
+}
+
+
+def chart_arrays(x: np.ndarray, y: np.ndarray, x_range=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Downsample a daily series and shrink it for JSON transfer.
+
+    Returns:
+        Tuple of ISO date strings and rounded values
+    """
+    x, y = downsample(x, y, PIXEL_BUDGET, x_range)
+    return np.datetime_as_string(x, unit="D"), np.round(y, VALUE_DECIMALS)
+
+
+def performance_series(data: Dict[str, pd.DataFrame], securities: List[str]) -> List[Tuple[str, pd.Series]]:
+    """
+    Return the series of the performance chart in trace order.
+
+    Args:
+        data: Historical data by security, plus the 'portfolio' frame
+        securities: Securities in display order
+
+    Returns:
+        List of (security or 'portfolio', series) pairs
+    """
+    series = [(security, data[security]['value']) for security in securities if security in data]
+    if 'portfolio' in data:
+        series.append(('portfolio', data['portfolio']['portfolio_value']))
+    return series
+
+
+def parse_relayout_range(relayout_data: Optional[Dict]):
+    """
+    Extract the visible x range from a Graph's relayoutData.
+
+    Returns:
+        The (start, end) range as datetime64 values, None for the full
+        range, or False if the event did not change the x axis
+    """
+    if not relayout_data:
+        return False
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        bounds = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        bounds = relayout_data['xaxis.range']
+    else:
+        return False
+    return tuple(np.datetime64(pd.Timestamp(b), "ns") for b in bounds)
+
+
+def performance_trace_data(data: Dict[str, pd.DataFrame], securities: List[str], x_range=None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Downsample each performance series for the visible range.
+
+    Args:
+        data: Historical data by security, plus the 'portfolio' frame
+        securities: Securities in display order
+        x_range: Optional (start, end) of the visible range
+
+    Returns:
+        List of (x, y) arrays in trace order
+    """
+    return [
+        chart_arrays(series.index.values, series.to_numpy(dtype="float64"), x_range)
+        for _, series in performance_series(data, securities)
+    ]
+
+
+def create_performance_figure(data: Dict[str, pd.DataFrame], securities: List[str], weights: Dict[str, float], currency: str):
+    """
+    Create the portfolio performance chart from historical data.
+
+    Series are downsampled to the pixel budget and drawn with WebGL. A
+    range selector replaces the range slider, which would ship every
+    point a second time.
+    """
+    traces = []
+    for (name, _), (x, y) in zip(performance_series(data, securities), performance_trace_data(data, securities)):
+        if name == 'portfolio':
+            traces.append(go.Scattergl(
+                x=x,
+                y=y,
+                name='Portfolio Total',
+                mode='lines',
+                line=dict(width=3, color='yellow'),
+            ))
+        else:
+            traces.append(go.Scattergl(
+                x=x,
+                y=y,
+                name=f"{name} ({weights[name]}%)",
+                mode='lines',
+                opacity=0.7
+            ))
+
+    # Passing all traces at once avoids a deep copy of the figure per trace
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title="Portfolio Performance",
+        xaxis_title="Date",
+        yaxis_title=f"Total Return Index ({currency})",
+        hovermode='x unified',
+        showlegend=True,
+        template="plotly_dark",
+        height=500,
+        uirevision="performance"
+    )
+    fig.update_xaxes(
+        rangeselector=dict(
+            buttons=[
+                dict(count=1, label="YTD", step="year", stepmode="todate"),
+                dict(count=1, label="1Y", step="year", stepmode="backward"),
+                dict(count=3, label="3Y", step="year", stepmode="backward"),
+                dict(count=5, label="5Y", step="year", stepmode="backward"),
+                dict(step="all", label="All")
+            ],
+            bgcolor="#444"
+        )
+    )
+    return fig
+
+
+def create_rolling_figure(analytics: RollingAnalytics, metric: str):
+    """Create the rolling analytics chart from analytics computed for one window."""
+    window = analytics.window
+    frame = analytics.frame(metric)
+    dates = frame.index.values
+
+    traces = []
+    for name in frame.columns:
+        is_portfolio = name == "Portfolio"
+        x, y = chart_arrays(dates, frame[name].to_numpy())
+        traces.append(go.Scattergl(
+            x=x,
+            y=y,
+            name=name,
+            mode='lines',
+            line=dict(width=3, color='yellow') if is_portfolio else None,
+            opacity=1 if is_portfolio else 0.7
+        ))
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title=f"Rolling {window}-Day {ROLLING_LABELS[metric]}",
+        xaxis_title="Date",
+        hovermode='x unified',
+        showlegend=True,
+        template="plotly_dark",
+        height=350
+    )
+    if metric in ("volatility", "drawdown"):
+        fig.update_yaxes(tickformat=".0%")
+    return fig
@@ -0,0 +1,118 @@
+"""
+Performance dashboard layout implementation.
+File: src/layouts/performance.py
+"""
+
+from dash import html, dcc
+import dash_bootstrap_components as dbc
+
+from services.telemetry import METRICS_PATH
+
+# How often the dashboard reads the metrics registry
+PERFORMANCE_REFRESH_MS = 5000
+
+def create_kpi_card(title, value_id, icon):
+    """Create a card showing a single headline metric."""
+    return dbc.Card([
+        dbc.CardBody([
+            html.Div([html.I(className=f"{icon} me-2"), title], className="text-muted small"),
+            html.H4("-", id=value_id, className="mb-0"),
+        ])
+    ], className="mb-4")
+
+def create_callback_table(rows):
+    """Create the table of callback timings and payload sizes."""
+    if not rows:
+        return html.Div("No callbacks recorded yet", className="text-muted")
+    return dbc.Table([
+        html.Thead([
+            html.Tr([
+                html.Th("Callback"),
+                html.Th("Calls"),
+                html.Th("p50 (ms)"),
+                html.Th("p95 (ms)"),
+                html.Th("Avg Payload (KB)"),
+                html.Th("Errors"),
+            ])
+        ]),
+        html.Tbody([
+            html.Tr([
+                html.Td(html.Code(row["callback"])),
+                html.Td(f"{row['calls']:,}"),
+                html.Td(f"{row['p50_ms']:,.1f}"),
+                html.Td(f"{row['p95_ms']:,.1f}"),
+                html.Td(f"{row['avg_kb']:,.1f}"),
+                html.Td(f"{row['errors']:,}", className="text-danger" if row["errors"] else None),
+            ]) for row in rows
+        ])
+    ], bordered=True, hover=True, responsive=True, size="sm")
+
+# Main layout
+layout = dbc.Container([
+    # Header section
+    dbc.Row([
+        dbc.Col([
+            html.H2("Performance", className="mb-4")
+        ], width=8),
+        dbc.Col([
+            dbc.Button(
+                [html.I(className="fas fa-file-alt me-2"), "Raw Metrics"],
+                color="secondary",
+                href=METRICS_PATH,
+                external_link=True,
+                target="_blank",
+                className="float-end"
+            )
+        ], width=4)
+    ], className="mb-4"),
+    
+    dcc.Interval(id="performance-interval", interval=PERFORMANCE_REFRESH_MS),
+    
+    # Headline metrics
+    dbc.Row([
+        dbc.Col(create_kpi_card("Bloomberg Requests", "perf-requests", "fas fa-exchange-alt"), md=3),
+        dbc.Col(create_kpi_card("API Hits", "perf-hits", "fas fa-database"), md=3),
+        dbc.Col(create_kpi_card("Cache Hit Rate", "perf-cache-hit-rate", "fas fa-bolt"), md=3),
+        dbc.Col(create_kpi_card("Callback p95", "perf-callback-p95", "fas fa-stopwatch"), md=3),
+    ]),
+    
+    # Request latency
+    dbc.Card([
+        dbc.CardHeader(html.H5("Bloomberg Request Latency", className="mb-0")),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    html.H6("Latency by Phase (p50 / p95)", className="text-center mb-3"),
+                    dcc.Graph(id="perf-phase-chart", config={"displayModeBar": False})
+                ], md=6),
+                dbc.Col([
+                    html.H6("Request Latency Distribution", className="text-center mb-3"),
+                    dcc.Graph(id="perf-latency-histogram", config={"displayModeBar": False})
+                ], md=6),
+            ])
+        ])
+    ], className="mb-4"),
+    
+    # API usage
+    dbc.Card([
+        dbc.CardHeader(html.H5("API Usage", className="mb-0")),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    html.H6("Hits by Request Type", className="text-center mb-3"),
+                    dcc.Graph(id="perf-usage-chart", config={"displayModeBar": False})
+                ], md=6),
+                dbc.Col([
+                    html.H6("Cache Lookups", className="text-center mb-3"),
+                    dcc.Graph(id="perf-cache-chart", config={"displayModeBar": False})
+                ], md=6),
+            ])
+        ])
+    ], className="mb-4"),
+    
+    # Callbacks
+    dbc.Card([
+        dbc.CardHeader(html.H5("Callbacks", className="mb-0")),
+        dbc.CardBody(html.Div(id="perf-callback-table"))
+    ], className="mb-4"),
+], fluid=True)
@@ -99,7 +99,40 @@ def create_portfolio_config():
                         className="mb-3"
                     )
                 ], md=6)
-            ])
+            ]),
+            dbc.Row([
+                dbc.Col([
+                    html.Label("Rebalancing"),
+                    dcc.Dropdown(
+                        id="rebalance-frequency",
+                        options=[
+                            {"label": "Buy and Hold", "value": "none"},
+                            {"label": "Daily", "value": "daily"},
+                            {"label": "Monthly", "value": "monthly"},
+                            {"label": "Quarterly", "value": "quarterly"}
+                        ],
+                        value="none",
+                        className="mb-3"
+                    )
+                ], md=6)
+            ]),
+            
+            # Save the selection as a named portfolio
+            html.Label("Portfolio Name"),
+            dbc.InputGroup([
+                dbc.Input(
+                    id="portfolio-name",
+                    type="text",
+                    placeholder="e.g. Global Growth"
+                ),
+                dbc.Button(
+                    [html.I(className="fas fa-save me-2"), "Save"],
+                    id="save-portfolio-btn",
+                    color="primary",
+                    n_clicks=0
+                )
+            ], className="mb-2"),
+            html.Div(id="save-portfolio-status")
         ])
     ], className="mb-4")
 
@@ -108,8 +141,8 @@ def create_metrics_section():
     return dbc.Card([
         dbc.CardHeader([
             dbc.Row([
-                dbc.Col(html.H5("Portfolio Analysis", className="mb-0"), width=8),
-                dbc.Col(
+                dbc.Col(html.H5("Portfolio Analysis", className="mb-0"), width=6),
+                dbc.Col([
                     dbc.Button(
                         [html.I(className="fas fa-chart-line me-2"), "Generate Portfolio"],
                         id="generate-portfolio-btn",
@@ -117,8 +150,15 @@ def create_metrics_section():
                         className="float-end",
                         n_clicks=0
                     ),
-                    width=4
-                )
+                    dbc.Button(
+                        [html.I(className="fas fa-stop me-2"), "Cancel"],
+                        id="cancel-portfolio-btn",
+                        color="secondary",
+                        className="float-end me-2",
+                        disabled=True,
+                        n_clicks=0
+                    )
+                ], width=6)
             ])
         ]),
         dbc.CardBody([
@@ -132,6 +172,41 @@ def create_metrics_section():
                 className="mb-4"
             ),
             
+            # Rolling analytics chart
+            dbc.Row([
+                dbc.Col([
+                    dbc.RadioItems(
+                        id="rolling-metric",
+                        options=[
+                            {"label": "Volatility", "value": "volatility"},
+                            {"label": "Sharpe", "value": "sharpe_ratio"},
+                            {"label": "Beta", "value": "beta"},
+                            {"label": "Drawdown", "value": "drawdown"}
+                        ],
+                        value="volatility",
+                        inline=True
+                    )
+                ], width=8),
+                dbc.Col([
+                    dbc.RadioItems(
+                        id="rolling-window",
+                        options=[
+                            {"label": "30D", "value": 30},
+                            {"label": "90D", "value": 90},
+                            {"label": "252D", "value": 252}
+                        ],
+                        value=90,
+                        inline=True,
+                        className="float-end"
+                    )
+                ], width=4)
+            ], className="mb-2"),
+            dcc.Graph(
+                id="rolling-chart",
+                config={'displayModeBar': False},
+                className="mb-4"
+            ),
+            
             # Metrics table
             html.Div(id="metrics-table")
         ])
@@ -140,7 +215,12 @@ def create_metrics_section():
 # Main layout
 layout = dbc.Container([
     # Hidden stores for state management
-    dcc.Store(id="selected-instruments", data=[]),
+    # Handle of the selected instruments kept in the session store
+    dcc.Store(id="selected-instruments", data=None),
+    dcc.Store(id="portfolio-job", data=None),
+    
+    # Polls the background portfolio generation job while it runs
+    dcc.Interval(id="portfolio-job-poll", interval=500, disabled=True),
     
     # Header section
     dbc.Row([
@@ -3,22 +3,70 @@ Portfolio monitor layout implementation.
 File: src/layouts/portfolio_monitor.py
 """
 
-from dash import html, dcc
+from dash import html, dcc, dash_table
+from dash.dash_table.Format import Format, Group, Scheme, Symbol
+from dash.dash_table import FormatTemplate
 import dash_bootstrap_components as dbc
 from datetime import datetime
+from services.fx_engine import MINOR_CURRENCIES, split_currency
 
-def create_portfolio_summary(portfolio_data):
-    """Create the portfolio summary card."""
+# How often live prices are pushed to the holdings table; ticks arriving in
+# between are conflated into the latest price
+LIVE_PRICE_REFRESH_MS = 1000
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥"}
+
+def currency_prefix(currency):
+    """Return the prefix of amounts in a currency, e.g. '$' or 'CHF '."""
+    major = split_currency(currency or "USD")[0]
+    return CURRENCY_SYMBOLS.get(major, f"{major} ")
+
+def format_price(price, currency):
+    """Format a price in its quote currency; minor units such as GBp get a suffix."""
+    if currency in MINOR_CURRENCIES:
+        return f"{price:,.2f}{currency[-1]}"
+    return f"{currency_prefix(currency)}{price:,.2f}"
+
+def pnl_cell(value, prefix="$"):
+    """Return the children and class name of a P&L cell."""
+    return dict(children=[
+        html.I(
+            className="fas fa-caret-up me-1 text-success"
+            if value > 0
+            else "fas fa-caret-down me-1 text-danger"
+        ),
+        f"{prefix}{abs(value):,.2f}"
+    ], className="text-success" if value > 0 else "text-danger")
+
+def format_return(value):
+    """Format a return in percent, or a dash when it is not available."""
+    return "–" if value is None else f"{value:+.2f}%"
+
+def change_children(value, text):
+    """Children of a summary figure with an up or down caret."""
+    return [
+        html.I(
+            className="fas fa-caret-up me-1 text-success"
+            if value > 0
+            else "fas fa-caret-down me-1 text-danger"
+        ),
+        text
+    ]
+
+def create_portfolio_summary():
+    """
+    Create the portfolio summary card.
+    
+    The card is part of the page layout; its figures and sparkline are
+    filled in by callbacks.
+    """
     return dbc.Card([
         dbc.CardBody([
             dbc.Row([
                 # Portfolio name and value
                 dbc.Col([
-                    html.H3(portfolio_data["name"], className="mb-1"),
-                    html.H4(
-                        f"${portfolio_data['total_value']:,.2f}", 
-                        className="text-primary mb-2"
-                    ),
+                    html.H3(id="summary-name", className="mb-1"),
+                    html.H4(id="summary-value", className="text-primary mb-2"),
                 ], md=6),
                 
                 # P&L metrics
@@ -26,37 +74,31 @@ def create_portfolio_summary(portfolio_data):
                     dbc.Row([
                         dbc.Col([
                             html.Div("Today's Change", className="text-muted small"),
-                            html.Div([
-                                html.I(
-                                    className="fas fa-caret-up me-1 text-success" 
-                                    if portfolio_data["day_change"] > 0 
-                                    else "fas fa-caret-down me-1 text-danger"
-                                ),
-                                f"{abs(portfolio_data['day_change']):.2f}%"
-                            ], className="h5 mb-0"),
+                            html.Div(id="summary-day-change", className="h5 mb-0"),
                         ]),
                         dbc.Col([
                             html.Div("Total P&L", className="text-muted small"),
-                            html.Div([
-                                html.I(
-                                    className="fas fa-caret-up me-1 text-success"
-                                    if portfolio_data["total_pnl"] > 0
-                                    else "fas fa-caret-down me-1 text-danger"
-                                ),
-                                f"${abs(portfolio_data['total_pnl']):,.2f}"
-                            ], className="h5 mb-0"),
+                            html.Div(id="summary-total-pnl", className="h5 mb-0"),
+                        ]),
+                        dbc.Col([
+                            html.Div("TWR", className="text-muted small"),
+                            html.Div(id="summary-twr", className="h5 mb-0"),
+                        ]),
+                        dbc.Col([
+                            html.Div("MWR (p.a.)", className="text-muted small"),
+                            html.Div(id="summary-mwr", className="h5 mb-0"),
                         ]),
                     ])
                 ], md=6),
             ]),
             
-            # Sparkline chart
+            # Sparkline chart; only its trace data is replaced
             dcc.Graph(
                 id="portfolio-sparkline",
                 figure={
                     "data": [{
-                        "x": portfolio_data["history_dates"],
-                        "y": portfolio_data["history_values"],
+                        "x": [],
+                        "y": [],
                         "type": "scatter",
                         "mode": "lines",
                         "line": {"color": "#375a7f"},
@@ -76,81 +118,191 @@ def create_portfolio_summary(portfolio_data):
         ])
     ], className="mb-4")
 
-def create_holdings_table(holdings):
-    """Create the holdings table."""
+# Holdings table columns: id, header and number format
+NUMBER = Format(precision=2, scheme=Scheme.fixed, group=Group.yes)
+PERCENT = Format(precision=2, scheme=Scheme.fixed).symbol(Symbol.yes).symbol_suffix("%")
+HOLDINGS_COLUMNS = [
+    ("ticker", "Instrument", None),
+    ("name", "Name", None),
+    ("quantity", "Quantity", Format(precision=0, scheme=Scheme.fixed, group=Group.yes)),
+    ("currency", "Ccy", None),
+    ("avg_cost", "Avg Cost", NUMBER),
+    ("current_price", "Current Price", NUMBER),
+    ("market_value", "Market Value (USD)", FormatTemplate.money(2)),
+    ("pnl_local", "P&L (Local)", NUMBER),
+    ("pnl_usd", "P&L (USD)", FormatTemplate.money(2)),
+    ("pnl_percent", "P&L %", PERCENT),
+    ("weight", "Weight", Format(precision=1, scheme=Scheme.fixed).symbol(Symbol.yes).symbol_suffix("%")),
+]
+
+# Columns of the holdings table that live prices update
+LIVE_COLUMNS = ["current_price", "market_value", "pnl_local", "pnl_usd", "pnl_percent"]
+
+# Height of the scrolling holdings table; only the rows in view are rendered
+HOLDINGS_TABLE_HEIGHT = "480px"
+
+def holdings_table_rows(holdings):
+    """Rows of the holdings table; the ticker is the row id."""
+    return [
+        {"id": holding["ticker"], **{column: holding.get(column) for column, _, _ in HOLDINGS_COLUMNS}}
+        for holding in holdings
+    ]
+
+def create_holdings_table():
+    """
+    Create the holdings table.
+    
+    The table is created once with the page. Its rows are replaced when
+    another portfolio is loaded; trades, refreshes and price changes patch
+    only the rows and cells that changed. Only the visible rows are
+    rendered.
+    """
+    pnl_columns = ["pnl_local", "pnl_usd", "pnl_percent"]
     return dbc.Card([
         dbc.CardHeader(html.H5("Holdings", className="mb-0")),
         dbc.CardBody([
-            html.Div([
+            dash_table.DataTable(
+                id="holdings-table",
+                columns=[
+                    dict(id=column, name=name, type="numeric", format=number_format)
+                    if number_format else dict(id=column, name=name)
+                    for column, name, number_format in HOLDINGS_COLUMNS
+                ],
+                data=[],
+                sort_action="native",
+                virtualization=True,
+                fixed_rows={"headers": True},
+                page_action="none",
+                style_table={"height": HOLDINGS_TABLE_HEIGHT, "overflowY": "auto"},
+                style_header={"backgroundColor": "#303030", "color": "#ffffff", "fontWeight": "bold"},
+                style_data={"backgroundColor": "#222222", "color": "#ffffff", "border": "1px solid #444444"},
+                style_cell={"padding": "6px", "minWidth": "90px", "textAlign": "right"},
+                style_cell_conditional=[
+                    {"if": {"column_id": column}, "textAlign": "left"} for column in ["ticker", "name", "currency"]
+                ],
+                style_data_conditional=[
+                    *[{"if": {"filter_query": f"{{{column}}} > 0", "column_id": column}, "color": "#00bc8c"}
+                      for column in pnl_columns],
+                    *[{"if": {"filter_query": f"{{{column}}} < 0", "column_id": column}, "color": "#e74c3c"}
+                      for column in pnl_columns],
+                    {"if": {"column_id": "ticker"}, "fontWeight": "bold"},
+                ],
+            ),
+            html.Small("Select a holding to see its trades and lots.", className="text-muted d-block mt-2"),
+            html.Div(id="trade-details", className="mt-3")
+        ])
+    ], className="mb-4")
+
+def create_trade_details(position, method="average"):
+    """
+    Create the drill-down of a holding: its trades, open lots and realised P&L.
+    
+    Args:
+        position: Position from the portfolio's position engine
+        method: Cost basis method of the realised P&L shown first
+    """
+    currency = position.currency
+    scale = split_currency(currency)[1]
+    prefix = currency_prefix(currency)
+    realised = {
+        "average": (position.realised * scale, position.realised_usd),
+        "fifo": (position.fifo_realised * scale, position.fifo_realised_usd),
+    }
+    labels = {"average": "Average Cost", "fifo": "FIFO"}
+    
+    return html.Div([
+        dbc.Row([
+            dbc.Col([
+                html.H6("Trades", className="mb-2"),
                 dbc.Table([
-                    html.Thead([
-                        html.Tr([
-                            html.Th("Instrument"),
-                            html.Th("Quantity"),
-                            html.Th("Avg Cost"),
-                            html.Th("Current Price"),
-                            html.Th("Market Value"),
-                            html.Th("P&L (Local)"),
-                            html.Th("P&L (USD)"),
-                            html.Th("P&L %"),
-                            html.Th("Weight"),
-                            html.Th("Actions")
-                        ])
-                    ]),
+                    html.Thead(html.Tr([
+                        html.Th("Date"), html.Th("Quantity"), html.Th("Price"), html.Th("Fees"), html.Th("FX Rate")
+                    ])),
                     html.Tbody([
                         html.Tr([
-                            # Instrument details
-                            html.Td([
-                                html.Div(holding["ticker"], className="fw-bold"),
-                                html.Small(holding["name"], className="text-muted d-block")
-                            ]),
-                            html.Td(f"{holding['quantity']:,.0f}"),
-                            html.Td(f"${holding['avg_cost']:.2f}"),
-                            html.Td(f"${holding['current_price']:.2f}"),
-                            html.Td(f"${holding['market_value']:,.2f}"),
-                            
-                            # P&L columns
-                            html.Td(
-                                [
-                                    html.I(
-                                        className="fas fa-caret-up me-1 text-success"
-                                        if holding['pnl_local'] > 0
-                                        else "fas fa-caret-down me-1 text-danger"
-                                    ),
-                                    f"${abs(holding['pnl_local']):,.2f}"
-                                ],
-                                className="text-success" if holding['pnl_local'] > 0 else "text-danger"
-                            ),
-                            html.Td(
-                                [
-                                    html.I(
-                                        className="fas fa-caret-up me-1 text-success"
-                                        if holding['pnl_usd'] > 0
-                                        else "fas fa-caret-down me-1 text-danger"
-                                    ),
-                                    f"${abs(holding['pnl_usd']):,.2f}"
-                                ],
-                                className="text-success" if holding['pnl_usd'] > 0 else "text-danger"
-                            ),
+                            html.Td(trade["trade_date"]),
                             html.Td(
-                                f"{holding['pnl_percent']:.2f}%",
-                                className="text-success" if holding['pnl_percent'] > 0 else "text-danger"
+                                f"{trade['quantity']:+,.0f}",
+                                className="text-success" if trade["quantity"] > 0 else "text-danger"
                             ),
-                            
-                            # Weight and actions
-                            html.Td(f"{holding['weight']:.1f}%"),
-                            html.Td([
-                                dbc.Button(
-                                    html.I(className="fas fa-chevron-down"),
-                                    color="link",
-                                    size="sm",
-                                    id={"type": "expand-trades", "index": holding["ticker"]},
-                                )
-                            ])
-                        ]) for holding in holdings
+                            html.Td(format_price(trade["price"], currency)),
+                            html.Td(format_price(trade.get("fees") or 0, currency)),
+                            html.Td(f"{trade.get('fx_rate') or 1.0:.4f}"),
+                        ]) for trade in reversed(position.trades)
+                    ])
+                ], size="sm", className="mb-0")
+            ], md=7),
+            dbc.Col([
+                html.H6("Open Lots (FIFO)", className="mb-2"),
+                dbc.Table([
+                    html.Thead(html.Tr([html.Th("Date"), html.Th("Quantity"), html.Th("Unit Cost")])),
+                    html.Tbody([
+                        html.Tr([
+                            html.Td(lot["trade_date"]),
+                            html.Td(f"{lot['quantity']:,.0f}"),
+                            html.Td(format_price(lot["unit_cost"], currency)),
+                        ]) for lot in position.open_lots()
+                    ])
+                ], size="sm", className="mb-2"),
+                *[
+                    html.Div([
+                        html.Span(f"Realised P&L ({labels[name]}): ", className="text-muted small"),
+                        html.Span(**pnl_cell(realised[name][0], prefix)),
+                        html.Span(" / ", className="text-muted"),
+                        html.Span(**pnl_cell(realised[name][1])),
                     ])
-                ], bordered=True, hover=True, responsive=True)
-            ], style={"overflowX": "auto"})
+                    for name in sorted(realised, key=lambda name: name != method)
+                ]
+            ], md=5),
+        ])
+    ], className="p-3 bg-dark")
+
+def create_trade_entry():
+    """Create the form for recording trades by hand."""
+    return dbc.Card([
+        dbc.CardHeader(html.H5("Record Trade", className="mb-0")),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    html.Label("Instrument"),
+                    dbc.Input(id="trade-ticker", type="text", placeholder="e.g. AAPL US Equity")
+                ], md=3),
+                dbc.Col([
+                    html.Label("Trade Date"),
+                    dbc.Input(id="trade-date", type="date")
+                ], md=2),
+                dbc.Col([
+                    html.Label("Quantity"),
+                    dbc.Input(id="trade-quantity", type="number", placeholder="Negative to sell")
+                ], md=2),
+                dbc.Col([
+                    html.Label("Price"),
+                    dbc.Input(id="trade-price", type="number", min=0)
+                ], md=1),
+                dbc.Col([
+                    html.Label("Currency"),
+                    dbc.Input(id="trade-currency", type="text", placeholder="Default")
+                ], md=1),
+                dbc.Col([
+                    html.Label("FX Rate"),
+                    dbc.Input(id="trade-fx-rate", type="number", min=0, placeholder="USD per unit")
+                ], md=1),
+                dbc.Col([
+                    html.Label("Fees"),
+                    dbc.Input(id="trade-fees", type="number", min=0, value=0)
+                ], md=1),
+                dbc.Col([
+                    html.Label("\u00a0"),
+                    dbc.Button(
+                        [html.I(className="fas fa-plus me-2"), "Add"],
+                        id="add-trade-btn",
+                        color="primary",
+                        className="w-100",
+                        n_clicks=0
+                    )
+                ], md=1),
+            ], className="mb-2"),
+            html.Div(id="add-trade-status")
         ])
     ], className="mb-4")
 
@@ -162,6 +314,17 @@ def create_allocation_charts():
             dbc.Row([
                 dbc.Col([
                     html.H6("Asset Allocation", className="text-center mb-3"),
+                    dbc.RadioItems(
+                        id="allocation-dimension",
+                        options=[
+                            {"label": "Sector", "value": "sector"},
+                            {"label": "Asset Class", "value": "asset_class"},
+                            {"label": "Currency", "value": "currency"}
+                        ],
+                        value="sector",
+                        inline=True,
+                        className="text-center mb-2"
+                    ),
                     dcc.Graph(
                         id="asset-allocation-chart",
                         config={"displayModeBar": False}
@@ -199,26 +362,50 @@ layout = dbc.Container([
         ], width=4)
     ], className="mb-4"),
     
-    # Portfolio selector
+    # Portfolio selector and cost basis method
     dbc.Row([
         dbc.Col([
+            # Options are loaded from the saved portfolios
             dbc.Select(
                 id="portfolio-selector",
+                options=[],
+                className="mb-4"
+            )
+        ], md=8),
+        dbc.Col([
+            dbc.RadioItems(
+                id="cost-method",
                 options=[
-                    {"label": "Growth Portfolio", "value": "growth"},
-                    {"label": "Income Portfolio", "value": "income"},
-                    {"label": "Balanced Portfolio", "value": "balanced"}
+                    {"label": "Average Cost", "value": "average"},
+                    {"label": "FIFO", "value": "fifo"}
                 ],
-                value="growth",
-                className="mb-4"
+                value="average",
+                inline=True,
+                className="float-end"
             )
-        ])
+        ], md=4)
     ]),
     
-    # Hidden stores for state management
-    dcc.Store(id="portfolio-data", data={}),
-    dcc.Store(id="holdings-data", data=[]),
+    # Manual trade entry
+    create_trade_entry(),
+    
+    # Handles of the portfolio and holdings data kept in the session store
+    dcc.Store(id="portfolio-data", data=None),
+    dcc.Store(id="holdings-data", data=None),
+    
+    # Incremented when a trade is recorded, to revalue the holdings
+    dcc.Store(id="trades-version", data=0),
+    
+    # Live price updates; the version is the last change applied
+    dcc.Store(id="live-prices-version", data=0),
+    dcc.Interval(id="live-prices-interval", interval=LIVE_PRICE_REFRESH_MS, disabled=True),
     
-    # Main content area with portfolio summary, holdings, and analysis
-    html.Div(id="monitor-content")
+    # Main content area with portfolio summary, holdings, and analysis; the
+    # components persist and are updated in place
+    html.Div("No portfolio data available", id="monitor-empty", className="text-center p-4"),
+    html.Div([
+        create_portfolio_summary(),
+        create_holdings_table(),
+        create_allocation_charts()
+    ], id="monitor-content", style={"display": "none"})
 ], fluid=True)
\ No newline at end of file
@@ -3,25 +3,49 @@ Bloomberg Terminal API client implementation.
 File: src/services/bloomberg_client.py
 """
 
-import blpapi
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
 import logging
-from datetime import datetime
+import threading
+import time
+from collections import deque
+from functools import partial
+from concurrent.futures import CancelledError, Future, TimeoutError, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
-import os
+
+from services.data_manager import LOCAL_CURRENCY, SeriesKey, get_history_cache
+from services.data_provider import blpapi
+from services.fx_engine import NON_CURRENCY_FIELDS, FXEngine
+from services.historical_decoder import block_to_frame, decode_historical_message, security_error
+from services.instrument_index import get_instrument_index
+from services.job_manager import JobCancelled
+from services.reference_cache import get_reference_cache
+from services.request_dispatcher import RequestDispatcher
+from services.search_cache import get_search_cache
+from services.telemetry import get_telemetry
+from utils.portfolio_engine import calculate_portfolio_timeseries
 
 logger = logging.getLogger(__name__)
 
-# Create file handler
-file_handler = logging.FileHandler('bloomberg_client.log')
-file_handler.setLevel(logging.INFO)
+# Longest time to wait for the final response of a single request
+REQUEST_TIMEOUT_SECONDS = 120
+
+# Large historical requests are split into batches of at most this many
+# securities and roughly this many data points (securities x days)
+MAX_SECURITIES_PER_REQUEST = 50
+MAX_POINTS_PER_REQUEST = 100_000
+
+# Batches sent concurrently, and retries for a batch that fails
+MAX_CONCURRENT_REQUESTS = 4
+MAX_REQUEST_RETRIES = 2
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
+# Securities per ReferenceDataRequest
+MAX_REFERENCE_SECURITIES_PER_REQUEST = 100
 
-# Add file handler to logger
-logger.addHandler(file_handler)
+# Securities Bloomberg reported a securityError for are not requested
+# again for this long
+SECURITY_ERROR_TTL_SECONDS = 3600
 
 
 """
@@ -38,14 +62,40 @@ class BloombergClient:
         self.session = None
         self._reference_data_service = None
         self.is_connected = False
+        self._instruments_service = None
+        self._dispatcher = None
+        # Set when the session goes down; the next request connects again
+        self._session_lost = False
+        self._connect_lock = threading.Lock()
+        # Expiry (time.monotonic()) and message by security with a securityError
+        self._security_errors: Dict[str, tuple] = {}
+        self._history_cache = get_history_cache()
+        self._search_cache = get_search_cache()
+        self._instrument_index = get_instrument_index()
+        self._reference_cache = get_reference_cache()
+        self._fx = FXEngine(self)
+        self._telemetry = get_telemetry()
+        self._cache_requests = self._telemetry.counter(
+            "pf_cache_requests_total", "Cache lookups by cache and result (hit, stale, miss)"
+        )
 
     def connect(self) -> bool:
         """
         Establish connection to Bloomberg Terminal.
         
+        A previous session is stopped first, together with its dispatcher.
+        
         Returns:
             bool: True if connection successful, False otherwise
         """
+        if blpapi is None:
+            logger.error("No data provider available, install blpapi or use DATA_PROVIDER=simulated")
+            return False
+        
+        if self.session is not None:
+            logger.info("Replacing the Bloomberg session")
+            self.disconnect()
+        
         try:
             # Initialize session options
             sessionOptions = blpapi.SessionOptions()
@@ -67,6 +117,20 @@ class BloombergClient:
                 return False
 
             self._reference_data_service = self.session.getService("//blp/refdata")
+            
+            # Open instrument search service up front; services are not
+            # opened while the event pump is reading the session
+            if self.session.openService("//blp/instruments"):
+                self._instruments_service = self.session.getService("//blp/instruments")
+            else:
+                logger.error("Failed to open //blp/instruments service")
+            
+            # All responses are routed by correlation ID from one pump thread
+            self._dispatcher = RequestDispatcher(
+                self.session, on_session_status=partial(self._session_status, self.session)
+            )
+            self._dispatcher.start()
+            self._session_lost = False
             self.is_connected = True
             logger.info("Successfully connected to Bloomberg Terminal")
             return True
@@ -78,198 +142,597 @@ class BloombergClient:
 
     def disconnect(self):
         """Disconnect from Bloomberg Terminal."""
+        if self._dispatcher:
+            self._dispatcher.stop()
+            self._dispatcher = None
+        self._reference_data_service = None
+        self._instruments_service = None
         if self.session:
-            self.session.stop()
+            try:
+                self.session.stop()
+            except Exception as e:
+                logger.error(f"Error stopping Bloomberg session: {str(e)}")
+            self.session = None
             self.is_connected = False
             logger.info("Disconnected from Bloomberg Terminal")
 
-    def get_historical_data(self, securities: List[str], weights: Dict[str, float], start_date: str, end_date: str, currency: str = "USD") -> Dict:
+    def _session_status(self, session, message_type: str):
+        """Follow the connection state of a session, reported by its dispatcher."""
+        if session is not self.session:
+            return
+        if message_type in ("SessionConnectionDown", "SessionTerminated"):
+            logger.warning(f"Bloomberg connection lost ({message_type}), reconnecting on the next request")
+            self.is_connected = False
+            self._session_lost = True
+
+    def _reconnect_if_lost(self) -> bool:
+        """
+        Replace a session that went down since it was connected.
+        
+        Clients that were never connected are left alone.
+        
+        Returns:
+            bool: Whether the client is connected
+        """
+        if self._session_lost:
+            with self._connect_lock:
+                if self._session_lost:
+                    logger.info("Reconnecting to Bloomberg")
+                    self.connect()
+        return self.is_connected
+
+    def get_historical_data(self, securities: List[str], weights: Dict[str, float], start_date: str, end_date: str, currency: str = "USD", rebalance: str = "none",
+                            progress_callback: Optional[Callable[[int, int], None]] = None,
+                            cancel_event: Optional[threading.Event] = None) -> Dict:
         """
         Get historical total return data for specified securities.
         
+        Data is served from the local history cache; only date ranges that
+        have not been fetched before are requested from Bloomberg. Histories
+        are stored in local currency and converted into the base currency
+        with cached FX curves.
+        
         Args:
             securities: List of security identifiers
             weights: Dictionary mapping security identifiers to their weights (in percent)
             start_date: Start date in YYYYMMDD format
             end_date: End date in YYYYMMDD format
             currency: Base currency for the data
+            rebalance: Portfolio rebalancing frequency ('none', 'daily', 'monthly', 'quarterly')
+            progress_callback: Called with (securities received, total securities)
+            cancel_event: When set, outstanding requests are cancelled and
+                JobCancelled is raised
             
         Returns:
-            Dict with security data and saves to CSV
+            Dict with security data and the calculated portfolio
         """
-        print('getting historical data')
-        os.makedirs("data", exist_ok=True)
-        
         cleaned_weights = {}
         for security, weight in weights.items():
             cleaned_security = security.replace("<equity>", " Equity").replace("  ", " ")
             cleaned_weights[cleaned_security] = weight
         
-        if not self._reference_data_service:
-            logger.error("Reference data service not available")
-            return {}
+        field = "TOT_RETURN_INDEX_GROSS_DVDS"
+        clean_securities = [
+            security.replace("<equity>", " Equity").replace("  ", " ")
+            for security in securities
+        ]
 
         try:
-            request = self._reference_data_service.createRequest("HistoricalDataRequest")
+            keys = self._fill_history(clean_securities, [field], start_date, end_date, LOCAL_CURRENCY,
+                                      progress_callback, cancel_event)
+
+            response_data = {}
+            for security in clean_securities:
+                df = self._history_cache.load(keys[(security, field)], start_date, end_date)
+                if not df.empty:
+                    response_data[security] = df
+            response_data = self._convert_histories(response_data, currency)
             
-            # Add securities
-            for security in securities:
-                clean_security = security.replace("<equity>", " Equity").replace("  ", " ")
-                request.getElement("securities").appendValue(clean_security)
-                
-            # Add total return field
-            request.getElement("fields").appendValue("TOT_RETURN_INDEX_GROSS_DVDS")
+            logger.info(f"Found data for {len(response_data)} of {len(clean_securities)} securities")
+            
+            # Calculate portfolio timeseries if we have data
+            if response_data:
+                # Pass cleaned weights to calculation
+                with self._telemetry.span("portfolio.timeseries"):
+                    portfolio_df = self._calculate_portfolio_timeseries(response_data, cleaned_weights, rebalance)
                 
-            # Set dates and currency
-            request.set("startDate", start_date)
-            request.set("endDate", end_date)
-            request.set("periodicitySelection", "DAILY")
-             # Add required elements from documentation
-            request.set("nonTradingDayFillOption", "ACTIVE_DAYS_ONLY")
-            request.set("nonTradingDayFillMethod", "PREVIOUS_VALUE")
-            request.set("overrideOption", "OVERRIDE_OPTION_CLOSE")
+                response_data['portfolio'] = portfolio_df
+                    
+            return response_data
+
+        except JobCancelled:
+            logger.info("Historical data request cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Error getting historical data: {str(e)}")
+            return {}
+
+    def get_historical_fields(self, securities: List[str], fields: List[str], start_date: str, end_date: str,
+                              currency: Optional[str] = None,
+                              progress_callback: Optional[Callable[[int, int], None]] = None,
+                              cancel_event: Optional[threading.Event] = None) -> pd.DataFrame:
+        """
+        Get several historical fields for securities as a date x security x field cube.
+        
+        Series already in the local history cache are not requested again;
+        everything else is fetched with one HistoricalDataRequest per batch
+        carrying all of the missing fields.
+        
+        Args:
+            securities: List of security identifiers
+            fields: Bloomberg fields, e.g. PX_LAST, TOT_RETURN_INDEX_GROSS_DVDS, PX_VOLUME
+            start_date: Start date in YYYYMMDD format
+            end_date: End date in YYYYMMDD format
+            currency: Base currency to convert amounts into, local currency if None
+            progress_callback: Called with (securities received, total securities)
+            cancel_event: When set, outstanding requests are cancelled and
+                JobCancelled is raised
             
-            if currency != "USD":
-                request.set("currency", currency)
+        Returns:
+            pd.DataFrame: Date indexed frame with (security, field) MultiIndex
+            columns, NaN where a series has no value; empty if nothing is available
+        """
+        clean_securities = list(dict.fromkeys(
+            security.replace("<equity>", " Equity").replace("  ", " ")
+            for security in securities
+        ))
+        fields = list(dict.fromkeys(fields))
 
-            logger.info(f"Sending historical data request for {len(securities)} securities")
-            self.session.sendRequest(request)
-            print(f'reques send: {request}')
+        try:
+            keys = self._fill_history(clean_securities, fields, start_date, end_date, LOCAL_CURRENCY,
+                                      progress_callback, cancel_event)
+
+            series = {}
+            for column, key in keys.items():
+                df = self._history_cache.load(key, start_date, end_date)
+                if not df.empty:
+                    series[column] = df["value"]
+            if not series:
+                return pd.DataFrame()
+
+            cube = pd.concat(series, axis=1).sort_index()
+            cube.columns.names = ["security", "field"]
             
+            if currency:
+                amounts = [column for column in cube.columns if column[1] not in NON_CURRENCY_FIELDS]
+                local = self.get_currencies(list(dict.fromkeys(security for security, _ in amounts)))
+                amounts = [column for column in amounts if local.get(column[0]) not in (None, currency)]
+                if amounts:
+                    cube[amounts] = self._fx.convert(cube[amounts], [local[s] for s, _ in amounts], currency)
+            return cube
+
+        except JobCancelled:
+            logger.info("Historical data request cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Error getting historical fields: {str(e)}")
+            return pd.DataFrame()
+
+    def get_currencies(self, securities: List[str]) -> Dict[str, str]:
+        """
+        Quote currency of each security, from the reference data cache.
+        
+        Returns:
+            Dict[str, str]: Currency by security, for the securities it is known for
+        """
+        reference = self.get_reference_data(securities, ["CRNCY"])
+        currencies = {
+            security: values["CRNCY"]
+            for security, values in reference.items() if values.get("CRNCY")
+        }
+        unknown = [security for security in securities if security not in currencies]
+        if unknown:
+            logger.warning(f"Currency unknown for {unknown}, values are left unconverted")
+        return currencies
+
+    def _convert_histories(self, histories: Dict[str, pd.DataFrame], currency: str) -> Dict[str, pd.DataFrame]:
+        """Convert local currency 'value' histories into a base currency."""
+        local = self.get_currencies(list(histories)) if histories else {}
+        convert = [security for security in histories if local.get(security) not in (None, currency)]
+        if not convert:
+            return histories
+        
+        wide = pd.concat({security: histories[security]["value"] for security in convert}, axis=1)
+        converted = self._fx.convert(wide, [local[security] for security in convert], currency)
+        result = dict(histories)
+        for security in convert:
+            result[security] = converted[security].loc[histories[security].index].to_frame("value")
+        return result
 
+    def _fill_history(self, securities: List[str], fields: List[str], start_date: str, end_date: str,
+                      currency: str, progress_callback: Optional[Callable[[int, int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict[tuple, SeriesKey]:
+        """
+        Fetch whatever the history cache is missing for securities and fields.
+        
+        Without a connection the cached part of the range is still
+        returned; the missing ranges are logged and left out.
+        
+        Returns:
+            Cache key by (security, field)
+        """
+        self._reconnect_if_lost()
+        keys = {
+            (security, field): SeriesKey(security, field, currency, "DAILY")
+            for security in securities
+            for field in fields
+        }
+
+        # Securities Bloomberg recently rejected are served from the cache only
+        now = time.monotonic()
+        rejected = {security for security in securities
+                    if self._security_errors.get(security, (0,))[0] > now}
+        if rejected:
+            logger.debug(f"Not requesting {sorted(rejected)} again after a security error")
+
+        # Group by the date ranges securities are missing and the fields
+        # missing them, so that each request carries all of those fields
+        missing = {}
+        for (security, field), key in keys.items():
+            if security in rejected:
+                continue
+            for gap in self._history_cache.missing(key, start_date, end_date):
+                missing.setdefault((security, gap), []).append(field)
+        gaps = {}
+        for (security, gap), gap_fields in missing.items():
+            gaps.setdefault((gap, tuple(gap_fields)), []).append(security)
+
+        if gaps and not self._reference_data_service:
+            uncovered = sorted({security for gap_securities in gaps.values() for security in gap_securities})
+            logger.warning(
+                f"Reference data service not available, serving cached history only; "
+                f"{len(gaps)} ranges missing for {uncovered}"
+            )
+            return keys
+
+        # A security counts as received once all of its gaps are filled
+        outstanding = {security: 0 for security in securities}
+        for gap_securities in gaps.values():
+            for security in gap_securities:
+                outstanding[security] += 1
+        received = [sum(1 for count in outstanding.values() if count == 0)]
+        self._cache_requests.inc(received[0], cache="history", result="hit")
+        self._cache_requests.inc(len(outstanding) - received[0], cache="history", result="miss")
+
+        def gap_done(security):
+            outstanding[security] -= 1
+            if outstanding[security] == 0:
+                received[0] += 1
+                if progress_callback:
+                    progress_callback(received[0], len(outstanding))
+
+        if progress_callback:
+            progress_callback(received[0], len(outstanding))
+
+        with self._telemetry.span("history.fetch"):
+            self._fetch_gaps(gaps, keys, currency, gap_done, cancel_event)
+
+        logger.info(
+            f"History cache: {len(outstanding)} securities x {len(fields)} fields, "
+            f"{len(gaps)} ranges fetched from Bloomberg"
+        )
+        return keys
+
+    def _split_batches(self, securities: List[str], start_date, end_date, field_count: int = 1) -> List[List[str]]:
+        """
+        Split securities into request sized batches.
+        
+        A batch holds at most MAX_SECURITIES_PER_REQUEST securities and at
+        most roughly MAX_POINTS_PER_REQUEST data points (securities x days x fields).
+        """
+        days = max(int(np.busday_count(start_date, end_date + timedelta(days=1))), 1)
+        batch_size = max(1, min(MAX_SECURITIES_PER_REQUEST, MAX_POINTS_PER_REQUEST // (days * max(field_count, 1))))
+        return [securities[i:i + batch_size] for i in range(0, len(securities), batch_size)]
+
+    def _fetch_gaps(self, gaps: Dict, keys: Dict[tuple, SeriesKey], currency: str,
+                    on_done: Callable[[str], None], cancel_event: Optional[threading.Event] = None):
+        """
+        Fetch missing date ranges in batches, several requests at a time.
+        
+        Each batch is written to the cache as soon as it completes. A failed
+        batch is retried on its own for the securities it did not deliver;
+        batches that keep failing are skipped so that everything else is
+        still returned. Securities reported as invalid are remembered for
+        SECURITY_ERROR_TTL_SECONDS rather than retried.
+        
+        Args:
+            gaps: Mapping of ((start, end), fields) to the securities missing
+                those fields over that date range
+            keys: Cache key for each (security, field)
+            currency: Currency override for the data
+            on_done: Called once per security and gap when it has been handled
+            cancel_event: When set, outstanding requests are cancelled and
+                JobCancelled is raised
+        """
+        queued_at = time.perf_counter()
+        pending = deque(
+            {"securities": batch, "fields": list(gap_fields), "start": gap_start, "end": gap_end,
+             "attempt": 0, "queued_at": queued_at}
+            for ((gap_start, gap_end), gap_fields), gap_securities in gaps.items()
+            for batch in self._split_batches(gap_securities, gap_start, gap_end, len(gap_fields))
+        )
+        logger.info(f"Fetching {len(gaps)} missing ranges in {len(pending)} requests")
+        in_flight = {}
+        
+        def finish(batch, received, errors, error):
+            """Store what a batch delivered, then retry or give up on the rest."""
+            # Keep whatever arrived, even from a failed batch
+            for security in batch["securities"]:
+                if security in received:
+                    for field in batch["fields"]:
+                        self._history_cache.store_range(
+                            keys[(security, field)], block_to_frame(received[security], field),
+                            batch["start"], batch["end"]
+                        )
             
+            if errors:
+                expires = time.monotonic() + SECURITY_ERROR_TTL_SECONDS
+                for security, message in errors.items():
+                    self._security_errors[security] = (expires, message)
+                logger.warning(f"History request rejected {len(errors)} securities: {errors}")
             
-            response_data = {}
-            print(f'Starting data processing for {len(securities)} securities')
+            remaining = [
+                security for security in batch["securities"]
+                if security not in received and security not in errors
+            ]
+            if error is not None and remaining and batch["attempt"] < MAX_REQUEST_RETRIES:
+                logger.warning(
+                    f"History request for {len(remaining)} securities failed ({error}), "
+                    f"retrying (attempt {batch['attempt'] + 1} of {MAX_REQUEST_RETRIES})"
+                )
+                pending.append(dict(
+                    batch, securities=remaining, attempt=batch["attempt"] + 1, queued_at=time.perf_counter()
+                ))
+                remaining = []
+            elif error is not None:
+                logger.error(f"History request for {remaining} failed: {error}")
             
-            while True:
-                ev = self.session.nextEvent(500)
+            for security in batch["securities"]:
+                if security in received or security in errors or security in remaining:
+                    on_done(security)
+        
+        while pending or in_flight:
+            # Keep up to MAX_CONCURRENT_REQUESTS batches in flight
+            while pending and len(in_flight) < MAX_CONCURRENT_REQUESTS:
+                batch = pending.popleft()
+                received, errors = {}, {}
+                request = self._build_historical_request(
+                    batch["securities"], batch["fields"],
+                    batch["start"].strftime("%Y%m%d"), batch["end"].strftime("%Y%m%d"),
+                    currency
+                )
                 
-                for msg in ev:
-                    print(f'Processing message type: {msg.messageType()}')
-                    if msg.hasElement("securityData"):
-                        security_data = msg.getElement("securityData")
-                        security = security_data.getElementAsString("security")
-                        print(f'Processing data for security: {security}')
-                        
-                        # Initialize data for this security
-                        dates = []
-                        values = []
-                        
-                        # Get the field data
-                        field_data = security_data.getElement("fieldData")
-                        num_points = field_data.numValues()
-                        print(f'Found {num_points} data points for {security}')
-                        
-                        # Process each data point
-                        for i in range(field_data.numValues()):
-                            point = field_data.getValueAsElement(i)
-                            date = point.getElementAsString("date")
-                            
-                            if point.hasElement("TOT_RETURN_INDEX_GROSS_DVDS"):
-                                value = point.getElementAsFloat("TOT_RETURN_INDEX_GROSS_DVDS")
-                                dates.append(date)
-                                values.append(value)
-                        
-                        # Store data in DataFrame
-                        df = pd.DataFrame({
-                            'date': dates,
-                            'value': values
-                        })
-                        print(f'Created DataFrame for {security} with {len(df)} rows')
-                        df['date'] = pd.to_datetime(df['date'])
-                        df.set_index('date', inplace=True)
-                        
-                        # Save individual security data
-                        try:
-                            csv_filename = f"data/{security.replace(' ', '_')}_{currency}_{start_date}_{end_date}.csv"
-                            df.to_csv(csv_filename)
-                            print(f'Successfully saved data for {security} to {csv_filename}')
-                        except Exception as e:
-                            logger.error(f"Failed to save CSV for {security}: {str(e)}")
-                        
-                        response_data[security] = df
+                def handle_message(msg, received=received, errors=errors, fields=batch["fields"]):
+                    block = decode_historical_message(msg, fields)
+                    if block is not None:
+                        received[block.security] = block
+                        return
+                    rejected = security_error(msg)
+                    if rejected is not None:
+                        errors[rejected[0]] = rejected[1]
                 
-                if ev.eventType() == blpapi.Event.RESPONSE:
-                    print('Received final RESPONSE event')
-                    break
+                try:
+                    future = self._dispatcher.send(request, handle_message, queued_at=batch["queued_at"])
+                except Exception as e:
+                    # Never sent, so there is nothing in flight to wait for or cancel
+                    finish(batch, received, errors, e)
+                    continue
+                in_flight[future] = (batch, received, errors, time.monotonic())
             
-            print(f'Completed data collection. Found data for {len(response_data)} securities')
+            if cancel_event is not None and cancel_event.is_set():
+                for future in in_flight:
+                    self._dispatcher.cancel(future)
+                raise JobCancelled()
             
-            # Calculate and save portfolio timeseries if we have data
-            if response_data:
-                print("Data verification:")
-                for security, df in response_data.items():
-                    print(f"{security}: {len(df)} rows, date range: {df.index.min()} to {df.index.max()}")
-                print('Calculating portfolio timeseries')
-                # Pass cleaned weights to calculation
-                portfolio_df = self._calculate_portfolio_timeseries(response_data, cleaned_weights)
-                portfolio_filename = f"data/portfolio_{currency}_{start_date}_{end_date}.csv"
-                portfolio_df.to_csv(portfolio_filename)
-                print(f'Saved portfolio data to {portfolio_filename}')
+            if not in_flight:
+                continue
+            wait(list(in_flight), timeout=0.25, return_when=FIRST_COMPLETED)
+            
+            for future in list(in_flight):
+                batch, received, errors, sent_at = in_flight[future]
+                if not future.done():
+                    if time.monotonic() - sent_at < REQUEST_TIMEOUT_SECONDS:
+                        continue
+                    self._dispatcher.cancel(future)
+                del in_flight[future]
                 
-                response_data['portfolio'] = portfolio_df
-                print('Added portfolio data to response')
-                    
-            return response_data
+                finish(batch, received, errors, "timed out" if future.cancelled() else future.exception())
 
-        except Exception as e:
-            logger.error(f"Error getting historical data: {str(e)}")
-            return {}
+    def _build_historical_request(self, securities: List[str], fields: List[str], start_date: str, end_date: str, currency: str = LOCAL_CURRENCY):
+        """
+        Create a HistoricalDataRequest.
+        
+        Args:
+            securities: List of cleaned security identifiers
+            fields: Bloomberg fields to request
+            start_date: Start date in YYYYMMDD format
+            end_date: End date in YYYYMMDD format
+            currency: Currency override for the data, or LOCAL_CURRENCY for none
+            
+        Returns:
+            The blpapi request, ready to send
+        """
+        request = self._reference_data_service.createRequest("HistoricalDataRequest")
+        
+        # Add securities
+        for security in securities:
+            request.getElement("securities").appendValue(security)
+            
+        for field in fields:
+            request.getElement("fields").appendValue(field)
+            
+        # Set dates and currency
+        request.set("startDate", start_date)
+        request.set("endDate", end_date)
+        request.set("periodicitySelection", "DAILY")
+         # Add required elements from documentation
+        request.set("nonTradingDayFillOption", "ACTIVE_DAYS_ONLY")
+        request.set("nonTradingDayFillMethod", "PREVIOUS_VALUE")
+        request.set("overrideOption", "OVERRIDE_OPTION_CLOSE")
+        
+        if currency and currency != LOCAL_CURRENCY:
+            request.set("currency", currency)
+        
+        return request
 
-    def _calculate_portfolio_timeseries(self, security_data: Dict[str, pd.DataFrame], weights: Dict[str, float]) -> pd.DataFrame:
+    def _wait_for(self, future: Future, cancel_event: Optional[threading.Event] = None):
+        """
+        Wait for a dispatched request to complete.
+        
+        Args:
+            future: Future returned by the dispatcher
+            cancel_event: When set, the request is cancelled and JobCancelled raised
+        """
+        waited = 0.0
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self._dispatcher.cancel(future)
+                raise JobCancelled()
+            try:
+                return future.result(timeout=0.25)
+            except TimeoutError:
+                waited += 0.25
+                if waited >= REQUEST_TIMEOUT_SECONDS:
+                    self._dispatcher.cancel(future)
+                    raise TimeoutError(f"No response from Bloomberg after {REQUEST_TIMEOUT_SECONDS}s")
+            except CancelledError:
+                raise JobCancelled()
+
+    def _calculate_portfolio_timeseries(self, security_data: Dict[str, pd.DataFrame], weights: Dict[str, float], rebalance: str = "none") -> pd.DataFrame:
         """
         Calculate weighted portfolio timeseries with rebased values.
         Each security's timeseries is rebased to 100 at the start date.
         """
         try:
-            # Get all dates from all securities
-            all_dates = pd.DatetimeIndex([])
-            for df in security_data.values():
-                all_dates = all_dates.union(df.index)
-            all_dates = all_dates.sort_values()
+            return calculate_portfolio_timeseries(security_data, weights, rebalance)
+        except Exception as e:
+            logger.error(f"Error in portfolio calculation: {str(e)}")
+            return pd.DataFrame()
+
+    def get_reference_data(self, securities: List[str], fields: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get reference data, including bulk fields, for securities.
+        
+        Values are served from the reference data cache while they are
+        within their field's TTL. Everything else is fetched with batched
+        ReferenceDataRequests, one per group of securities missing the same
+        fields. If Bloomberg is unavailable, expired cached values are
+        returned instead.
+        
+        Args:
+            securities: List of security identifiers
+            fields: Bloomberg field mnemonics
             
-            # Create empty DataFrame with all dates
-            portfolio_df = pd.DataFrame(index=all_dates)
+        Returns:
+            Dict[str, Dict[str, Any]]: Values by security and field; bulk
+            fields are DataFrames with one row per bulk value
+        """
+        missing = self._reference_cache.missing(securities, fields)
+        self._cache_requests.inc(len(set(securities)) - len(missing), cache="reference", result="hit")
+        self._cache_requests.inc(len(missing), cache="reference", result="miss")
+        if missing and self._reconnect_if_lost():
+            by_fields: Dict[tuple, List[str]] = {}
+            for security, stale_fields in missing.items():
+                by_fields.setdefault(tuple(stale_fields), []).append(security)
+            batches = [
+                (batch_fields, group[i:i + MAX_REFERENCE_SECURITIES_PER_REQUEST])
+                for batch_fields, group in by_fields.items()
+                for i in range(0, len(group), MAX_REFERENCE_SECURITIES_PER_REQUEST)
+            ]
+            logger.info(f"Fetching reference data for {len(missing)} securities in {len(batches)} requests")
+            queued_at = time.perf_counter()
             
-            # Add normalized and weighted securities
-            for security, df in security_data.items():
-                if security in weights:
-                    print(f"Processing security {security} with weight {weights[security]}")
-                    weight = weights[security] / 100.0
+            for start in range(0, len(batches), MAX_CONCURRENT_REQUESTS):
+                wave = []
+                for batch_fields, batch_securities in batches[start:start + MAX_CONCURRENT_REQUESTS]:
+                    received = {security: dict.fromkeys(batch_fields) for security in batch_securities}
                     
-                    # Reindex to align dates and fill missing values
-                    aligned_series = df['value'].reindex(all_dates).fillna(method='ffill')
+                    def handle_message(msg, received=received):
+                        for security, values in self._decode_reference_message(msg):
+                            received.setdefault(security, {}).update(values)
                     
-                    # Normalize series to 100 at start date
-                    initial_value = aligned_series.iloc[0]
-                    normalized_series = (aligned_series / initial_value) * 100
-                    
-                    # Apply weight to normalized series
-                    portfolio_df[security] = normalized_series * weight
-                    print(f"Added weighted series for {security}:")
-                    print(f"Initial value: {initial_value:.2f}")
-                    print(f"Normalized range - Min: {normalized_series.min():.2f}, Max: {normalized_series.max():.2f}")
-                    print(f"Weighted range - Min: {portfolio_df[security].min():.2f}, Max: {portfolio_df[security].max():.2f}")
-                else:
-                    print(f"Warning: Security {security} not found in weights dictionary {weights}")
-            
-            # Calculate portfolio total
-            portfolio_df['portfolio_value'] = portfolio_df.sum(axis=1)
-            print(f"Portfolio calculation complete. Shape: {portfolio_df.shape}")
-            print(f"Portfolio value range - Min: {portfolio_df['portfolio_value'].min():.2f}, Max: {portfolio_df['portfolio_value'].max():.2f}")
-            
-            return portfolio_df
+                    try:
+                        request = self._build_reference_request(batch_securities, list(batch_fields))
+                        wave.append((self._dispatcher.send(request, handle_message, queued_at=queued_at), received))
+                    except Exception as e:
+                        logger.error(f"Error sending reference data request: {str(e)}")
                 
-        except Exception as e:
-            print(f"Error in portfolio calculation: {str(e)}")
-            return pd.DataFrame()
+                for future, received in wave:
+                    try:
+                        self._wait_for(future)
+                    except Exception as e:
+                        logger.error(f"Reference data request failed: {str(e)}")
+                        continue
+                    self._reference_cache.put_many(received)
+                    self._instrument_index.add(
+                        {"ticker": security, "name": values["NAME"], **({"currency": values["CRNCY"]} if values.get("CRNCY") else {})}
+                        for security, values in received.items() if values.get("NAME")
+                    )
+        
+        return self._reference_cache.get_many(securities, fields, allow_stale=True)
+
+    def _build_reference_request(self, securities: List[str], fields: List[str]):
+        """Create a ReferenceDataRequest for securities and fields."""
+        request = self._reference_data_service.createRequest("ReferenceDataRequest")
+        for security in securities:
+            request.getElement("securities").appendValue(security)
+        for field in fields:
+            request.getElement("fields").appendValue(field)
+        return request
 
+    def _decode_reference_message(self, msg) -> List[tuple]:
+        """
+        Decode one ReferenceDataResponse message.
         
+        Returns:
+            List of (security, {field: value}) pairs
+        """
+        results = []
+        if not msg.hasElement("securityData"):
+            return results
+        security_data = msg.getElement("securityData")
+        for i in range(security_data.numValues()):
+            sec_data = security_data.getValueAsElement(i)
+            security = sec_data.getElementAsString("security")
+            if sec_data.hasElement("securityError"):
+                logger.error(f"Security error for {security}: {sec_data.getElement('securityError')}")
+                continue
+            if sec_data.hasElement("fieldExceptions"):
+                exceptions = sec_data.getElement("fieldExceptions")
+                for j in range(exceptions.numValues()):
+                    exception = exceptions.getValueAsElement(j)
+                    logger.warning(f"Field exception for {security}: {exception}")
+            
+            values = {}
+            if sec_data.hasElement("fieldData"):
+                field_data = sec_data.getElement("fieldData")
+                for j in range(field_data.numElements()):
+                    element = field_data.getElement(j)
+                    field = str(element.name())
+                    values[field] = self._decode_bulk_element(element) if element.isArray() else element.getValue()
+            results.append((security, values))
+        return results
+
+    def _decode_bulk_element(self, element) -> pd.DataFrame:
+        """Decode a bulk field into a DataFrame with one row per value."""
+        columns: Dict[str, list] = {}
+        rows = element.numValues()
+        for j in range(rows):
+            row = element.getValueAsElement(j)
+            for k in range(row.numElements()):
+                sub_element = row.getElement(k)
+                column = columns.setdefault(str(sub_element.name()), [None] * rows)
+                column[j] = None if sub_element.isNull() else sub_element.getValue()
+        return pd.DataFrame(columns)
+
     def search_securities(self, query: str, max_results: int = 20) -> List[Dict]:
         """
         Search for securities using Bloomberg's API.
         
+        Results are served from the search cache when possible, then from
+        the local instrument index when it has a full page of matches or
+        Bloomberg is not available.
+        
         Args:
             query (str): Search query string
             max_results (int): Maximum number of results to return
@@ -277,54 +740,86 @@ class BloombergClient:
         Returns:
             List[Dict]: List of security information dictionaries
         """
-        if not self.is_connected:
+        cached = self._search_cache.get(query, max_results)
+        if cached is not None:
+            logger.info(f"Search cache hit for query: {query}")
+            self._cache_requests.inc(cache="search", result="hit")
+            return cached
+
+        local = self._instrument_index.search(query, max_results)
+        if len(local) >= max_results:
+            logger.info(f"Local index answered query: {query}")
+            self._cache_requests.inc(cache="instrument_index", result="hit")
+            return local
+        self._cache_requests.inc(cache="search", result="miss")
+
+        if not self._reconnect_if_lost():
             logger.error("Not connected to Bloomberg")
-            return []
+            return local
+
+        if not self._instruments_service:
+            logger.error("Instruments service not available")
+            return local
 
         try:
-            # First open the instruments service
-            if not self.session.openService("//blp/instruments"):
-                logger.error("Failed to open //blp/instruments service")
-                return []
-                
-            instrumentsService = self.session.getService("//blp/instruments")
-            
             # Create instruments search request
-            request = instrumentsService.createRequest("instrumentListRequest")
+            request = self._instruments_service.createRequest("instrumentListRequest")
             request.set("query", query)
             request.set("maxResults", max_results)
             
-            logger.info(f"Sending security search request for query: {query}")
-            self.session.sendRequest(request)
-            
             results = []
-            while True:
-                event = self.session.nextEvent(500)
-                
-                for msg in event:
-                    if msg.messageType() == blpapi.Name("InstrumentListResponse"):
-                        instruments = msg.getElement("results")
-                        for i in range(instruments.numValues()):
-                            instrument = instruments.getValueAsElement(i)
-                            security_info = {
-                                "ticker": instrument.getElementAsString("security"),
-                                "name": instrument.getElementAsString("description") if instrument.hasElement("description") else "",
-                                "security_type": instrument.getElementAsString("securityType") if instrument.hasElement("securityType") else "",
-                                "currency": instrument.getElementAsString("currency") if instrument.hasElement("currency") else "",
-                                "exchange": instrument.getElementAsString("exchange") if instrument.hasElement("exchange") else "",
-                                "market_sector": instrument.getElementAsString("marketSector") if instrument.hasElement("marketSector") else ""
-                            }
-                            results.append(security_info)
-                
-                if event.eventType() == blpapi.Event.RESPONSE:
-                    break
+            
+            def handle_message(msg):
+                results.extend(self._decode_instrument_message(msg))
+            
+            logger.info(f"Sending security search request for query: {query}")
+            self._wait_for(self._dispatcher.send(request, handle_message))
                     
             logger.info(f"Found {len(results)} matching securities")
-            return results[:max_results]
+            self._search_cache.put(query, max_results, results)
+            self._instrument_index.add(results)
+            return [dict(result) for result in results[:max_results]]
             
         except Exception as e:
             logger.error(f"Error during security search: {str(e)}")
-            return []
+            return local
+
+    def get_instrument(self, ticker: str) -> Optional[Dict]:
+        """
+        Get security information for a ticker.
+        
+        Tickers seen in earlier search results are answered locally;
+        anything else falls back to a search.
+        
+        Args:
+            ticker (str): Bloomberg ticker
+            
+        Returns:
+            Optional[Dict]: Security information dictionary, if found
+        """
+        instrument = self._search_cache.get_instrument(ticker) or self._instrument_index.get(ticker)
+        if instrument is not None:
+            return instrument
+        results = self.search_securities(ticker)
+        return next((r for r in results if r["ticker"] == ticker), None)
+
+    def _decode_instrument_message(self, msg) -> List[Dict]:
+        """Decode one InstrumentListResponse message into security info dictionaries."""
+        results = []
+        if msg.messageType() == blpapi.Name("InstrumentListResponse"):
+            instruments = msg.getElement("results")
+            for i in range(instruments.numValues()):
+                instrument = instruments.getValueAsElement(i)
+                security_info = {
+                    "ticker": instrument.getElementAsString("security"),
+                    "name": instrument.getElementAsString("description") if instrument.hasElement("description") else "",
+                    "security_type": instrument.getElementAsString("securityType") if instrument.hasElement("securityType") else "",
+                    "currency": instrument.getElementAsString("currency") if instrument.hasElement("currency") else "",
+                    "exchange": instrument.getElementAsString("exchange") if instrument.hasElement("exchange") else "",
+                    "market_sector": instrument.getElementAsString("marketSector") if instrument.hasElement("marketSector") else ""
+                }
+                results.append(security_info)
+        return results
 
 
     def __enter__(self):
@@ -0,0 +1,410 @@
+"""
+Local time-series store and cache for Bloomberg historical data.
+File: src/services/data_manager.py
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.path.join("data", "store")
+
+# A cached series is identified by what was asked of Bloomberg, not by the
+# date window it was asked for.
+SeriesKey = namedtuple("SeriesKey", ["security", "field", "currency", "periodicity"])
+
+# Currency of series stored as Bloomberg quotes them, without an override
+LOCAL_CURRENCY = "LOCAL"
+
+DateRange = Tuple[date, date]
+
+
+def to_date(value) -> date:
+    """
+    Convert a Bloomberg style date string or datetime-like value to a date.
+
+    Args:
+        value: 'YYYYMMDD' / 'YYYY-MM-DD' string, date, datetime or Timestamp
+
+    Returns:
+        date: The calendar date
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and len(value) == 8 and value.isdigit():
+        return datetime.strptime(value, "%Y%m%d").date()
+    return pd.Timestamp(value).date()
+
+
+def merge_ranges(ranges: Iterable[DateRange]) -> List[DateRange]:
+    """
+    Merge overlapping or adjacent date ranges.
+
+    Args:
+        ranges: Inclusive (start, end) date ranges
+
+    Returns:
+        List[DateRange]: Sorted, non-overlapping ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered: List[DateRange], start: date, end: date) -> List[DateRange]:
+    """
+    Work out which parts of [start, end] are not covered yet.
+
+    Args:
+        covered: Merged ranges already fetched
+        start: First date wanted
+        end: Last date wanted
+
+    Returns:
+        List[DateRange]: Inclusive gaps that still need to be fetched
+    """
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - timedelta(days=1)))
+        cursor = covered_end + timedelta(days=1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class TimeSeriesStore:
+    """
+    Columnar on-disk store for date indexed float series.
+
+    Every series gets its own partition directory holding two raw binary
+    columns (int64 nanosecond dates and float64 values) plus a small JSON
+    metadata file. Columns are memory-mapped on read so loading a series
+    costs a file map rather than a parse. New dates after the last stored
+    one are appended in place; anything else is written to a new file
+    generation so readers holding a map of the old files are unaffected.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding one partition per series
+        """
+        self.root = root
+        self._lock = threading.RLock()
+        self._meta: Dict[SeriesKey, Dict] = {}
+        self._columns: Dict[SeriesKey, Tuple[np.ndarray, np.ndarray]] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def partition_path(self, key: SeriesKey) -> str:
+        """Return the partition directory for a series."""
+        security = key.security.replace(" ", "_").replace("/", "-")
+        return os.path.join(self.root, key.periodicity, key.currency, key.field, security)
+
+    def _column_paths(self, key: SeriesKey, generation: int) -> Tuple[str, str]:
+        """Return the date and value column file paths for a generation."""
+        path = self.partition_path(key)
+        return (os.path.join(path, f"dates-{generation}.i8"),
+                os.path.join(path, f"values-{generation}.f8"))
+
+    def meta(self, key: SeriesKey) -> Dict:
+        """
+        Return the metadata of a series.
+
+        Returns:
+            Dict: 'generation', 'rows' and 'coverage' (list of ISO date pairs)
+        """
+        with self._lock:
+            if key not in self._meta:
+                meta = {"generation": 0, "rows": 0, "coverage": []}
+                meta_path = os.path.join(self.partition_path(key), "meta.json")
+                try:
+                    if os.path.exists(meta_path):
+                        with open(meta_path) as f:
+                            meta.update(json.load(f))
+                except Exception as e:
+                    logger.error(f"Failed to read store metadata for {key}: {str(e)}")
+                self._meta[key] = meta
+            return self._meta[key]
+
+    def _write_meta(self, key: SeriesKey, meta: Dict):
+        """Atomically replace the metadata file of a series."""
+        meta = dict(meta, key=key._asdict(), updated=datetime.now().isoformat(timespec="seconds"))
+        path = self.partition_path(key)
+        tmp_path = os.path.join(path, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, "meta.json"))
+        self._meta[key] = meta
+
+    def read(self, key: SeriesKey) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the memory-mapped date and value columns of a series.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: datetime64[ns] dates and float64 values
+        """
+        with self._lock:
+            if key in self._columns:
+                return self._columns[key]
+            meta = self.meta(key)
+            rows = meta["rows"]
+            if rows == 0:
+                columns = (np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype="float64"))
+            else:
+                dates_path, values_path = self._column_paths(key, meta["generation"])
+                columns = (
+                    np.memmap(dates_path, dtype="datetime64[ns]", mode="r", shape=(rows,)),
+                    np.memmap(values_path, dtype="float64", mode="r", shape=(rows,)),
+                )
+            self._columns[key] = columns
+            return columns
+
+    def read_frame(self, key: SeriesKey, start=None, end=None) -> pd.DataFrame:
+        """
+        Load a series as a DataFrame backed by the memory-mapped columns.
+
+        Args:
+            key: Series identifier
+            start: Optional first date to include
+            end: Optional last date to include
+
+        Returns:
+            pd.DataFrame: Date indexed, read-only frame with a 'value' column
+        """
+        dates, values = self.read(key)
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = np.searchsorted(dates, np.datetime64(to_date(start), "ns"), side="left")
+        if end is not None:
+            hi = np.searchsorted(dates, np.datetime64(to_date(end), "ns"), side="right")
+        return pd.DataFrame(
+            values[lo:hi].reshape(-1, 1),
+            index=pd.DatetimeIndex(dates[lo:hi], name="date"),
+            columns=["value"],
+            copy=False
+        )
+
+    def write(self, key: SeriesKey, data: Optional[pd.DataFrame], coverage: List[DateRange]):
+        """
+        Merge new data points into a series and record its coverage.
+
+        Args:
+            key: Series identifier
+            data: Date indexed frame with a 'value' column (may be empty)
+            coverage: Merged date ranges fetched so far
+        """
+        with self._lock:
+            meta = dict(self.meta(key))
+            os.makedirs(self.partition_path(key), exist_ok=True)
+            meta["coverage"] = [[s.isoformat(), e.isoformat()] for s, e in coverage]
+
+            if data is not None and not data.empty:
+                data = data[~data.index.duplicated(keep="last")].sort_index()
+                new_dates = data.index.values.astype("datetime64[ns]")
+                new_values = data["value"].to_numpy(dtype="float64")
+                dates, values = self.read(key)
+
+                if len(dates) and new_dates[0] > dates[-1]:
+                    # Pure append: extend the current generation in place
+                    dates_path, values_path = self._column_paths(key, meta["generation"])
+                    with open(dates_path, "ab") as f:
+                        f.write(new_dates.tobytes())
+                    with open(values_path, "ab") as f:
+                        f.write(new_values.tobytes())
+                    meta["rows"] = len(dates) + len(new_dates)
+                else:
+                    # Overlapping or earlier dates: merge into a new generation
+                    merged_dates = np.concatenate([new_dates, dates])
+                    merged_values = np.concatenate([new_values, values])
+                    merged_dates, first = np.unique(merged_dates, return_index=True)
+                    merged_values = merged_values[first]
+                    old_generation = meta["generation"]
+                    meta["generation"] = old_generation + 1
+                    dates_path, values_path = self._column_paths(key, meta["generation"])
+                    merged_dates.tofile(dates_path)
+                    merged_values.tofile(values_path)
+                    meta["rows"] = len(merged_dates)
+                    self._columns.pop(key, None)
+                    self._remove_generation(key, old_generation)
+                self._columns.pop(key, None)
+
+            self._write_meta(key, meta)
+
+    def _remove_generation(self, key: SeriesKey, generation: int):
+        """Delete superseded column files, leaving them if still mapped."""
+        for path in self._column_paths(key, generation):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                logger.debug(f"Column file {path} still in use, leaving it in place")
+
+
+class HistoricalDataCache:
+    """
+    Read-through cache of historical series keyed by SeriesKey.
+
+    Besides the data points, every entry records the date ranges that have
+    been requested from Bloomberg. Holidays and weekends inside a requested
+    range therefore count as covered and are never asked for again.
+    """
+
+    def __init__(self, store: Optional[TimeSeriesStore] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            store: Columnar store used for persistence
+        """
+        self.store = store or TimeSeriesStore()
+        self._lock = threading.RLock()
+
+    def coverage(self, key: SeriesKey) -> List[DateRange]:
+        """Return the merged date ranges already fetched for a series."""
+        meta = self.store.meta(key)
+        return [(to_date(s), to_date(e)) for s, e in meta.get("coverage", [])]
+
+    def missing(self, key: SeriesKey, start, end) -> List[DateRange]:
+        """
+        Return the parts of [start, end] that still have to be fetched.
+
+        Dates after today are not considered. Today is never covered, as
+        its close is not final yet, so a request ending today always asks
+        for the current day again.
+        """
+        start, end = to_date(start), min(to_date(end), date.today())
+        if start > end:
+            return []
+        return missing_ranges(self.coverage(key), start, end)
+
+    def load(self, key: SeriesKey, start=None, end=None) -> pd.DataFrame:
+        """
+        Load cached data points for a series.
+
+        Args:
+            key: Series identifier
+            start: Optional first date to include
+            end: Optional last date to include
+
+        Returns:
+            pd.DataFrame: Date indexed, read-only frame with a 'value' column
+        """
+        return self.store.read_frame(key, start, end)
+
+    def store_range(self, key: SeriesKey, data: Optional[pd.DataFrame], start, end):
+        """
+        Merge freshly fetched data into the cache and mark [start, end] covered.
+
+        Coverage ends with yesterday; data points of today are stored but
+        replaced when the day is fetched again.
+
+        Args:
+            key: Series identifier
+            data: Date indexed frame with a 'value' column (may be empty)
+            start: First date of the range that was requested
+            end: Last date of the range that was requested
+        """
+        start, end = to_date(start), min(to_date(end), date.today() - timedelta(days=1))
+        with self._lock:
+            coverage = self.coverage(key)
+            if start <= end:
+                coverage = merge_ranges(coverage + [(start, end)])
+            try:
+                self.store.write(key, data, coverage)
+            except Exception as e:
+                logger.error(f"Failed to write cache entry {key}: {str(e)}")
+
+
+LEGACY_CSV_PATTERN = re.compile(
+    r"^(?P<security>.+)_(?P<currency>[A-Z]{3})_(?P<start>\d{8})_(?P<end>\d{8})\.csv$"
+)
+
+
+def import_legacy_csvs(data_dir: str = "data", cache: Optional[HistoricalDataCache] = None,
+                       field: str = "TOT_RETURN_INDEX_GROSS_DVDS", remove: bool = False) -> int:
+    """
+    Import per-request CSV dumps ({security}_{currency}_{start}_{end}.csv)
+    written by earlier versions into the columnar store.
+
+    Args:
+        data_dir: Directory containing the CSV files
+        cache: Cache to import into, defaults to the shared instance
+        field: Bloomberg field the CSVs contain
+        remove: Delete each CSV after a successful import
+
+    Returns:
+        int: Number of files imported
+    """
+    cache = cache or get_history_cache()
+    imported = 0
+    for filename in sorted(os.listdir(data_dir)):
+        match = LEGACY_CSV_PATTERN.match(filename)
+        if not match or filename.startswith("portfolio_"):
+            continue
+        path = os.path.join(data_dir, filename)
+        try:
+            df = pd.read_csv(path, index_col="date", parse_dates=["date"])
+            # USD requests were sent without a currency override
+            currency = LOCAL_CURRENCY if match["currency"] == "USD" else match["currency"]
+            key = SeriesKey(match["security"].replace("_", " "), field, currency, "DAILY")
+            cache.store_range(key, df[["value"]], match["start"], match["end"])
+            imported += 1
+            if remove:
+                os.remove(path)
+            logger.info(f"Imported {len(df)} rows for {key.security} from {filename}")
+        except Exception as e:
+            logger.error(f"Failed to import {filename}: {str(e)}")
+    return imported
+
+
+# Create a singleton instance
+_history_cache = None
+
+
+def get_history_cache() -> HistoricalDataCache:
+    """
+    Get or create the historical data cache singleton instance.
+
+    Returns:
+        HistoricalDataCache: The cache instance
+    """
+    global _history_cache
+    if _history_cache is None:
+        _history_cache = HistoricalDataCache()
+    return _history_cache
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.data_manager [data_dir] [--remove]
+    logging.basicConfig(level=logging.INFO)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = import_legacy_csvs(args[0] if args else "data", remove="--remove" in sys.argv)
+    print(f"Imported {count} CSV files into {get_history_cache().store.root}")
@@ -0,0 +1,46 @@
+"""
+Selection of the market data provider.
+File: src/services/data_provider.py
+"""
+
+import importlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# A provider is a module implementing the blpapi session API
+DATA_PROVIDERS = {
+    "bloomberg": "blpapi",
+    "simulated": "services.simulated_blpapi",
+}
+
+# Chosen with the DATA_PROVIDER environment variable
+DATA_PROVIDER = os.environ.get("DATA_PROVIDER", "bloomberg").lower()
+
+
+def load_provider(name: str = DATA_PROVIDER):
+    """
+    Import the blpapi compatible module of a data provider.
+
+    Args:
+        name: Key of DATA_PROVIDERS
+
+    Returns:
+        The provider module, or None if it is not installed
+    """
+    if name not in DATA_PROVIDERS:
+        raise ValueError(f"Unknown data provider '{name}', expected one of {sorted(DATA_PROVIDERS)}")
+    try:
+        module = importlib.import_module(DATA_PROVIDERS[name])
+    except ImportError as e:
+        logger.warning(
+            f"Data provider '{name}' is not available ({str(e)}); "
+            f"set DATA_PROVIDER=simulated to run without a Bloomberg Terminal"
+        )
+        return None
+    logger.info(f"Using the {name} data provider")
+    return module
+
+
+blpapi = load_provider()
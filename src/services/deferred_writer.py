@@ -0,0 +1,61 @@
+"""
+Coalesced background writes of cache files.
+File: src/services/deferred_writer.py
+"""
+
+import atexit
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Time changes are collected before the file is written
+SAVE_DELAY_SECONDS = 2.0
+
+
+class DeferredWriter:
+    """
+    Writes a cache file at most once per delay, off the caller's thread.
+
+    schedule() starts a timer unless one is already pending, so a burst of
+    changes is written once when it fires. The save function runs without
+    the cache's lock held; it should take a snapshot under the lock and
+    serialize it outside. Pending changes are written at interpreter exit.
+    """
+
+    def __init__(self, save: Callable[[], None], delay_seconds: float = SAVE_DELAY_SECONDS):
+        """
+        Args:
+            save: Writes the current state of the cache
+            delay_seconds: Time to wait for further changes before writing
+        """
+        self._save = save
+        self.delay_seconds = delay_seconds
+        self._timer = None
+        self._lock = threading.Lock()
+        # Serializes saves, as a timer may fire while flush() is writing
+        self._writing = threading.Lock()
+        atexit.register(self.flush)
+
+    def schedule(self):
+        """Write the file after the delay, together with any later changes."""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        with self._writing:
+            try:
+                self._save()
+            except Exception as e:
+                logger.error(f"Deferred cache write failed: {str(e)}")
@@ -0,0 +1,167 @@
+"""
+Currency conversion of histories and prices from cached FX curves.
+File: src/services/fx_engine.py
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# All curves are USD values of one unit of a currency (e.g. EURUSD Curncy),
+# any other cross is derived from two of them
+PIVOT_CURRENCY = "USD"
+FX_FIELD = "PX_LAST"
+
+# Currencies quoted in minor units: major currency and its value per minor unit
+MINOR_CURRENCIES = {
+    "GBp": ("GBP", 0.01),
+    "GBX": ("GBP", 0.01),
+    "ZAc": ("ZAR", 0.01),
+    "ILs": ("ILS", 0.01),
+}
+
+# Fields that are not amounts of money and are never converted
+NON_CURRENCY_FIELDS = {"PX_VOLUME"}
+
+# Extra history loaded before the first date, so the first days can be
+# filled from the last fixing before them
+FX_LOOKBACK_DAYS = 14
+
+
+def split_currency(currency: str) -> Tuple[str, float]:
+    """
+    Major currency and scale of a quote currency.
+
+    Returns:
+        Tuple of the ISO currency and its units per quoted unit, e.g.
+        ('GBP', 0.01) for GBp
+    """
+    return MINOR_CURRENCIES.get(currency, (currency.upper(), 1.0))
+
+
+def fx_ticker(currency: str) -> str:
+    """Bloomberg ticker of the USD value of a currency, e.g. 'EURUSD Curncy'."""
+    return f"{currency}{PIVOT_CURRENCY} Curncy"
+
+
+class FXEngine:
+    """
+    Converts local currency data into any base currency.
+
+    Instruments are stored once in their local currency. The engine keeps
+    one USD curve per currency in the history cache and derives the factor
+    of any currency pair from two of them, so changing the base currency
+    is a vectorized multiply rather than a new request per instrument.
+    """
+
+    def __init__(self, client):
+        """
+        Args:
+            client: BloombergClient providing get_historical_fields()
+        """
+        self._client = client
+
+    def usd_curves(self, currencies: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Daily USD value of one unit of each currency.
+
+        Args:
+            currencies: Quote currencies, minor units included
+            start_date: Start date in YYYYMMDD format
+            end_date: End date in YYYYMMDD format
+
+        Returns:
+            pd.DataFrame: Date indexed frame with one column per major currency
+        """
+        majors = sorted({split_currency(currency)[0] for currency in currencies} - {PIVOT_CURRENCY})
+        curves = pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+        if majors:
+            cube = self._client.get_historical_fields([fx_ticker(c) for c in majors], [FX_FIELD], start_date, end_date)
+            if not cube.empty:
+                curves = cube.xs(FX_FIELD, axis=1, level="field")
+                curves = curves.rename(columns={fx_ticker(c): c for c in majors})
+            missing = [c for c in majors if c not in curves.columns]
+            if missing:
+                raise ValueError(f"No FX history available for {', '.join(missing)}")
+        curves[PIVOT_CURRENCY] = 1.0
+        return curves
+
+    def factors(self, currencies: List[str], base: str, index: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Daily factors converting amounts in each currency into the base currency.
+
+        Args:
+            currencies: Quote currency of each column
+            base: Currency to convert into
+            index: Dates to return factors for
+
+        Returns:
+            np.ndarray: (dates x currencies) factors, the last fixing on or
+            before each date
+        """
+        start = (index.min() - timedelta(days=FX_LOOKBACK_DAYS)).strftime("%Y%m%d")
+        end = index.max().strftime("%Y%m%d")
+        curves = self.usd_curves(list(currencies) + [base], start, end)
+        aligned = curves.reindex(curves.index.union(index)).ffill().bfill().reindex(index)
+
+        majors, scales = zip(*(split_currency(currency) for currency in currencies)) if currencies else ((), ())
+        base_major, base_scale = split_currency(base)
+        usd = aligned[list(majors)].to_numpy() * np.asarray(scales)
+        return usd / (aligned[base_major].to_numpy() * base_scale)[:, None]
+
+    def convert(self, frame: pd.DataFrame, currencies: List[str], base: str) -> pd.DataFrame:
+        """
+        Convert the columns of a date indexed frame into the base currency.
+
+        Args:
+            frame: Values by date, one column per series
+            currencies: Quote currency of each column
+            base: Currency to convert into
+
+        Returns:
+            pd.DataFrame: The converted frame
+        """
+        if frame.empty or all(currency == base for currency in currencies):
+            return frame
+        return frame * self.factors(currencies, base, frame.index)
+
+    def rates(self, currencies: List[str], base: str = PIVOT_CURRENCY,
+              as_of: Optional[pd.Timestamp] = None) -> Dict[str, float]:
+        """
+        Latest conversion rates into the base currency.
+
+        Args:
+            currencies: Quote currencies
+            base: Currency to convert into
+            as_of: Date of the rates, defaults to today
+
+        Returns:
+            Dict[str, float]: Base currency value of one unit of each currency
+        """
+        currencies = list(dict.fromkeys(currencies))
+        as_of = pd.Timestamp(as_of or pd.Timestamp.today().normalize())
+        factors = self.factors(currencies, base, pd.DatetimeIndex([as_of]))
+        return dict(zip(currencies, factors[0].tolist()))
+
+
+# Create a singleton instance
+_fx_engine = None
+
+
+def get_fx_engine() -> FXEngine:
+    """
+    Get or create the FX engine singleton instance.
+
+    Returns:
+        FXEngine: The engine, backed by the Bloomberg client
+    """
+    global _fx_engine
+    if _fx_engine is None:
+        from services.bloomberg_client import get_bloomberg_client
+        _fx_engine = FXEngine(get_bloomberg_client())
+    return _fx_engine
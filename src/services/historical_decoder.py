@@ -0,0 +1,121 @@
+"""
+Decoding of HistoricalDataResponse messages into NumPy arrays.
+File: src/services/historical_decoder.py
+"""
+
+import logging
+from collections import namedtuple
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# One security's history from a message: datetime64[D] dates and a float64
+# array per field, NaN where a day has no value for the field
+HistoricalBlock = namedtuple("HistoricalBlock", ["security", "dates", "values"])
+
+# date.toordinal() of 1970-01-01, the datetime64 epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _day(value) -> int:
+    """Days since the epoch of a date or datetime."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def _decode_rows(rows: List[dict], fields: List[str]):
+    """Decode fieldData already converted to Python (one dict per day)."""
+    count = len(rows)
+    days = np.fromiter((_day(row["date"]) for row in rows), dtype=np.int64, count=count)
+    nan = np.nan
+    values = {
+        field: np.fromiter((row.get(field, nan) for row in rows), dtype=np.float64, count=count)
+        for field in fields
+    }
+    return days, values
+
+
+def _decode_elements(field_data, fields: List[str]):
+    """Decode fieldData point by point through the element API."""
+    count = field_data.numValues()
+    days = np.empty(count, dtype=np.int64)
+    values = {field: np.full(count, np.nan) for field in fields}
+    columns = list(values.items())
+    for i in range(count):
+        point = field_data.getValueAsElement(i)
+        days[i] = _day(point.getElementAsDatetime("date"))
+        for field, column in columns:
+            if point.hasElement(field):
+                column[i] = point.getElementAsFloat(field)
+    return days, values
+
+
+def decode_historical_message(msg, fields: List[str]) -> Optional[HistoricalBlock]:
+    """
+    Decode one HistoricalDataResponse message into arrays.
+
+    All fields are decoded in a single pass over the fieldData block into
+    preallocated datetime64/float64 arrays, without going through date
+    strings. Where the provider supports Element.toPy() (blpapi 3.23+),
+    the block is converted in one call instead of point by point.
+
+    Args:
+        msg: HistoricalDataResponse message
+        fields: Fields to decode
+
+    Returns:
+        Optional[HistoricalBlock]: The decoded history, or None if the
+        message carries no usable security data
+    """
+    if not msg.hasElement("securityData"):
+        return None
+
+    security_data = msg.getElement("securityData")
+    if not security_data.hasElement("security"):
+        return None
+    security = security_data.getElementAsString("security")
+
+    if security_data.hasElement("securityError"):
+        logger.debug(f"Security error for {security}")
+        return None
+
+    field_data = security_data.getElement("fieldData")
+    if hasattr(field_data, "toPy"):
+        days, values = _decode_rows(field_data.toPy(), fields)
+    else:
+        days, values = _decode_elements(field_data, fields)
+
+    return HistoricalBlock(security, days.astype("datetime64[D]"), values)
+
+
+def security_error(msg) -> Optional[Tuple[str, str]]:
+    """
+    Security and error message of a HistoricalDataResponse message that
+    reports a securityError, or None if it does not.
+    """
+    if not msg.hasElement("securityData"):
+        return None
+    security_data = msg.getElement("securityData")
+    if not security_data.hasElement("security") or not security_data.hasElement("securityError"):
+        return None
+    error = security_data.getElement("securityError")
+    message = error.getElementAsString("message") if error.hasElement("message") else str(error)
+    return security_data.getElementAsString("security"), message
+
+
+def block_to_frame(block: HistoricalBlock, field: str) -> pd.DataFrame:
+    """
+    Date indexed frame with a 'value' column of one field, as the history
+    cache stores it; days without a value for the field are left out.
+    """
+    values = block.values[field]
+    present = ~np.isnan(values)
+    return pd.DataFrame(
+        {"value": values[present]},
+        index=pd.DatetimeIndex(block.dates[present].astype("datetime64[ns]"), name="date")
+    )
@@ -0,0 +1,314 @@
+"""
+Local full-text index of instruments for offline search.
+File: src/services/instrument_index.py
+"""
+
+import bisect
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.path.join("data", "cache", "instrument_index.jsonl")
+
+# Fields that are searched as text (ISINs are looked up exactly), and
+# Bloomberg yellow keys that are left out since nearly every ticker has one
+INDEXED_FIELDS = ["ticker", "name", "exchange", "currency"]
+YELLOW_KEYS = {"equity", "index", "curncy", "comdty", "corp", "govt", "mtge", "muni", "pfd", "m-mkt"}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    """Return the set of three character substrings of a token."""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class InstrumentIndex:
+    """
+    Token and trigram inverted index over instrument metadata.
+
+    Every query term is matched as a substring of a token. Terms of three
+    or more characters are resolved by intersecting trigram posting sets;
+    shorter terms use a sorted token list for prefix lookups. Matches are
+    ranked exact ticker or ISIN first, then by ticker root, so the common
+    typeahead case never has to score every candidate. Documents are
+    appended to a JSON lines file so that the index survives restarts.
+    """
+
+    # Below this many candidates, terms are checked against each candidate's
+    # tokens instead of going through the posting lists
+    SCAN_THRESHOLD = 256
+
+    def __init__(self, path: Optional[str] = INDEX_PATH):
+        """
+        Initialize the index.
+
+        Args:
+            path: JSON lines file for persistence, or None for memory only
+        """
+        self.path = path
+        self._docs: List[Dict] = []
+        self._by_ticker: Dict[str, int] = {}
+        self._by_isin: Dict[str, int] = {}
+        self._by_root: Dict[str, Set[int]] = {}
+        self._doc_tokens: List[List[str]] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._token_docs: Dict[str, Set[int]] = {}
+        self._sorted_tokens: List[str] = []
+        self._sorted_roots: List[str] = []
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, instruments: Iterable[Dict], persist: bool = True) -> int:
+        """
+        Add or update instruments in the index.
+
+        Args:
+            instruments: Security information dictionaries with at least a 'ticker'
+            persist: Append new or changed documents to the index file
+
+        Returns:
+            int: Number of documents added or changed
+        """
+        changed = []
+        with self._lock:
+            self._ensure_loaded()
+            for instrument in instruments:
+                ticker = instrument.get("ticker")
+                if not ticker:
+                    continue
+                doc_id = self._by_ticker.get(ticker)
+                if doc_id is not None:
+                    merged = dict(self._docs[doc_id])
+                    merged.update({k: v for k, v in instrument.items() if v not in (None, "")})
+                    if merged == self._docs[doc_id]:
+                        continue
+                    self._unindex(doc_id)
+                    self._docs[doc_id] = merged
+                else:
+                    doc_id = len(self._docs)
+                    self._docs.append(dict(instrument))
+                    self._doc_tokens.append([])
+                    self._by_ticker[ticker] = doc_id
+                self._index(doc_id)
+                changed.append(self._docs[doc_id])
+            if persist and changed:
+                self._append(changed)
+        return len(changed)
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        """Return the indexed document for a ticker."""
+        with self._lock:
+            self._ensure_loaded()
+            doc_id = self._by_ticker.get(ticker)
+            return dict(self._docs[doc_id]) if doc_id is not None else None
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Search the index.
+
+        Args:
+            query: Free text query
+            limit: Maximum number of results
+
+        Returns:
+            List[Dict]: Matching instruments, best match first
+        """
+        terms = [t for t in tokenize(query) if t not in YELLOW_KEYS]
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            if self._dirty:
+                self._sorted_tokens = sorted(self._token_docs)
+                self._sorted_roots = sorted(self._by_root)
+                self._dirty = False
+
+            # ISINs are only matched exactly
+            exact = [d for d in (self._by_ticker.get(query.strip()), self._by_isin.get(query.strip().upper()))
+                     if d is not None]
+            candidates = None
+            for term in sorted(terms, key=len, reverse=True):
+                candidates = self._match_term(term, candidates)
+                if not candidates:
+                    break
+            if exact:
+                candidates = (candidates or set()) | set(exact)
+            if not candidates:
+                return []
+
+            ranked = []
+            seen = set()
+
+            def take(doc_ids):
+                for doc_id in sorted(doc_ids, key=lambda d: (len(self._docs[d]["ticker"]), d)):
+                    if len(ranked) >= limit:
+                        return
+                    if doc_id in candidates and doc_id not in seen:
+                        seen.add(doc_id)
+                        ranked.append(doc_id)
+
+            # Exact ticker or ISIN, then ticker root equal to or starting
+            # with the first term, then any remaining matches
+            take(exact)
+            take(self._by_root.get(terms[0], ()))
+            if len(ranked) < limit:
+                prefixed = set()
+                for root in self._prefixed(self._sorted_roots, terms[0]):
+                    if len(prefixed) >= limit * 8:
+                        break
+                    prefixed |= self._by_root[root]
+                take(prefixed)
+            if len(ranked) < limit:
+                rest = (d for d in candidates if d not in seen)
+                ranked.extend(itertools.islice(rest, limit - len(ranked)))
+            return [dict(self._docs[d]) for d in ranked]
+
+    def _match_term(self, term: str, within: Optional[Set[int]]) -> Set[int]:
+        """
+        Return the documents (among within, if given) with a token containing
+        the term. The returned set may be a posting list and must not be modified.
+        """
+        if within is not None and len(within) <= self.SCAN_THRESHOLD:
+            return {d for d in within if any(term in token for token in self._doc_tokens[d])}
+        if within is not None and len(term) < 3:
+            return {d for d in within if any(token.startswith(term) for token in self._doc_tokens[d])}
+
+        if len(term) >= 3:
+            postings = sorted((self._trigrams.get(g, set()) for g in trigrams(term)), key=len)
+            candidates = postings[0] if within is None else postings[0] & within
+            for posting in postings[1:]:
+                candidates = candidates & posting
+                if not candidates:
+                    return candidates
+            if len(term) == 3:
+                return candidates
+            # Trigrams may come from different tokens, so verify
+            return {d for d in candidates if any(term in token for token in self._doc_tokens[d])}
+
+        # Short terms: prefix match on the sorted token list
+        matches = set()
+        for token in self._prefixed(self._sorted_tokens, term):
+            matches |= self._token_docs[token]
+        return matches
+
+    @staticmethod
+    def _prefixed(sorted_keys: List[str], prefix: str):
+        """Yield the keys of a sorted list that start with prefix."""
+        i = bisect.bisect_left(sorted_keys, prefix)
+        while i < len(sorted_keys) and sorted_keys[i].startswith(prefix):
+            yield sorted_keys[i]
+            i += 1
+
+    def _index(self, doc_id: int):
+        """Add a document's tokens and trigrams to the posting lists."""
+        doc = self._docs[doc_id]
+        isin = doc.get("isin")
+        if isin:
+            self._by_isin[isin.upper()] = doc_id
+        root = doc["ticker"].split(" ")[0].lower()
+        self._by_root.setdefault(root, set()).add(doc_id)
+
+        text = " ".join(str(doc.get(field) or "") for field in INDEXED_FIELDS)
+        tokens = sorted({t for t in tokenize(text) if t not in YELLOW_KEYS})
+        self._doc_tokens[doc_id] = tokens
+        for token in tokens:
+            docs = self._token_docs.get(token)
+            if docs is None:
+                docs = self._token_docs[token] = set()
+            docs.add(doc_id)
+            for gram in trigrams(token):
+                posting = self._trigrams.get(gram)
+                if posting is None:
+                    posting = self._trigrams[gram] = set()
+                posting.add(doc_id)
+        self._dirty = True
+
+    def _unindex(self, doc_id: int):
+        """Remove a document from the posting lists before re-indexing it."""
+        doc = self._docs[doc_id]
+        if doc.get("isin"):
+            self._by_isin.pop(doc["isin"].upper(), None)
+        self._by_root.get(doc["ticker"].split(" ")[0].lower(), set()).discard(doc_id)
+        for token in self._doc_tokens[doc_id]:
+            self._token_docs[token].discard(doc_id)
+            for gram in trigrams(token):
+                self._trigrams[gram].discard(doc_id)
+        self._doc_tokens[doc_id] = []
+
+    def _ensure_loaded(self):
+        """Build the index from the persisted documents on first use."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        lines = 0
+        try:
+            with open(self.path) as f:
+                docs = []
+                for line in f:
+                    if line.strip():
+                        docs.append(json.loads(line))
+                        lines += 1
+            self.add(docs, persist=False)
+            logger.info(f"Loaded {len(self._docs)} instruments into the local index")
+        except Exception as e:
+            logger.error(f"Failed to load instrument index: {str(e)}")
+        if lines > 2 * len(self._docs) + 1000:
+            self._compact()
+
+    def _append(self, docs: List[Dict]):
+        """Append documents to the index file."""
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                for doc in docs:
+                    f.write(json.dumps(doc) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to persist instrument index: {str(e)}")
+
+    def _compact(self):
+        """Rewrite the index file with one line per document."""
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for doc in self._docs:
+                    f.write(json.dumps(doc) + "\n")
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to compact instrument index: {str(e)}")
+
+
+# Create a singleton instance
+_instrument_index = None
+
+
+def get_instrument_index() -> InstrumentIndex:
+    """
+    Get or create the instrument index singleton instance.
+
+    Returns:
+        InstrumentIndex: The instrument index instance
+    """
+    global _instrument_index
+    if _instrument_index is None:
+        _instrument_index = InstrumentIndex()
+    return _instrument_index
@@ -0,0 +1,186 @@
+"""
+Background job execution for long running data requests.
+File: src/services/job_manager.py
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept this long so their results can still be collected
+JOB_RETENTION_SECONDS = 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested."""
+
+
+class Job:
+    """State of a single background job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, description: str = ""):
+        """
+        Initialize a queued job.
+
+        Args:
+            description: Human readable description of the work
+        """
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = Job.QUEUED
+        self.completed = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        """Whether the job has stopped running."""
+        return self.status in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    def report_progress(self, completed: int, total: int, message: Optional[str] = None):
+        """
+        Record progress of the job.
+
+        Args:
+            completed: Units of work completed
+            total: Total units of work
+            message: Optional status message
+        """
+        self.completed = completed
+        self.total = total
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation has been requested."""
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+    def to_dict(self) -> Dict:
+        """Return a JSON serializable summary of the job state."""
+        return {
+            "id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "completed": self.completed,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and tracks their state."""
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialize the job manager.
+
+        Args:
+            max_workers: Number of jobs that may run concurrently
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, description: str = "", **kwargs) -> str:
+        """
+        Queue a function for background execution.
+
+        The function is called as fn(job, *args, **kwargs) and its return
+        value becomes the job result.
+
+        Args:
+            fn: Function to run
+            description: Human readable description of the work
+
+        Returns:
+            str: The job ID
+        """
+        job = Job(description)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Submitted job {job.id}: {description}")
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        """Return the job with the given ID, if it is still tracked."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: Optional[str]) -> bool:
+        """
+        Request cancellation of a job.
+
+        Returns:
+            bool: True if the job exists and had not finished yet
+        """
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel_event.set()
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        """Execute a job and record its outcome."""
+        if job.cancel_event.is_set():
+            job.status = Job.CANCELLED
+            job.finished = time.time()
+            return
+        job.status = Job.RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = Job.DONE
+        except JobCancelled:
+            job.status = Job.CANCELLED
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = Job.FAILED
+        finally:
+            job.finished = time.time()
+            logger.info(f"Job {job.id} finished with status {job.status}")
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Create a singleton instance
+_job_manager = None
+
+
+def get_job_manager() -> JobManager:
+    """
+    Get or create the job manager singleton instance.
+
+    Returns:
+        JobManager: The job manager instance
+    """
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
@@ -3,6 +3,8 @@ Mock data service for development without Bloomberg access.
 File: src/services/mock_data.py
 """
 
+from services.instrument_index import InstrumentIndex
+
 # Sample instrument data to simulate Bloomberg results
 MOCK_INSTRUMENTS = [
     {"ticker": "AAPL US Equity", "name": "Apple Inc", "currency": "USD", "sector": "Technology"},
@@ -17,6 +19,8 @@ MOCK_INSTRUMENTS = [
     {"ticker": "JNJ US Equity", "name": "Johnson & Johnson", "currency": "USD", "sector": "Healthcare"}
 ]
 
+_mock_index = None
+
 def search_instruments(query: str, limit: int = 10) -> list:
     """
     Mock instrument search function.
@@ -31,15 +35,83 @@ def search_instruments(query: str, limit: int = 10) -> list:
     if not query:
         return []
         
-    query = query.lower()
-    results = []
+    global _mock_index
+    if _mock_index is None:
+        _mock_index = InstrumentIndex(path=None)
+        _mock_index.add(MOCK_INSTRUMENTS, persist=False)
+    return _mock_index.search(query, limit)
+
+# Portfolios created in a new portfolio database, with the trades that
+# built their positions
+MOCK_PORTFOLIOS = [
+    {
+        "name": "Growth Portfolio",
+        "description": "Large cap technology and US equity exposure",
+        "constituents": [
+            {"ticker": "AAPL US Equity", "name": "Apple Inc", "currency": "USD", "type": "Equity", "weight": 30.0},
+            {"ticker": "MSFT US Equity", "name": "Microsoft Corp", "currency": "USD", "type": "Equity", "weight": 30.0},
+            {"ticker": "CSPX LN Equity", "name": "iShares Core S&P 500 UCITS ETF", "currency": "USD", "type": "ETF", "weight": 25.0},
+            {"ticker": "SAP GY Equity", "name": "SAP SE", "currency": "EUR", "type": "Equity", "weight": 15.0},
+        ],
+        "trades": [
+            {"ticker": "AAPL US Equity", "trade_date": "2023-03-01", "quantity": 600, "price": 145.00},
+            {"ticker": "AAPL US Equity", "trade_date": "2023-09-15", "quantity": 400, "price": 157.50},
+            {"ticker": "MSFT US Equity", "trade_date": "2023-03-01", "quantity": 1000, "price": 200.00},
+            {"ticker": "MSFT US Equity", "trade_date": "2024-02-01", "quantity": -200, "price": 405.00},
+            {"ticker": "CSPX LN Equity", "trade_date": "2023-06-01", "quantity": 300, "price": 420.00},
+            {"ticker": "SAP GY Equity", "trade_date": "2023-06-01", "quantity": 500, "price": 180.00,
+             "currency": "EUR", "fx_rate": 1.08},
+        ],
+    },
+    {
+        "name": "Income Portfolio",
+        "description": "Dividend paying equities",
+        "constituents": [
+            {"ticker": "JNJ US Equity", "name": "Johnson & Johnson", "currency": "USD", "type": "Equity", "weight": 35.0},
+            {"ticker": "JPM US Equity", "name": "JPMorgan Chase", "currency": "USD", "type": "Equity", "weight": 35.0},
+            {"ticker": "VOD LN Equity", "name": "Vodafone Group PLC", "currency": "GBp", "type": "Equity", "weight": 30.0},
+        ],
+        "trades": [
+            {"ticker": "JNJ US Equity", "trade_date": "2023-02-01", "quantity": 700, "price": 162.00},
+            {"ticker": "JPM US Equity", "trade_date": "2023-02-01", "quantity": 800, "price": 140.00},
+            {"ticker": "VOD LN Equity", "trade_date": "2023-02-01", "quantity": 20000, "price": 72.50,
+             "currency": "GBp", "fx_rate": 0.0125},
+        ],
+    },
+    {
+        "name": "Balanced Portfolio",
+        "description": "Equities mixed with a broad market ETF",
+        "constituents": [
+            {"ticker": "CSPX LN Equity", "name": "iShares Core S&P 500 UCITS ETF", "currency": "USD", "type": "ETF", "weight": 50.0},
+            {"ticker": "MSFT US Equity", "name": "Microsoft Corp", "currency": "USD", "type": "Equity", "weight": 20.0},
+            {"ticker": "JNJ US Equity", "name": "Johnson & Johnson", "currency": "USD", "type": "Equity", "weight": 15.0},
+            {"ticker": "VOD LN Equity", "name": "Vodafone Group PLC", "currency": "GBp", "type": "Equity", "weight": 15.0},
+        ],
+        "trades": [
+            {"ticker": "CSPX LN Equity", "trade_date": "2023-04-03", "quantity": 500, "price": 410.00},
+            {"ticker": "MSFT US Equity", "trade_date": "2023-04-03", "quantity": 300, "price": 285.00},
+            {"ticker": "JNJ US Equity", "trade_date": "2023-04-03", "quantity": 400, "price": 160.00},
+            {"ticker": "VOD LN Equity", "trade_date": "2023-04-03", "quantity": 30000, "price": 90.00,
+             "currency": "GBp", "fx_rate": 0.0124},
+        ],
+    },
+]
+
+def seed_portfolios(service) -> list:
+    """
+    Create the mock portfolios with their trades.
     
-    for instrument in MOCK_INSTRUMENTS:
-        if (query in instrument["ticker"].lower() or 
-            query in instrument["name"].lower()):
-            results.append(instrument)
-            
-        if len(results) >= limit:
-            break
-            
-    return results
\ No newline at end of file
+    Args:
+        service: PortfolioService to create them in
+        
+    Returns:
+        list: Ids of the created portfolios
+    """
+    ids = []
+    for portfolio in MOCK_PORTFOLIOS:
+        portfolio_id = service.save_portfolio(
+            portfolio["name"], portfolio["constituents"], description=portfolio["description"]
+        )
+        service.add_trades(portfolio_id, portfolio["trades"])
+        ids.append(portfolio_id)
+    return ids
@@ -0,0 +1,561 @@
+"""
+Persistence of portfolios, constituents, trades, price snapshots and valuations.
+File: src/services/portfolio_service.py
+"""
+
+import itertools
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.position_engine import PositionEngine
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_DB_PATH = os.path.join("data", "portfolios.db")
+
+# Connections kept open and shared between threads
+POOL_SIZE = 4
+
+# Schema changes, applied in order; PRAGMA user_version records how many
+# have been applied to a database
+MIGRATIONS = [
+    """
+    CREATE TABLE portfolios (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        description TEXT NOT NULL DEFAULT '',
+        base_currency TEXT NOT NULL DEFAULT 'USD',
+        rebalance TEXT NOT NULL DEFAULT 'none',
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE constituents (
+        portfolio_id INTEGER NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        ticker TEXT NOT NULL,
+        name TEXT NOT NULL DEFAULT '',
+        currency TEXT,
+        type TEXT,
+        weight REAL NOT NULL DEFAULT 0,
+        position INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (portfolio_id, ticker)
+    ) WITHOUT ROWID;
+    CREATE TABLE trades (
+        id INTEGER PRIMARY KEY,
+        portfolio_id INTEGER NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        ticker TEXT NOT NULL,
+        trade_date TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        price REAL NOT NULL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        fx_rate REAL NOT NULL DEFAULT 1.0,
+        fees REAL NOT NULL DEFAULT 0,
+        note TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX trades_portfolio_ticker_date ON trades (portfolio_id, ticker, trade_date, id);
+    CREATE INDEX trades_portfolio_date ON trades (portfolio_id, trade_date, id);
+    CREATE TABLE price_snapshots (
+        ticker TEXT NOT NULL,
+        as_of TEXT NOT NULL,
+        price REAL NOT NULL,
+        currency TEXT,
+        fx_rate REAL,
+        PRIMARY KEY (ticker, as_of)
+    ) WITHOUT ROWID;
+    CREATE TABLE valuations (
+        portfolio_id INTEGER NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        as_of TEXT NOT NULL,
+        market_value REAL NOT NULL,
+        cost_basis REAL NOT NULL DEFAULT 0,
+        net_flow REAL NOT NULL DEFAULT 0,
+        computed_at REAL NOT NULL,
+        PRIMARY KEY (portfolio_id, as_of)
+    ) WITHOUT ROWID;
+    """,
+    # Time-weighted return index of each valuation; cost_basis holds the
+    # net amount invested up to the day
+    """
+    ALTER TABLE valuations ADD COLUMN twr_index REAL NOT NULL DEFAULT 1.0;
+    """,
+]
+
+VALUATION_COLUMNS = ["as_of", "market_value", "cost_basis", "net_flow", "twr_index", "computed_at"]
+
+TRADE_COLUMNS = ["id", "portfolio_id", "ticker", "trade_date", "quantity", "price", "currency", "fx_rate", "fees", "note"]
+
+
+def _iso_date(value) -> str:
+    """ISO date string of a date, datetime or date string."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    value = str(value)
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}" if len(value) == 8 and value.isdigit() else value[:10]
+
+
+class ConnectionPool:
+    """
+    A small pool of SQLite connections shared between threads.
+
+    Databases on disk run in WAL mode, so readers never wait for a writer.
+    """
+
+    def __init__(self, path: Optional[str], size: int = POOL_SIZE):
+        """
+        Args:
+            path: Database file, or None for a private in-memory database
+            size: Largest number of open connections
+        """
+        if path is None:
+            self._target, self._uri = f"file:portfolios-{id(self)}?mode=memory&cache=shared", True
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._target, self._uri = path, False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        # Keeps a shared in-memory database alive while the pool exists
+        self._anchor = self._connect() if path is None else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._target, uri=self._uri, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; blocks while all of them are in use."""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+
+class PortfolioService:
+    """
+    Saved portfolios with their constituents, trades, price snapshots and
+    cached valuations, stored in an indexed SQLite database.
+    """
+
+    def __init__(self, path: Optional[str] = PORTFOLIO_DB_PATH, pool_size: int = POOL_SIZE):
+        """
+        Initialize the service and bring the schema up to date.
+
+        Args:
+            path: Database file, or None for memory only
+            pool_size: Number of pooled connections
+        """
+        self.path = path
+        self._pool = ConnectionPool(path, pool_size)
+        # True when the database was created rather than opened
+        self.created = False
+        self._migrate()
+        # Position engines of portfolios, kept up to date as trades are added
+        self._engines: Dict[int, PositionEngine] = {}
+        self._engines_lock = threading.Lock()
+
+    def _migrate(self):
+        with self._pool.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            self.created = version == 0
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+                logger.info(f"Applied portfolio database migration {number}")
+
+    def close(self):
+        """Close the pooled connections."""
+        self._pool.close()
+
+    # Portfolios
+
+    def list_portfolios(self) -> List[Dict[str, Any]]:
+        """
+        All saved portfolios, most recently updated first.
+
+        Returns:
+            List[Dict]: id, name, description, base_currency, rebalance,
+            updated_at and the number of constituents of each portfolio
+        """
+        with self._pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT p.id, p.name, p.description, p.base_currency, p.rebalance, p.updated_at,
+                       (SELECT COUNT(*) FROM constituents c WHERE c.portfolio_id = p.id) AS constituents
+                FROM portfolios p
+                ORDER BY p.updated_at DESC, p.id
+            """).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_portfolio(self, portfolio_id: int) -> Optional[Dict[str, Any]]:
+        """
+        A portfolio with its constituents.
+
+        Returns:
+            Optional[Dict]: The portfolio, constituents as a list in their
+            saved order, or None if it does not exist
+        """
+        with self._pool.connection() as conn:
+            return self._read_portfolio(conn, portfolio_id)
+
+    def find_portfolio(self, name: str) -> Optional[int]:
+        """Id of the portfolio with a name, if there is one."""
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT id FROM portfolios WHERE name = ?", (name,)).fetchone()
+        return row["id"] if row else None
+
+    def _read_portfolio(self, conn: sqlite3.Connection, portfolio_id: int) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT * FROM portfolios WHERE id = ?", (portfolio_id,)).fetchone()
+        if row is None:
+            return None
+        portfolio = dict(row)
+        portfolio["constituents"] = [
+            dict(constituent) for constituent in conn.execute(
+                "SELECT ticker, name, currency, type, weight FROM constituents "
+                "WHERE portfolio_id = ? ORDER BY position",
+                (portfolio_id,)
+            )
+        ]
+        return portfolio
+
+    def save_portfolio(self, name: str, constituents: List[Dict[str, Any]], base_currency: str = "USD",
+                       rebalance: str = "none", description: str = "",
+                       portfolio_id: Optional[int] = None) -> int:
+        """
+        Create or update a portfolio, replacing its constituents.
+
+        A portfolio saved under the name of an existing one updates it.
+
+        Args:
+            name: Portfolio name
+            constituents: Dicts with ticker, weight and optionally name,
+                currency and type, as held by the builder
+            base_currency: Base currency of the analysis
+            rebalance: Rebalancing frequency
+            description: Free text description
+            portfolio_id: Portfolio to update, if known
+
+        Returns:
+            int: Id of the saved portfolio
+        """
+        now = time.time()
+        with self._pool.connection() as conn, conn:
+            if portfolio_id is None:
+                row = conn.execute("SELECT id FROM portfolios WHERE name = ?", (name,)).fetchone()
+                portfolio_id = row["id"] if row else None
+            if portfolio_id is None:
+                portfolio_id = conn.execute(
+                    "INSERT INTO portfolios (name, description, base_currency, rebalance, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, description, base_currency, rebalance, now, now)
+                ).lastrowid
+            else:
+                conn.execute(
+                    "UPDATE portfolios SET name = ?, description = ?, base_currency = ?, rebalance = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (name, description, base_currency, rebalance, now, portfolio_id)
+                )
+            conn.execute("DELETE FROM constituents WHERE portfolio_id = ?", (portfolio_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO constituents (portfolio_id, ticker, name, currency, type, weight, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (portfolio_id, c["ticker"], c.get("name") or "", c.get("currency"), c.get("type"),
+                     float(c.get("weight") or 0), position)
+                    for position, c in enumerate(constituents)
+                ]
+            )
+        logger.info(f"Saved portfolio '{name}' ({portfolio_id}) with {len(constituents)} constituents")
+        return portfolio_id
+
+    def delete_portfolio(self, portfolio_id: int):
+        """Delete a portfolio with its constituents, trades and valuations."""
+        with self._pool.connection() as conn, conn:
+            conn.execute("DELETE FROM portfolios WHERE id = ?", (portfolio_id,))
+        with self._engines_lock:
+            self._engines.pop(portfolio_id, None)
+
+    def load_portfolio(self, portfolio_id: int) -> Optional[Dict[str, Any]]:
+        """
+        A portfolio with its constituents, trades and latest cached
+        valuation, read in one transaction.
+
+        Returns:
+            Optional[Dict]: The portfolio with 'trades' and 'valuation'
+            keys, or None if it does not exist
+        """
+        with self._pool.connection() as conn, conn:
+            portfolio = self._read_portfolio(conn, portfolio_id)
+            if portfolio is None:
+                return None
+            portfolio["trades"] = self._read_trades(conn, portfolio_id)
+            portfolio["valuation"] = self._read_valuation(conn, portfolio_id)
+        return portfolio
+
+    # Trades
+
+    def add_trades(self, portfolio_id: int, trades: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Record trades of a portfolio.
+
+        Args:
+            portfolio_id: Portfolio the trades belong to
+            trades: Dicts with ticker, trade_date, quantity (negative for
+                sales), price and optionally currency, fx_rate, fees and note
+
+        Returns:
+            List[int]: Ids of the new trades
+        """
+        rows = [
+            (portfolio_id, t["ticker"], _iso_date(t["trade_date"]), float(t["quantity"]), float(t["price"]),
+             t.get("currency") or "USD", float(t.get("fx_rate") or 1.0), float(t.get("fees") or 0),
+             t.get("note") or "")
+            for t in trades
+        ]
+        if not rows:
+            return []
+        with self._engines_lock:
+            with self._pool.connection() as conn, conn:
+                # Take the write lock before reading the next id
+                conn.execute("BEGIN IMMEDIATE")
+                first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM trades").fetchone()[0]
+                rows = [(trade_id, *row) for trade_id, row in zip(itertools.count(first), rows)]
+                conn.executemany(
+                    "INSERT INTO trades (id, portfolio_id, ticker, trade_date, quantity, price, currency, fx_rate, fees, note) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("UPDATE portfolios SET updated_at = ? WHERE id = ?", (time.time(), portfolio_id))
+                # Valuations from the first trade on no longer hold
+                conn.execute(
+                    "DELETE FROM valuations WHERE portfolio_id = ? AND as_of >= ?",
+                    (portfolio_id, min(row[3] for row in rows))
+                )
+            # Update a loaded engine in place rather than reloading the ledger
+            engine = self._engines.get(portfolio_id)
+            if engine is not None:
+                engine.apply_many(dict(zip(TRADE_COLUMNS, row)) for row in rows)
+        return list(range(first, first + len(rows)))
+
+    def get_trades(self, portfolio_id: int, ticker: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Trades of a portfolio in the order they were made.
+
+        Args:
+            portfolio_id: Portfolio to read
+            ticker: Only return trades of this security
+
+        Returns:
+            List[Dict]: Trades ordered by trade date, then id
+        """
+        with self._pool.connection() as conn:
+            return self._read_trades(conn, portfolio_id, ticker)
+
+    def _read_trades(self, conn: sqlite3.Connection, portfolio_id: int,
+                     ticker: Optional[str] = None) -> List[Dict[str, Any]]:
+        if ticker is None:
+            cursor = conn.execute(
+                f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades WHERE portfolio_id = ? ORDER BY trade_date, id",
+                (portfolio_id,)
+            )
+        else:
+            cursor = conn.execute(
+                f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades "
+                f"WHERE portfolio_id = ? AND ticker = ? ORDER BY trade_date, id",
+                (portfolio_id, ticker)
+            )
+        # Plain tuples are much cheaper to fetch than sqlite3.Row
+        cursor.row_factory = None
+        return [dict(zip(TRADE_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def delete_trade(self, trade_id: int):
+        """Delete a single trade."""
+        with self._engines_lock:
+            with self._pool.connection() as conn, conn:
+                row = conn.execute("SELECT portfolio_id, trade_date FROM trades WHERE id = ?", (trade_id,)).fetchone()
+                conn.execute("DELETE FROM trades WHERE id = ?", (trade_id,))
+                if row is not None:
+                    conn.execute(
+                        "DELETE FROM valuations WHERE portfolio_id = ? AND as_of >= ?",
+                        (row["portfolio_id"], row["trade_date"])
+                    )
+            if row is not None:
+                self._engines.pop(row["portfolio_id"], None)
+
+    def position_engine(self, portfolio_id: int) -> PositionEngine:
+        """
+        Positions of a portfolio built from its trades.
+
+        The ledger is read once per portfolio; trades recorded through
+        add_trades() are applied to the loaded engine incrementally.
+
+        Returns:
+            PositionEngine: The portfolio's engine, shared between callers
+        """
+        with self._engines_lock:
+            engine = self._engines.get(portfolio_id)
+            if engine is None:
+                with self._pool.connection() as conn, conn:
+                    trades = self._read_trades(conn, portfolio_id)
+                    currencies = {
+                        row["ticker"]: row["currency"] for row in conn.execute(
+                            "SELECT ticker, currency FROM constituents WHERE portfolio_id = ? AND currency IS NOT NULL",
+                            (portfolio_id,)
+                        )
+                    }
+                # Trades are read in ledger order, so none of them is replayed
+                engine = self._engines[portfolio_id] = PositionEngine(currencies=currencies)
+                engine.apply_many(trades)
+            return engine
+
+    # Price snapshots
+
+    def save_price_snapshots(self, snapshots: Iterable[Dict[str, Any]]):
+        """
+        Store prices of securities, one per security and day.
+
+        Args:
+            snapshots: Dicts with ticker, as_of, price and optionally
+                currency and fx_rate; later snapshots of a day replace earlier ones
+        """
+        rows = [
+            (s["ticker"], _iso_date(s["as_of"]), float(s["price"]), s.get("currency"), s.get("fx_rate"))
+            for s in snapshots
+        ]
+        with self._pool.connection() as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO price_snapshots (ticker, as_of, price, currency, fx_rate) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def latest_prices(self, tickers: List[str], as_of=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest stored price of each security, on or before a date.
+
+        Returns:
+            Dict[str, Dict]: as_of, price, currency and fx_rate by ticker
+        """
+        as_of = _iso_date(as_of or date.today())
+        with self._pool.connection() as conn:
+            result = {}
+            for ticker in tickers:
+                row = conn.execute(
+                    "SELECT as_of, price, currency, fx_rate FROM price_snapshots "
+                    "WHERE ticker = ? AND as_of <= ? ORDER BY as_of DESC LIMIT 1",
+                    (ticker, as_of)
+                ).fetchone()
+                if row is not None:
+                    result[ticker] = dict(row)
+        return result
+
+    # Valuations
+
+    def save_valuations(self, portfolio_id: int, valuations: Iterable[Dict[str, Any]]):
+        """
+        Cache daily valuations of a portfolio.
+
+        Args:
+            portfolio_id: Portfolio valued
+            valuations: Dicts with as_of, market_value and optionally
+                cost_basis (net amount invested), net_flow and twr_index;
+                existing days are replaced
+        """
+        now = time.time()
+        rows = [
+            (portfolio_id, _iso_date(v["as_of"]), float(v["market_value"]), float(v.get("cost_basis") or 0),
+             float(v.get("net_flow") or 0), float(v.get("twr_index") or 1.0), now)
+            for v in valuations
+        ]
+        with self._pool.connection() as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO valuations "
+                "(portfolio_id, as_of, market_value, cost_basis, net_flow, twr_index, computed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get_valuations(self, portfolio_id: int, start=None, end=None) -> List[Dict[str, Any]]:
+        """Cached valuations of a portfolio by date, optionally within a date range."""
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                f"SELECT {', '.join(VALUATION_COLUMNS)} FROM valuations "
+                "WHERE portfolio_id = ? AND as_of >= ? AND as_of <= ? ORDER BY as_of",
+                (portfolio_id, _iso_date(start or "0000-01-01"), _iso_date(end or "9999-12-31"))
+            )
+            cursor.row_factory = None
+            return [dict(zip(VALUATION_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def latest_valuations(self, portfolio_id: int, count: int = 1) -> List[Dict[str, Any]]:
+        """The last cached valuations of a portfolio, oldest first."""
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(VALUATION_COLUMNS)} FROM valuations "
+                "WHERE portfolio_id = ? ORDER BY as_of DESC LIMIT ?",
+                (portfolio_id, count)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def delete_valuations(self, portfolio_id: int, start=None):
+        """Delete the cached valuations of a portfolio, optionally from a date on."""
+        with self._pool.connection() as conn, conn:
+            conn.execute(
+                "DELETE FROM valuations WHERE portfolio_id = ? AND as_of >= ?",
+                (portfolio_id, _iso_date(start or "0000-01-01"))
+            )
+
+    def _read_valuation(self, conn: sqlite3.Connection, portfolio_id: int) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            f"SELECT {', '.join(VALUATION_COLUMNS)} FROM valuations "
+            "WHERE portfolio_id = ? ORDER BY as_of DESC LIMIT 1",
+            (portfolio_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+# Create a singleton instance
+_portfolio_service = None
+
+
+def get_portfolio_service() -> PortfolioService:
+    """
+    Get or create the portfolio service singleton instance.
+
+    Returns:
+        PortfolioService: The service instance
+    """
+    global _portfolio_service
+    if _portfolio_service is None:
+        _portfolio_service = PortfolioService()
+        if _portfolio_service.created:
+            from services.mock_data import seed_portfolios
+            seed_portfolios(_portfolio_service)
+    return _portfolio_service
@@ -0,0 +1,329 @@
+"""
+Cache for Bloomberg reference data, including bulk fields.
+File: src/services/reference_cache.py
+"""
+
+import ast
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from services.deferred_writer import DeferredWriter
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_PATH = os.path.join("data", "cache", "reference_data.json")
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Lifetime of cached values per field; fields not listed use DEFAULT_TTL_SECONDS
+FIELD_TTL_SECONDS = {
+    # Prices and NAVs move intraday
+    "PX_LAST": 5 * MINUTE,
+    "PX_BID": 5 * MINUTE,
+    "PX_ASK": 5 * MINUTE,
+    "FUND_NET_ASSET_VAL": 15 * MINUTE,
+    "FUND_TOTAL_ASSETS": 1 * DAY,
+    # Look-through data is published monthly at best
+    "HB_INDUSTRY_SECTOR_ALLOCATION": 7 * DAY,
+    "FUND_SECTOR_ALLOCATION": 7 * DAY,
+    "FUND_GEO_ALLOCATION": 7 * DAY,
+    "FUND_HOLDING_CLASS_LONG": 7 * DAY,
+    "FUND_HOLDINGS": 7 * DAY,
+    "FUND_TOP_HOLDINGS": 7 * DAY,
+    "FUND_CREDIT_QUALITY_DIST": 7 * DAY,
+    "FUND_MATURITY_BREAKDOWN": 7 * DAY,
+    "FUND_MARKET_CAP_BREAKDOWN": 7 * DAY,
+    "FUND_CURRENCY_BREAKDOWN": 7 * DAY,
+    "FUND_REGION_BREAKDOWN": 7 * DAY,
+    # Static descriptive fields
+    "NAME": 30 * DAY,
+    "CRNCY": 30 * DAY,
+    "ID_ISIN": 30 * DAY,
+    "EXCH_CODE": 30 * DAY,
+    "SECURITY_TYP": 30 * DAY,
+    "GICS_SECTOR_NAME": 30 * DAY,
+    "COUNTRY_OF_DOMICILE": 30 * DAY,
+}
+DEFAULT_TTL_SECONDS = 1 * DAY
+
+LEGACY_BULK_CSV_PATTERN = re.compile(r"^bulk_data_(?P<timestamp>\d{8}_\d{6})\.csv$")
+
+_BLPAPI_NAME_REPR = re.compile(r"blpapi\.Name\('((?:[^'\\]|\\.)*)'\)")
+_DATE_REPR = re.compile(r"datetime\.date\((\d+),\s*(\d+),\s*(\d+)\)")
+
+
+def field_ttl(field: str) -> int:
+    """Return the cache lifetime of a field in seconds."""
+    return FIELD_TTL_SECONDS.get(field, DEFAULT_TTL_SECONDS)
+
+
+def encode_value(value: Any) -> Any:
+    """Convert a cached value into a JSON serializable structure."""
+    if isinstance(value, pd.DataFrame):
+        return {"__table__": {
+            "columns": [str(c) for c in value.columns],
+            "dtypes": [str(t) for t in value.dtypes],
+            "data": json.loads(value.to_json(orient="values", date_format="iso")),
+        }}
+    if isinstance(value, (datetime, date)):
+        return {"__date__": value.isoformat()}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    """Restore a value written by encode_value."""
+    if isinstance(value, dict) and "__table__" in value:
+        table = value["__table__"]
+        df = pd.DataFrame(table["data"], columns=table["columns"])
+        for column, dtype in zip(table["columns"], table["dtypes"]):
+            if dtype.startswith("datetime64"):
+                df[column] = pd.to_datetime(df[column])
+        return df
+    if isinstance(value, dict) and "__date__" in value:
+        return datetime.fromisoformat(value["__date__"])
+    return value
+
+
+class ReferenceDataCache:
+    """
+    Reference data values by security and field, each with its own TTL.
+
+    Expired values are not returned by get() but stay available through
+    get(..., allow_stale=True), so views can render from the last known
+    values while a refresh is pending or Bloomberg is unreachable. The
+    cache is written to a JSON file in the background, coalescing
+    consecutive changes.
+    """
+
+    def __init__(self, path: Optional[str] = REFERENCE_CACHE_PATH):
+        """
+        Initialize the cache.
+
+        Args:
+            path: JSON file for persistence, or None for memory only
+        """
+        self.path = path
+        self._entries: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.RLock()
+        # Incremented on every change, so derived data can tell it is stale
+        self.version = 0
+        self._writer = DeferredWriter(self._save) if path else None
+        self._load()
+
+    def get(self, security: str, field: str, allow_stale: bool = False) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            security: Bloomberg security identifier
+            field: Bloomberg field mnemonic
+            allow_stale: Also return values past their TTL
+
+        Returns:
+            The cached value (a DataFrame for bulk fields), or None
+        """
+        with self._lock:
+            entry = self._entries.get(security, {}).get(field)
+            if entry is None or (not allow_stale and self._expired(field, entry)):
+                return None
+            value = entry["value"]
+            return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def get_many(self, securities: List[str], fields: List[str], allow_stale: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up cached values for several securities and fields.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Values by security and field; values
+            that are not cached are left out
+        """
+        result = {}
+        for security in securities:
+            values = {}
+            for field in fields:
+                value = self.get(security, field, allow_stale)
+                if value is not None:
+                    values[field] = value
+            result[security] = values
+        return result
+
+    def missing(self, securities: List[str], fields: List[str]) -> Dict[str, List[str]]:
+        """
+        Find the values that are not cached or have expired.
+
+        Returns:
+            Dict[str, List[str]]: Fields to fetch by security
+        """
+        result = {}
+        with self._lock:
+            for security in securities:
+                entries = self._entries.get(security, {})
+                stale = [f for f in fields if f not in entries or self._expired(f, entries[f])]
+                if stale:
+                    result[security] = stale
+        return result
+
+    def put_many(self, values: Dict[str, Dict[str, Any]], fetched_at: Optional[float] = None):
+        """
+        Cache values and schedule a write of the cache file.
+
+        Args:
+            values: Values by security and field
+            fetched_at: Time the values were retrieved, defaults to now
+        """
+        fetched_at = fetched_at or time.time()
+        with self._lock:
+            for security, fields in values.items():
+                entries = self._entries.setdefault(security, {})
+                for field, value in fields.items():
+                    entries[field] = {"value": value, "fetched_at": fetched_at}
+            self.version += 1
+        if self._writer:
+            self._writer.schedule()
+
+    def flush(self):
+        """Write pending changes to the cache file now."""
+        if self._writer:
+            self._writer.flush()
+
+    def _expired(self, field: str, entry: Dict) -> bool:
+        """Whether an entry is older than its field's TTL."""
+        return time.time() - entry["fetched_at"] > field_ttl(field)
+
+    def _load(self):
+        """Read the cache file."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for security, fields in data.items():
+                self._entries[security] = {
+                    field: {"value": decode_value(entry["value"]), "fetched_at": entry["fetched_at"]}
+                    for field, entry in fields.items()
+                }
+            logger.info(f"Loaded reference data for {len(self._entries)} securities from {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to load reference data cache: {str(e)}")
+
+    def _save(self):
+        """Write the cache file; entries are replaced rather than modified, so a shallow snapshot suffices."""
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = {security: dict(fields) for security, fields in self._entries.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = {
+                security: {
+                    field: {"value": encode_value(entry["value"]), "fetched_at": entry["fetched_at"]}
+                    for field, entry in fields.items()
+                }
+                for security, fields in snapshot.items()
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save reference data cache: {str(e)}")
+
+
+def parse_legacy_bulk_value(text: str) -> Optional[pd.DataFrame]:
+    """
+    Parse a bulk field written by str() of decoded blpapi elements.
+
+    Args:
+        text: A repr like "[{blpapi.Name('Weight'): 1.5, ...}, ...]"
+
+    Returns:
+        Optional[pd.DataFrame]: One row per bulk value, or None if empty
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    literal = _BLPAPI_NAME_REPR.sub(lambda m: repr(m.group(1)), text)
+    literal = _DATE_REPR.sub(lambda m: repr(date(*map(int, m.groups())).isoformat()), literal)
+    rows = ast.literal_eval(literal)
+    return pd.DataFrame(rows) if rows else None
+
+
+def import_legacy_bulk_csvs(data_dir: str = ".", cache: Optional[ReferenceDataCache] = None,
+                            remove: bool = False) -> int:
+    """
+    Import bulk_data_{timestamp}.csv dumps written by the analysis notebook.
+
+    Values keep the file's timestamp as their fetch time, so they are
+    served as stale data until refreshed.
+
+    Args:
+        data_dir: Directory containing the CSV files
+        cache: Cache to import into, defaults to the shared instance
+        remove: Delete each CSV after a successful import
+
+    Returns:
+        int: Number of files imported
+    """
+    cache = cache or get_reference_cache()
+    imported = 0
+    for filename in sorted(os.listdir(data_dir)):
+        match = LEGACY_BULK_CSV_PATTERN.match(filename)
+        if not match:
+            continue
+        path = os.path.join(data_dir, filename)
+        try:
+            df = pd.read_csv(path, dtype=str)
+            fetched_at = datetime.strptime(match["timestamp"], "%Y%m%d_%H%M%S").timestamp()
+            values = {}
+            for _, row in df.iterrows():
+                fields = {}
+                for field, text in row.drop("security").items():
+                    table = parse_legacy_bulk_value(text)
+                    if table is not None:
+                        fields[field] = table
+                values[row["security"]] = fields
+            cache.put_many(values, fetched_at=fetched_at)
+            # Written before the CSV may be removed
+            cache.flush()
+            imported += 1
+            if remove:
+                os.remove(path)
+            logger.info(f"Imported bulk data for {len(values)} securities from {filename}")
+        except Exception as e:
+            logger.error(f"Failed to import {filename}: {str(e)}")
+    return imported
+
+
+# Create a singleton instance
+_reference_cache = None
+
+
+def get_reference_cache() -> ReferenceDataCache:
+    """
+    Get or create the reference data cache singleton instance.
+
+    Returns:
+        ReferenceDataCache: The cache instance
+    """
+    global _reference_cache
+    if _reference_cache is None:
+        _reference_cache = ReferenceDataCache()
+    return _reference_cache
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.reference_cache [data_dir] [--remove]
+    logging.basicConfig(level=logging.INFO)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = import_legacy_bulk_csvs(args[0] if args else ".", remove="--remove" in sys.argv)
+    print(f"Imported {count} bulk data files into {get_reference_cache().path}")
@@ -0,0 +1,258 @@
+"""
+Correlation ID based request multiplexing over a single Bloomberg session.
+File: src/services/request_dispatcher.py
+"""
+
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, Optional
+
+from services.data_provider import blpapi
+from services.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class RequestFailedError(Exception):
+    """Raised when Bloomberg rejects a request or the session goes away."""
+
+
+class _PendingRequest:
+    """Bookkeeping for a request that is waiting for its final response."""
+
+    def __init__(self, correlation_id, on_message: Optional[Callable], operation: str = "request"):
+        self.correlation_id = correlation_id
+        self.on_message = on_message
+        self.operation = operation
+        self.future = Future()
+        self.future.correlation_id = correlation_id
+        # Timings (perf_counter) for request telemetry
+        self.sent_at = None
+        self.first_event_at = None
+        self.decode_seconds = 0.0
+        self.messages = 0
+
+
+def request_operation(request) -> str:
+    """Return the operation name of a request, e.g. 'HistoricalDataRequest'."""
+    try:
+        return str(request.asElement().name())
+    except Exception:
+        return "request"
+
+
+def request_hits(request) -> int:
+    """Estimate the API usage of a request as securities x fields."""
+    try:
+        element = request.asElement()
+        securities = element.getElement("securities").numValues() if element.hasElement("securities") else 1
+        fields = element.getElement("fields").numValues() if element.hasElement("fields") else 1
+        return max(securities, 1) * max(fields, 1)
+    except Exception:
+        return 1
+
+
+class RequestDispatcher:
+    """
+    Runs one event pump thread for a session and routes every message to
+    the request it belongs to.
+
+    Each request is sent with its own CorrelationId. Messages are handed to
+    the request's message handler on the pump thread and the request's
+    future completes when its final RESPONSE arrives, so any number of
+    callers can share the session concurrently.
+
+    Every request is timed into pf_bloomberg_request_seconds by phase:
+    queue (waiting to be sent, when the caller reports it), send, first
+    event, last event and decode (time spent in the message handler).
+
+    Session status messages are passed on to on_session_status, so the
+    owner of the session can follow its connection state.
+    """
+
+    def __init__(self, session, poll_timeout_ms: int = 500,
+                 on_session_status: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            session: A started blpapi.Session created without an event handler
+            poll_timeout_ms: How long each nextEvent call may block
+            on_session_status: Called on the pump thread with the message
+                type of every session status message
+        """
+        self.session = session
+        self.poll_timeout_ms = poll_timeout_ms
+        self.on_session_status = on_session_status
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread = None
+
+        telemetry = get_telemetry()
+        self._request_seconds = telemetry.histogram(
+            "pf_bloomberg_request_seconds", "Bloomberg request latency by phase"
+        )
+        self._requests = telemetry.counter("pf_bloomberg_requests_total", "Bloomberg requests by outcome")
+        self._messages = telemetry.counter("pf_bloomberg_messages_total", "Bloomberg response messages")
+        self._hits = telemetry.counter("pf_bloomberg_hits_total", "Bloomberg API usage (securities x fields)")
+
+    def start(self):
+        """Start the event pump thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._pump, name="bloomberg-event-pump", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the event pump and fail any outstanding requests."""
+        self._running.clear()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2 * self.poll_timeout_ms / 1000)
+        self._thread = None
+        self._fail_all(RequestFailedError("Dispatcher stopped"))
+
+    def send(self, request, on_message: Optional[Callable] = None, queued_at: Optional[float] = None) -> Future:
+        """
+        Send a request and return a future for its completion.
+
+        Args:
+            request: The blpapi request to send
+            on_message: Called on the pump thread with every message of the
+                request, partial responses included
+            queued_at: time.perf_counter() when the request was queued by
+                the caller, to record how long it waited
+
+        Returns:
+            Future: Resolves to None after the final response has been
+            handled; its correlation_id attribute identifies the request
+        """
+        correlation_id = blpapi.CorrelationId(next(self._ids))
+        operation = request_operation(request)
+        pending = _PendingRequest(correlation_id, on_message, operation)
+        with self._lock:
+            self._pending[correlation_id.value()] = pending
+        start = time.perf_counter()
+        if queued_at is not None:
+            self._request_seconds.observe(start - queued_at, operation=operation, phase="queue")
+        try:
+            pending.sent_at = start
+            self.session.sendRequest(request, correlationId=correlation_id)
+        except Exception:
+            with self._lock:
+                self._pending.pop(correlation_id.value(), None)
+            self._requests.inc(operation=operation, outcome="failed")
+            raise
+        self._request_seconds.observe(time.perf_counter() - start, operation=operation, phase="send")
+        self._hits.inc(request_hits(request), operation=operation)
+        return pending.future
+
+    def cancel(self, future: Future):
+        """
+        Cancel an outstanding request; futures that were never sent are ignored.
+
+        Args:
+            future: Future returned by send()
+        """
+        correlation_id = getattr(future, "correlation_id", None)
+        if correlation_id is None:
+            return
+        with self._lock:
+            pending = self._pending.pop(correlation_id.value(), None)
+        if pending is None:
+            return
+        try:
+            self.session.cancel(correlation_id)
+        except Exception as e:
+            logger.error(f"Failed to cancel request {correlation_id}: {str(e)}")
+        pending.future.cancel()
+        self._requests.inc(operation=pending.operation, outcome="cancelled")
+
+    def _pump(self):
+        """Read events from the session and route their messages."""
+        while self._running.is_set():
+            try:
+                event = self.session.nextEvent(self.poll_timeout_ms)
+                event_type = event.eventType()
+                if event_type == blpapi.Event.TIMEOUT:
+                    continue
+                for msg in event:
+                    self._route(event_type, msg)
+            except Exception as e:
+                logger.error(f"Error in Bloomberg event pump: {str(e)}")
+
+    def _route(self, event_type, msg):
+        """Dispatch a single message to the request(s) it belongs to."""
+        if event_type == blpapi.Event.SESSION_STATUS:
+            if msg.messageType() in (blpapi.Name("SessionTerminated"), blpapi.Name("SessionConnectionDown")):
+                logger.error(f"Bloomberg session lost: {msg.messageType()}")
+                self._fail_all(RequestFailedError(str(msg.messageType())))
+            if self.on_session_status:
+                self.on_session_status(str(msg.messageType()))
+            return
+
+        for correlation_id in msg.correlationIds():
+            with self._lock:
+                pending = self._pending.get(correlation_id.value())
+            if pending is None:
+                continue
+
+            if event_type == blpapi.Event.REQUEST_STATUS:
+                self._finish(pending, RequestFailedError(str(msg)))
+                continue
+
+            if pending.first_event_at is None:
+                pending.first_event_at = time.perf_counter()
+            pending.messages += 1
+            try:
+                if pending.on_message:
+                    decode_start = time.perf_counter()
+                    pending.on_message(msg)
+                    pending.decode_seconds += time.perf_counter() - decode_start
+            except Exception as e:
+                self._finish(pending, e)
+                continue
+
+            if event_type == blpapi.Event.RESPONSE:
+                self._finish(pending)
+
+    def _finish(self, pending: _PendingRequest, error: Optional[Exception] = None):
+        """Complete a request's future and forget the request."""
+        with self._lock:
+            self._pending.pop(pending.correlation_id.value(), None)
+        self._record(pending, error)
+        try:
+            if error is None:
+                pending.future.set_result(None)
+            else:
+                pending.future.set_exception(error)
+        except InvalidStateError:
+            # Cancelled while the final message was being handled
+            pass
+
+    def _record(self, pending: _PendingRequest, error: Optional[Exception] = None):
+        """Record the timings and outcome of a finished request."""
+        now = time.perf_counter()
+        operation = pending.operation
+        if pending.sent_at is not None:
+            if pending.first_event_at is not None:
+                self._request_seconds.observe(pending.first_event_at - pending.sent_at, operation=operation, phase="first_event")
+            self._request_seconds.observe(now - pending.sent_at, operation=operation, phase="last_event")
+        self._request_seconds.observe(pending.decode_seconds, operation=operation, phase="decode")
+        self._messages.inc(pending.messages, operation=operation)
+        self._requests.inc(operation=operation, outcome="ok" if error is None else "failed")
+
+    def _fail_all(self, error: Exception):
+        """Fail every outstanding request."""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for request in pending:
+            if not request.future.done():
+                self._record(request, error)
+                request.future.set_exception(error)
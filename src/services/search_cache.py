@@ -0,0 +1,218 @@
+"""
+Cache for Bloomberg instrument search results.
+File: src/services/search_cache.py
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from services.deferred_writer import DeferredWriter
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PATH = os.path.join("data", "cache", "search_cache.json")
+
+# Shortest cached query that may answer longer queries starting with it
+MIN_PREFIX_LENGTH = 3
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for use as a cache key."""
+    return " ".join(query.lower().split())
+
+
+def matches_query(instrument: Dict, query: str) -> bool:
+    """
+    Check whether an instrument matches every term of a normalized query.
+
+    Args:
+        instrument: Security information dictionary
+        query: Normalized search query
+
+    Returns:
+        bool: True if each query term occurs in the ticker or name
+    """
+    text = f"{instrument.get('ticker', '')} {instrument.get('name', '')}".lower()
+    return all(term in text for term in query.split())
+
+
+class SearchCache:
+    """
+    Size bounded LRU cache with TTL in front of //blp/instruments lookups.
+
+    Entries are kept in memory and written to a JSON file in the
+    background, a burst of searches at a time, which warms the cache on
+    the next start. A query can be answered from a
+    cached shorter prefix when that prefix returned fewer results than it
+    asked for, since the prefix's result list is then complete. Every
+    instrument seen is also indexed by ticker.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: int = 24 * 3600,
+                 max_instruments: int = 20000, path: Optional[str] = SEARCH_CACHE_PATH):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached queries
+            ttl_seconds: Lifetime of a cached query
+            max_instruments: Maximum number of instruments in the ticker index
+            path: JSON file for the persistent tier, or None for memory only
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_instruments = max_instruments
+        self.path = path
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._instruments: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self._writer = DeferredWriter(self._save) if path else None
+        self._load()
+
+    def get(self, query: str, max_results: int) -> Optional[List[Dict]]:
+        """
+        Look up cached results for a query.
+
+        Args:
+            query: Search query string
+            max_results: Maximum number of results wanted
+
+        Returns:
+            Optional[List[Dict]]: Copies of the cached results, or None on a miss
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is not None and self._can_answer(entry, max_results):
+                self.hits += 1
+                return [dict(r) for r in entry["results"][:max_results]]
+
+            # Reuse the longest complete prefix result
+            for length in range(len(key) - 1, MIN_PREFIX_LENGTH - 1, -1):
+                prefix = self._fresh_entry(key[:length])
+                if prefix is None or len(prefix["results"]) >= prefix["max_results"]:
+                    continue
+                results = [r for r in prefix["results"] if matches_query(r, key)]
+                self._store(key, results, prefix["max_results"], prefix["fetched_at"])
+                self.hits += 1
+                return [dict(r) for r in results[:max_results]]
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, max_results: int, results: List[Dict]):
+        """
+        Cache the results of a search.
+
+        Args:
+            query: Search query string
+            max_results: Maximum number of results that was requested
+            results: Security information dictionaries returned
+        """
+        with self._lock:
+            self._store(normalize_query(query), [dict(r) for r in results], max_results, time.time())
+        if self._writer:
+            self._writer.schedule()
+
+    def flush(self):
+        """Write pending changes to the persistent tier now."""
+        if self._writer:
+            self._writer.flush()
+
+    def get_instrument(self, ticker: str) -> Optional[Dict]:
+        """Return cached metadata for a ticker, if it has been seen."""
+        with self._lock:
+            instrument = self._instruments.get(ticker)
+            if instrument is None:
+                return None
+            self._instruments.move_to_end(ticker)
+            return dict(instrument)
+
+    def _can_answer(self, entry: Dict, max_results: int) -> bool:
+        """Whether an entry holds every result a query for max_results would get."""
+        return entry["max_results"] >= max_results or len(entry["results"]) < entry["max_results"]
+
+    def _fresh_entry(self, key: str) -> Optional[Dict]:
+        """Return an unexpired entry, dropping it if it has expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["fetched_at"] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, results: List[Dict], max_results: int, fetched_at: float):
+        """Insert an entry, index its instruments and enforce the size limits."""
+        self._entries[key] = {"results": results, "max_results": max_results, "fetched_at": fetched_at}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        for result in results:
+            ticker = result.get("ticker")
+            if ticker:
+                self._instruments[ticker] = result
+                self._instruments.move_to_end(ticker)
+        while len(self._instruments) > self.max_instruments:
+            self._instruments.popitem(last=False)
+
+    def _load(self):
+        """Warm the cache from the persistent tier."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            now = time.time()
+            for key, entry in data.get("entries", []):
+                if now - entry["fetched_at"] <= self.ttl_seconds:
+                    self._store(key, entry["results"], entry["max_results"], entry["fetched_at"])
+            for instrument in data.get("instruments", []):
+                self._instruments.setdefault(instrument["ticker"], instrument)
+            logger.info(f"Loaded {len(self._entries)} cached searches from {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to load search cache: {str(e)}")
+
+    def _save(self):
+        """Write the cache to the persistent tier; only the snapshot is taken under the lock."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "entries": list(self._entries.items()),
+                "instruments": list(self._instruments.values()),
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save search cache: {str(e)}")
+
+
+# Create a singleton instance
+_search_cache = None
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Get or create the search cache singleton instance.
+
+    Returns:
+        SearchCache: The search cache instance
+    """
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
@@ -0,0 +1,200 @@
+"""
+Server-side store for callback data, referenced from the browser by handles.
+File: src/services/session_store.py
+"""
+
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Limits of the store; least recently used entries are evicted first
+SESSION_STORE_MAX_BYTES = 256 * 1024 * 1024
+SESSION_STORE_MAX_ENTRIES = 10000
+
+# Entries not read or written for this long are dropped
+SESSION_TTL_SECONDS = 12 * 3600
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate size of a value in bytes, as its pickled length."""
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class SessionStore:
+    """
+    Keyed in-process cache of data that callbacks would otherwise send
+    through dcc.Store.
+
+    A store in the page holds only a handle, {"key": ..., "version": ...}.
+    Writing under an existing handle keeps its key and increments its
+    version, so the store still changes (and triggers callbacks) while
+    each browser session occupies one entry per store. Entries are evicted
+    least recently used first when the store exceeds its size or entry
+    limit, and expire when unused for the TTL; readers get their default
+    for a missing entry and should rebuild the data.
+    """
+
+    def __init__(self, max_bytes: int = SESSION_STORE_MAX_BYTES, max_entries: int = SESSION_STORE_MAX_ENTRIES,
+                 ttl_seconds: float = SESSION_TTL_SECONDS, clock=time.monotonic):
+        """
+        Args:
+            max_bytes: Largest total estimated size of the entries
+            max_entries: Largest number of entries
+            ttl_seconds: Idle time after which an entry expires
+            clock: Time source, for tests
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> [value, version, size, last access], least recently used first
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        from services.telemetry import get_telemetry
+        telemetry = get_telemetry()
+        self._requests = telemetry.counter("pf_session_store_requests_total", "Session store reads by result")
+        self._evictions = telemetry.counter("pf_session_store_evictions_total", "Session store entries dropped by reason")
+
+    def put(self, value: Any, handle: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Store a value.
+
+        Args:
+            value: Data to keep; it is not copied
+            handle: Handle of the entry to replace, None for a new entry
+
+        Returns:
+            Dict: Handle of the entry, to put in a dcc.Store
+
+        Raises:
+            ValueError: If the value alone exceeds the size limit
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            raise ValueError(f"Value of {size} bytes exceeds the session store limit of {self.max_bytes}")
+
+        key = handle.get("key") if isinstance(handle, dict) and handle.get("key") else uuid.uuid4().hex
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            version = max(old[1] if old else 0, (handle or {}).get("version") or 0) + 1
+            self._entries[key] = [value, version, size, self._clock()]
+            self._bytes += size
+            self._evict()
+        return {"key": key, "version": version}
+
+    def new_handle(self) -> Dict[str, Any]:
+        """Handle of an entry not written yet, for keying related state before the first put()."""
+        return {"key": uuid.uuid4().hex, "version": 0}
+
+    def replace(self, handle: Optional[Dict[str, Any]], current: Any, value: Any) -> bool:
+        """
+        Swap the value of an entry if it still holds a given value.
+
+        The version is kept, so callbacks that take the handle as an input
+        do not run; this is for data that follows changes the browser has
+        already been sent. A concurrent put() wins over the swap.
+
+        Args:
+            handle: Handle of the entry
+            current: Value returned by get(), compared by identity
+            value: New value
+
+        Returns:
+            bool: True if the value was swapped
+        """
+        key = handle.get("key") if isinstance(handle, dict) else None
+        size = estimate_size(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not current or size > self.max_bytes:
+                return False
+            self._bytes += size - entry[2]
+            entry[0], entry[2], entry[3] = value, size, self._clock()
+            self._entries.move_to_end(key)
+            self._evict()
+        return True
+
+    def get(self, handle: Optional[Dict[str, Any]], default: Any = None) -> Any:
+        """
+        Value of a handle.
+
+        Args:
+            handle: Handle from put(), or None
+            default: Returned if there is no handle or its entry is gone
+
+        Returns:
+            The stored value; callers must not modify it in place
+        """
+        key = handle.get("key") if isinstance(handle, dict) else None
+        if not key:
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self._clock()
+            if entry is not None and now - entry[3] > self.ttl_seconds:
+                self._drop(key, "expired")
+                entry = None
+            if entry is None:
+                self._requests.inc(result="miss")
+                return default
+            entry[3] = now
+            self._entries.move_to_end(key)
+        self._requests.inc(result="hit")
+        return entry[0]
+
+    def discard(self, handle: Optional[Dict[str, Any]]):
+        """Remove the entry of a handle, if it exists."""
+        key = handle.get("key") if isinstance(handle, dict) else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key, "discarded")
+
+    def stats(self) -> Dict[str, int]:
+        """Number of entries and their estimated size in bytes."""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _drop(self, key: str, reason: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+        self._evictions.inc(reason=reason)
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones beyond the limits."""
+        now = self._clock()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[3] <= self.ttl_seconds:
+                break
+            self._drop(key, "expired")
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)), "entries")
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)), "size")
+
+
+# Create a singleton instance
+_session_store = None
+
+
+def get_session_store() -> SessionStore:
+    """
+    Get or create the session store singleton instance.
+
+    Returns:
+        SessionStore: The store shared by all callbacks
+    """
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore()
+    return _session_store
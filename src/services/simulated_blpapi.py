@@ -0,0 +1,654 @@
+"""
+Simulated stand-in for the blpapi module, backed by the market simulator.
+File: src/services/simulated_blpapi.py
+"""
+
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from services.simulator import HISTORICAL_FIELDS, REFERENCE_FIELDS, MarketSimulator, SimulationSettings
+
+logger = logging.getLogger(__name__)
+
+SERVICES = {
+    "//blp/refdata": {"HistoricalDataRequest", "ReferenceDataRequest"},
+    "//blp/instruments": {"instrumentListRequest"},
+    "//blp/mktdata": set(),
+}
+
+# Securities per ReferenceDataResponse message
+REFERENCE_SECURITIES_PER_MESSAGE = 10
+
+settings = SimulationSettings.from_environment()
+_simulator = None
+
+
+def configure(**overrides):
+    """
+    Change simulation settings, e.g. configure(latency_ms=0, seed=7).
+
+    Takes effect for sessions started afterwards; the simulated market is
+    rebuilt so that a new seed gives new prices.
+    """
+    global _simulator
+    for key, value in overrides.items():
+        if not hasattr(settings, key):
+            raise ValueError(f"Unknown simulation setting: {key}")
+        setattr(settings, key, value)
+    _simulator = None
+
+
+def get_simulator() -> MarketSimulator:
+    """
+    Get or create the market simulator singleton instance.
+
+    Returns:
+        MarketSimulator: The simulator used by all sessions
+    """
+    global _simulator
+    if _simulator is None:
+        _simulator = MarketSimulator(settings)
+    return _simulator
+
+
+class NotFoundException(Exception):
+    """Raised when an element, service or operation does not exist."""
+
+
+class InvalidStateException(Exception):
+    """Raised when a session is used before it is started."""
+
+
+class Name(str):
+    """Name of an element, message type or service."""
+
+
+class CorrelationId:
+    """Identifies a request or subscription in the messages it produces."""
+
+    _auto = itertools.count(1_000_000_000)
+
+    def __init__(self, value: Any = None):
+        self._value = next(self._auto) if value is None else value
+
+    def value(self):
+        return self._value
+
+    def __eq__(self, other):
+        return isinstance(other, CorrelationId) and other._value == self._value
+
+    def __hash__(self):
+        return hash(self._value)
+
+    def __repr__(self):
+        return f"[ valueType=INT classId=0 value={self._value} ]"
+
+
+class Element:
+    """
+    A node of a request or message, holding a scalar, a sequence (dict)
+    or an array (list) of plain Python values.
+    """
+
+    def __init__(self, name: str, value: Any):
+        self._name = Name(name)
+        self._value = value
+
+    def name(self) -> Name:
+        return self._name
+
+    def isArray(self) -> bool:
+        return isinstance(self._value, list)
+
+    def isComplexType(self) -> bool:
+        return isinstance(self._value, dict)
+
+    def isNull(self) -> bool:
+        return self._value is None
+
+    def numValues(self) -> int:
+        if self.isArray():
+            return len(self._value)
+        return 0 if self._value is None or self.isComplexType() else 1
+
+    def numElements(self) -> int:
+        return len(self._value) if self.isComplexType() else 0
+
+    def hasElement(self, name: str, excludeNullElements: bool = False) -> bool:
+        if not self.isComplexType() or name not in self._value:
+            return False
+        return not (excludeNullElements and self._value[name] is None)
+
+    def getElement(self, name):
+        if not self.isComplexType():
+            raise NotFoundException(f"{self._name} has no sub-elements")
+        if isinstance(name, int):
+            name = list(self._value)[name]
+        if name not in self._value:
+            raise NotFoundException(f"Sub-element '{name}' does not exist in {self._name}")
+        return Element(name, self._value[name])
+
+    def elements(self) -> Iterator["Element"]:
+        return (Element(name, value) for name, value in self._value.items()) if self.isComplexType() else iter(())
+
+    def getValue(self, index: int = 0):
+        value = self._value[index] if self.isArray() else self._value
+        return Element(self._name, value) if isinstance(value, dict) else value
+
+    def getValueAsElement(self, index: int = 0) -> "Element":
+        return Element(self._name, self._value[index] if self.isArray() else self._value)
+
+    def getValueAsString(self, index: int = 0) -> str:
+        value = self.getValue(index)
+        return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+    def getValueAsFloat(self, index: int = 0) -> float:
+        return float(self.getValue(index))
+
+    def getValueAsInteger(self, index: int = 0) -> int:
+        return int(self.getValue(index))
+
+    def getValueAsBool(self, index: int = 0) -> bool:
+        return bool(self.getValue(index))
+
+    def getValueAsDatetime(self, index: int = 0):
+        value = self.getValue(index)
+        return value if isinstance(value, (date, datetime)) else datetime.fromisoformat(str(value)).date()
+
+    def values(self) -> Iterator[Any]:
+        return (self.getValue(i) for i in range(self.numValues()))
+
+    def getElementAsString(self, name: str) -> str:
+        return self.getElement(name).getValueAsString()
+
+    def getElementAsFloat(self, name: str) -> float:
+        return self.getElement(name).getValueAsFloat()
+
+    def getElementAsInteger(self, name: str) -> int:
+        return self.getElement(name).getValueAsInteger()
+
+    def getElementAsBool(self, name: str) -> bool:
+        return self.getElement(name).getValueAsBool()
+
+    def getElementAsDatetime(self, name: str):
+        return self.getElement(name).getValueAsDatetime()
+
+    def getElementValue(self, name: str):
+        return self.getElement(name).getValue()
+
+    def appendValue(self, value):
+        self._value.append(value)
+
+    def appendElement(self) -> "Element":
+        self._value.append({})
+        return Element(self._name, self._value[-1])
+
+    def setElement(self, name: str, value):
+        self._value[name] = value
+
+    def setValue(self, value, index: int = 0):
+        if self.isArray():
+            self._value[index] = value
+        else:
+            self._value = value
+
+    def toPy(self):
+        return _to_py(self._value)
+
+    def __str__(self):
+        return _format(self._name, self._value, 0)
+
+
+def _to_py(value):
+    """Deep copy of an element value as plain Python containers."""
+    if isinstance(value, dict):
+        return {key: _to_py(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_py(item) for item in value]
+    return value
+
+
+def _format(name: str, value, indent: int) -> str:
+    """Render an element like blpapi's print()."""
+    pad = "    " * indent
+    if isinstance(value, dict):
+        body = "".join(_format(key, item, indent + 1) for key, item in value.items())
+        return f"{pad}{name} = {{\n{body}{pad}}}\n"
+    if isinstance(value, list):
+        body = "".join(
+            _format(name, item, indent + 1) if isinstance(item, dict) else f"{pad}    {item}\n" for item in value
+        )
+        return f"{pad}{name}[] = {{\n{body}{pad}}}\n"
+    return f"{pad}{name} = {value}\n"
+
+
+class Message:
+    """A message of an event, addressed to one or more correlation IDs."""
+
+    def __init__(self, message_type: str, data: Dict, correlation_ids: List[CorrelationId], topic: str = ""):
+        self._type = Name(message_type)
+        self._element = Element(message_type, data)
+        self._correlation_ids = correlation_ids
+        self._topic = topic
+
+    def messageType(self) -> Name:
+        return self._type
+
+    def correlationIds(self) -> List[CorrelationId]:
+        return list(self._correlation_ids)
+
+    def correlationId(self, index: int = 0) -> Optional[CorrelationId]:
+        return self._correlation_ids[index] if index < len(self._correlation_ids) else None
+
+    def topicName(self) -> str:
+        return self._topic
+
+    def asElement(self) -> Element:
+        return self._element
+
+    def numElements(self) -> int:
+        return self._element.numElements()
+
+    def hasElement(self, name: str, excludeNullElements: bool = False) -> bool:
+        return self._element.hasElement(name, excludeNullElements)
+
+    def getElement(self, name) -> Element:
+        return self._element.getElement(name)
+
+    def getElementAsString(self, name: str) -> str:
+        return self._element.getElementAsString(name)
+
+    def getElementAsFloat(self, name: str) -> float:
+        return self._element.getElementAsFloat(name)
+
+    def getElementAsInteger(self, name: str) -> int:
+        return self._element.getElementAsInteger(name)
+
+    def getElementAsDatetime(self, name: str):
+        return self._element.getElementAsDatetime(name)
+
+    def toPy(self):
+        return self._element.toPy()
+
+    def __str__(self):
+        return str(self._element)
+
+
+class Event:
+    """A batch of messages of one type."""
+
+    ADMIN = 1
+    SESSION_STATUS = 2
+    SUBSCRIPTION_STATUS = 3
+    REQUEST_STATUS = 4
+    RESPONSE = 5
+    PARTIAL_RESPONSE = 6
+    SUBSCRIPTION_DATA = 8
+    SERVICE_STATUS = 9
+    TIMEOUT = 10
+    AUTHORIZATION_STATUS = 11
+    RESOLUTION_STATUS = 12
+    TOPIC_STATUS = 13
+    TOKEN_STATUS = 14
+    REQUEST = 15
+    UNKNOWN = -1
+
+    def __init__(self, event_type: int, messages: Optional[List[Message]] = None):
+        self._type = event_type
+        self._messages = messages or []
+
+    def eventType(self) -> int:
+        return self._type
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._messages)
+
+
+class Request:
+    """A request for one operation of a service."""
+
+    def __init__(self, operation: str):
+        self._operation = operation
+        self._element = Element(operation, {"securities": [], "fields": [], "overrides": []})
+
+    def operation(self) -> str:
+        return self._operation
+
+    def asElement(self) -> Element:
+        return self._element
+
+    def getElement(self, name: str) -> Element:
+        return self._element.getElement(name)
+
+    def set(self, name: str, value):
+        self._element.setElement(name, value)
+
+    def __str__(self):
+        return str(self._element)
+
+
+class Service:
+    """A service opened on a session."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def name(self) -> str:
+        return self._name
+
+    def createRequest(self, operation: str) -> Request:
+        if operation not in SERVICES[self._name]:
+            raise NotFoundException(f"Operation '{operation}' is not part of {self._name}")
+        return Request(operation)
+
+
+class SessionOptions:
+    """Connection settings; accepted for compatibility and otherwise unused."""
+
+    def __init__(self):
+        self._host = "localhost"
+        self._port = 8194
+
+    def setServerHost(self, host: str):
+        self._host = host
+
+    def setServerPort(self, port: int):
+        self._port = port
+
+    def serverHost(self) -> str:
+        return self._host
+
+    def serverPort(self) -> int:
+        return self._port
+
+
+class SubscriptionList:
+    """Topics to subscribe to or unsubscribe from."""
+
+    def __init__(self):
+        self._entries = []
+
+    def add(self, topic: str, fields=None, options=None, correlationId: Optional[CorrelationId] = None):
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        self._entries.append((topic, list(fields or []), correlationId or CorrelationId()))
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def topicStringAt(self, index: int) -> str:
+        return self._entries[index][0]
+
+    def correlationIdAt(self, index: int) -> CorrelationId:
+        return self._entries[index][2]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+
+class Session:
+    """
+    A session served by the market simulator.
+
+    Requests are answered on a worker pool of max_concurrent_requests
+    threads after a latency that grows with the amount of data returned;
+    requests beyond the pool wait their turn, as throttled requests do on
+    a terminal. Responses, failures and market data arrive through
+    nextEvent() exactly as they would from blpapi.
+    """
+
+    def __init__(self, options: Optional[SessionOptions] = None, eventHandler=None):
+        if eventHandler is not None:
+            raise NotImplementedError("The simulated provider only supports synchronous sessions")
+        self._options = options or SessionOptions()
+        self._events: "queue.Queue[Event]" = queue.Queue()
+        self._services: Dict[str, Service] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._started = False
+        self._pending = 0
+        self._cancelled = set()
+        self._subscriptions: Dict[CorrelationId, tuple] = {}
+        self._lock = threading.Lock()
+        self._ticker = None
+        self._stopping = threading.Event()
+        self._rng = random.Random(settings.seed)
+        self._simulator = get_simulator()
+
+    def start(self) -> bool:
+        if not settings.connect:
+            self._events.put(Event(Event.SESSION_STATUS, [Message("SessionStartupFailure", {}, [])]))
+            return False
+        self._executor = ThreadPoolExecutor(settings.max_concurrent_requests, thread_name_prefix="simulated-bloomberg")
+        self._started = True
+        self._events.put(Event(Event.SESSION_STATUS, [Message("SessionStarted", {}, [])]))
+        return True
+
+    def stop(self) -> bool:
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._started = False
+        self._events.put(Event(Event.SESSION_STATUS, [Message("SessionTerminated", {}, [])]))
+        return True
+
+    def openService(self, name: str) -> bool:
+        self._check_started()
+        if name not in SERVICES:
+            return False
+        self._services[name] = Service(name)
+        self._events.put(Event(Event.SERVICE_STATUS, [Message("ServiceOpened", {"serviceName": name}, [])]))
+        return True
+
+    def getService(self, name: str) -> Service:
+        if name not in self._services:
+            raise NotFoundException(f"Service {name} is not open")
+        return self._services[name]
+
+    def nextEvent(self, timeout: int = 0) -> Event:
+        try:
+            return self._events.get(timeout=timeout / 1000 if timeout else None)
+        except queue.Empty:
+            return Event(Event.TIMEOUT)
+
+    def tryNextEvent(self) -> Optional[Event]:
+        try:
+            return self._events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def sendRequest(self, request: Request, identity=None, correlationId: Optional[CorrelationId] = None,
+                    eventQueue=None, requestLabel: str = "") -> CorrelationId:
+        self._check_started()
+        correlation_id = correlationId or CorrelationId()
+        with self._lock:
+            throttled = 0 < settings.max_pending_requests <= self._pending
+            if not throttled:
+                self._pending += 1
+        if throttled:
+            self._fail(correlation_id, "Request throttled: too many requests outstanding", "LIMIT")
+        else:
+            self._executor.submit(self._serve, request, correlation_id)
+        return correlation_id
+
+    def cancel(self, correlationId):
+        correlation_ids = correlationId if isinstance(correlationId, list) else [correlationId]
+        with self._lock:
+            self._cancelled.update(correlation_ids)
+
+    def subscribe(self, subscriptionList: SubscriptionList, identity=None, requestLabel: str = ""):
+        self._check_started()
+        messages = []
+        for topic, fields, correlation_id in subscriptionList:
+            if self._simulator.profile(topic) is None:
+                messages.append(Message("SubscriptionFailure", {"reason": _error("Invalid security", "BAD_SEC")},
+                                        [correlation_id], topic))
+                continue
+            with self._lock:
+                self._subscriptions[correlation_id] = (topic, fields or ["LAST_PRICE"])
+            messages.append(Message("SubscriptionStarted", {}, [correlation_id], topic))
+        self._events.put(Event(Event.SUBSCRIPTION_STATUS, messages))
+        if self._ticker is None:
+            self._ticker = threading.Thread(target=self._tick, name="simulated-mktdata", daemon=True)
+            self._ticker.start()
+
+    def unsubscribe(self, subscriptionList: SubscriptionList):
+        messages = []
+        with self._lock:
+            for topic, _, correlation_id in subscriptionList:
+                if self._subscriptions.pop(correlation_id, None) is not None:
+                    messages.append(Message("SubscriptionTerminated", {}, [correlation_id], topic))
+        if messages:
+            self._events.put(Event(Event.SUBSCRIPTION_STATUS, messages))
+
+    def _check_started(self):
+        if not self._started:
+            raise InvalidStateException("Session is not started")
+
+    def _fail(self, correlation_id: CorrelationId, description: str, category: str = "UNCLASSIFIED"):
+        """Queue a RequestFailure for a request."""
+        data = {"reason": {"source": "simulator", "category": category, "errorCode": -1,
+                           "description": description, "subcategory": ""}}
+        self._events.put(Event(Event.REQUEST_STATUS, [Message("RequestFailure", data, [correlation_id])]))
+
+    def _serve(self, request: Request, correlation_id: CorrelationId):
+        """Answer a request on a worker thread."""
+        try:
+            handler = {
+                "HistoricalDataRequest": self._historical,
+                "ReferenceDataRequest": self._reference,
+                "instrumentListRequest": self._instrument_list,
+            }[request.operation()]
+            message_type, payloads, points = handler(request.asElement().toPy())
+
+            latency = settings.latency_ms + settings.latency_per_1000_points_ms * points / 1000
+            latency *= self._rng.lognormvariate(0.0, settings.latency_jitter) if settings.latency_jitter else 1.0
+            if self._rng.random() < settings.request_failure_rate:
+                time.sleep(latency / 1000)
+                self._fail(correlation_id, "Simulated request failure")
+                return
+
+            fail_at = None
+            if len(payloads) > 1 and self._rng.random() < settings.partial_failure_rate:
+                fail_at = self._rng.randrange(1, len(payloads))
+
+            for i, payload in enumerate(payloads):
+                time.sleep(latency / len(payloads) / 1000)
+                if correlation_id in self._cancelled or self._stopping.is_set():
+                    return
+                if i == fail_at:
+                    self._fail(correlation_id, "Simulated failure after partial response")
+                    return
+                event_type = Event.RESPONSE if i == len(payloads) - 1 else Event.PARTIAL_RESPONSE
+                self._events.put(Event(event_type, [Message(message_type, payload, [correlation_id])]))
+        except Exception as e:
+            logger.error(f"Simulated request failed: {str(e)}")
+            self._fail(correlation_id, str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._cancelled.discard(correlation_id)
+
+    def _historical(self, request: Dict):
+        """Build HistoricalDataResponse payloads, one per security."""
+        start = datetime.strptime(request["startDate"], "%Y%m%d").date()
+        end = datetime.strptime(request["endDate"], "%Y%m%d").date()
+        fields = request["fields"]
+        payloads, points = [], 0
+        for sequence, security in enumerate(request["securities"]):
+            result = self._simulator.history(security, fields, start, end, request.get("currency"))
+            if result is None:
+                payloads.append({"securityData": {
+                    "security": security, "eidData": [], "sequenceNumber": sequence,
+                    "securityError": _error("Unknown/Invalid security", "BAD_SEC", "INVALID_SECURITY"),
+                    "fieldExceptions": [], "fieldData": [],
+                }})
+                continue
+            dates, values = result
+            columns = [(field, values[field].tolist()) for field in fields if field in values]
+            rows = [{"date": day} for day in dates.astype(object)]
+            for field, column in columns:
+                for row, value in zip(rows, column):
+                    if value == value:
+                        row[field] = value
+            points += len(rows) * max(len(columns), 1)
+            payloads.append({"securityData": {
+                "security": security, "eidData": [], "sequenceNumber": sequence,
+                "fieldExceptions": [_field_exception(f) for f in fields if f not in HISTORICAL_FIELDS],
+                "fieldData": rows,
+            }})
+        return "HistoricalDataResponse", payloads or [{"securityData": {}}], points
+
+    def _reference(self, request: Dict):
+        """Build ReferenceDataResponse payloads of several securities each."""
+        fields = request["fields"]
+        entries, points = [], 0
+        for sequence, security in enumerate(request["securities"]):
+            entry = {"security": security, "eidData": [], "fieldExceptions": [], "sequenceNumber": sequence}
+            if self._simulator.profile(security) is None:
+                entry["securityError"] = _error("Unknown/Invalid security", "BAD_SEC", "INVALID_SECURITY")
+                entries.append(entry)
+                continue
+            field_data = {}
+            for field in fields:
+                value = self._simulator.reference(security, field) if field in REFERENCE_FIELDS else None
+                if value is None:
+                    entry["fieldExceptions"].append(_field_exception(field, field in REFERENCE_FIELDS))
+                    continue
+                field_data[field] = value
+                points += len(value) if isinstance(value, list) else 1
+            entry["fieldData"] = field_data
+            entries.append(entry)
+        payloads = [
+            {"securityData": entries[i:i + REFERENCE_SECURITIES_PER_MESSAGE]}
+            for i in range(0, len(entries), REFERENCE_SECURITIES_PER_MESSAGE)
+        ]
+        return "ReferenceDataResponse", payloads or [{"securityData": []}], points
+
+    def _instrument_list(self, request: Dict):
+        """Build the InstrumentListResponse payload."""
+        results = self._simulator.search(request.get("query", ""), int(request.get("maxResults", 10)))
+        return "InstrumentListResponse", [{"results": results}], len(results)
+
+    def _tick(self):
+        """Publish market data for subscribed securities."""
+        rng = np.random.default_rng(settings.seed)
+        while not self._stopping.wait(settings.tick_interval_ms / 1000):
+            with self._lock:
+                subscriptions = list(self._subscriptions.items())
+            messages = []
+            for correlation_id, (topic, fields) in subscriptions:
+                if rng.random() < 0.5:
+                    continue
+                price = self._simulator.tick(topic, rng)
+                if price is None:
+                    continue
+                spread = price * 0.0005
+                quote = {"LAST_PRICE": price, "BID": price - spread, "ASK": price + spread,
+                         "VOLUME": int(rng.integers(100, 10_000))}
+                data = {field: quote[field] for field in fields if field in quote}
+                messages.append(Message("MarketDataEvents", data, [correlation_id], topic))
+            if messages:
+                self._events.put(Event(Event.SUBSCRIPTION_DATA, messages))
+
+
+def _error(message: str, category: str, subcategory: str = "") -> Dict:
+    """Error info element contents."""
+    return {"source": "simulator", "code": -1, "category": category, "message": message, "subcategory": subcategory}
+
+
+def _field_exception(field: str, not_applicable: bool = False) -> Dict:
+    """Field exception element contents."""
+    if not_applicable:
+        info = _error("Field not applicable to security", "BAD_FLD", "NOT_APPLICABLE_TO_REF_DATA")
+    else:
+        info = _error("Field not valid", "BAD_FLD", "INVALID_FIELD")
+    return {"fieldId": field, "errorInfo": info}
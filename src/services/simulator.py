@@ -0,0 +1,490 @@
+"""
+Deterministic market simulation behind the simulated data provider.
+File: src/services/simulator.py
+"""
+
+import logging
+import os
+import threading
+import zlib
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Simulated histories run over this business day calendar
+CALENDAR_START = np.datetime64("1990-01-01")
+CALENDAR_END = np.datetime64("2040-12-31")
+
+YELLOW_KEYS = {"equity", "index", "curncy", "comdty", "corp", "govt", "mtge", "muni", "pfd"}
+
+# Quote currency by exchange code; London quotes in pence
+EXCHANGE_CURRENCIES = {
+    "US": "USD", "UN": "USD", "UW": "USD", "LN": "GBp", "GY": "EUR", "GR": "EUR",
+    "FP": "EUR", "NA": "EUR", "IM": "EUR", "SM": "EUR", "SW": "CHF", "SE": "CHF",
+    "JT": "JPY", "JP": "JPY", "HK": "HKD", "CN": "CAD", "CT": "CAD", "AU": "AUD", "AT": "AUD",
+}
+EXCHANGE_COUNTRIES = {
+    "US": "US", "UN": "US", "UW": "US", "LN": "GB", "GY": "DE", "GR": "DE", "FP": "FR",
+    "NA": "NL", "IM": "IT", "SM": "ES", "SW": "CH", "SE": "CH", "JT": "JP", "JP": "JP",
+    "HK": "HK", "CN": "CA", "CT": "CA", "AU": "AU", "AT": "AU",
+}
+
+# USD value of one unit of each currency at the start of the calendar
+FX_BASE_RATES = {
+    "USD": 1.0, "EUR": 1.10, "GBP": 1.30, "CHF": 1.05, "JPY": 0.0075,
+    "HKD": 0.128, "CAD": 0.75, "AUD": 0.68,
+}
+FX_VOLATILITY = 0.08
+
+SECTORS = [
+    "Information Technology", "Health Care", "Financials", "Consumer Discretionary",
+    "Communication Services", "Industrials", "Consumer Staples", "Energy",
+    "Utilities", "Real Estate", "Materials",
+]
+INDUSTRY_SECTORS = [
+    "Basic Materials", "Communications", "Consumer, Cyclical", "Consumer, Non-cyclical",
+    "Energy", "Financial", "Industrial", "Technology", "Utilities",
+]
+REGIONS = {"US": "North America", "CA": "North America", "GB": "Europe", "DE": "Europe", "FR": "Europe",
+           "NL": "Europe", "IT": "Europe", "ES": "Europe", "CH": "Europe", "JP": "Asia Pacific",
+           "HK": "Asia Pacific", "AU": "Asia Pacific"}
+ASSET_CLASSES = ["Equity", "Fixed Income", "Cash", "Other"]
+
+_NAME_PARTS = [
+    "Alpha", "Apex", "Atlas", "Beacon", "Blue", "Bright", "Cedar", "Core", "Crest", "Delta",
+    "Eagle", "Echo", "First", "Global", "Granite", "Harbor", "Horizon", "Iron", "Keystone",
+    "Liberty", "Lumen", "Meridian", "North", "Oak", "Orion", "Pacific", "Peak", "Pioneer",
+    "Prime", "Quantum", "River", "Summit", "Sterling", "Titan", "United", "Vertex", "West",
+]
+_NAME_SUFFIXES = [
+    "Holdings", "Industries", "Technologies", "Energy", "Financial", "Pharmaceuticals",
+    "Systems", "Resources", "Capital", "Networks", "Foods", "Motors", "Labs", "Group",
+]
+# Roots of well known ETFs, simulated as funds with look-through data
+KNOWN_FUND_ROOTS = {"CSPX", "IWDA", "VWRL", "EIMI", "SPY", "VOO", "VT", "QQQ", "IVV", "AGG", "BND"}
+
+_UNIVERSE_EXCHANGES = ["US"] * 6 + ["LN", "GY", "FP", "NA", "SW", "JT", "HK", "CN", "AU"]
+
+# Bulk fields served for funds, with their column names
+BULK_FIELDS = {
+    "HB_INDUSTRY_SECTOR_ALLOCATION": ("Industry Sector Name", "Industry Sector Allocation Percentage"),
+    "FUND_SECTOR_ALLOCATION": ("Industrial Sector", "Percent of Fund"),
+    "FUND_GEO_ALLOCATION": ("Geographical Region", "Percent of Fund"),
+    "FUND_REGION_BREAKDOWN": ("Region", "Percent of Fund"),
+    "FUND_CURRENCY_BREAKDOWN": ("Currency", "Percent of Fund"),
+    "FUND_HOLDING_CLASS_LONG": ("Asset Class", "Percent of Fund"),
+    "FUND_TOP_HOLDINGS": ("Holding Ticker", "Percent of Fund"),
+}
+
+HISTORICAL_FIELDS = {
+    "PX_LAST", "PX_OPEN", "PX_HIGH", "PX_LOW", "PX_VOLUME", "TOT_RETURN_INDEX_GROSS_DVDS",
+    "TOT_RETURN_INDEX_NET_DVDS", "FUND_NET_ASSET_VAL",
+}
+REFERENCE_FIELDS = {
+    "NAME", "CRNCY", "SECURITY_TYP", "EXCH_CODE", "ID_ISIN", "COUNTRY_OF_DOMICILE",
+    "GICS_SECTOR_NAME", "PX_LAST", "PX_BID", "PX_ASK", "FUND_NET_ASSET_VAL", "FUND_TOTAL_ASSETS",
+} | set(BULK_FIELDS)
+
+
+def _env(name: str, default, cast=float):
+    """Read a simulation setting from the environment."""
+    value = os.environ.get(name)
+    return default if value in (None, "") else cast(value)
+
+
+class SimulationSettings:
+    """
+    Tunable behaviour of the simulated provider.
+
+    Every setting can be given as an environment variable (SIM_SEED,
+    SIM_LATENCY_MS, ...) and changed at runtime with configure().
+    """
+
+    def __init__(self, seed: int = 42, latency_ms: float = 40.0, latency_per_1000_points_ms: float = 2.0,
+                 latency_jitter: float = 0.25, max_concurrent_requests: int = 8, max_pending_requests: int = 0,
+                 request_failure_rate: float = 0.0, partial_failure_rate: float = 0.0,
+                 security_failure_rate: float = 0.0, tick_interval_ms: float = 250.0,
+                 universe_size: int = 2000, connect: bool = True):
+        """
+        Initialize the settings.
+
+        Args:
+            seed: Seed of all simulated prices, instruments and failures
+            latency_ms: Base response time of a request
+            latency_per_1000_points_ms: Extra response time per 1000 data points
+            latency_jitter: Standard deviation of the log-normal latency noise
+            max_concurrent_requests: Requests served at once; later requests queue
+            max_pending_requests: Queued requests above which new ones are
+                rejected as throttled, or 0 for no limit
+            request_failure_rate: Probability that a request fails outright
+            partial_failure_rate: Probability that a multi-security request
+                fails after delivering part of its data
+            security_failure_rate: Fraction of securities that are unknown
+            tick_interval_ms: Time between market data ticks
+            universe_size: Number of generated instruments available to search
+            connect: Whether sessions can be started
+        """
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_per_1000_points_ms = latency_per_1000_points_ms
+        self.latency_jitter = latency_jitter
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_pending_requests = max_pending_requests
+        self.request_failure_rate = request_failure_rate
+        self.partial_failure_rate = partial_failure_rate
+        self.security_failure_rate = security_failure_rate
+        self.tick_interval_ms = tick_interval_ms
+        self.universe_size = universe_size
+        self.connect = connect
+
+    @classmethod
+    def from_environment(cls) -> "SimulationSettings":
+        """Create settings from SIM_* environment variables."""
+        defaults = cls()
+        return cls(
+            seed=_env("SIM_SEED", defaults.seed, int),
+            latency_ms=_env("SIM_LATENCY_MS", defaults.latency_ms),
+            latency_per_1000_points_ms=_env("SIM_LATENCY_PER_1000_POINTS_MS", defaults.latency_per_1000_points_ms),
+            latency_jitter=_env("SIM_LATENCY_JITTER", defaults.latency_jitter),
+            max_concurrent_requests=_env("SIM_MAX_CONCURRENT_REQUESTS", defaults.max_concurrent_requests, int),
+            max_pending_requests=_env("SIM_MAX_PENDING_REQUESTS", defaults.max_pending_requests, int),
+            request_failure_rate=_env("SIM_REQUEST_FAILURE_RATE", defaults.request_failure_rate),
+            partial_failure_rate=_env("SIM_PARTIAL_FAILURE_RATE", defaults.partial_failure_rate),
+            security_failure_rate=_env("SIM_SECURITY_FAILURE_RATE", defaults.security_failure_rate),
+            tick_interval_ms=_env("SIM_TICK_INTERVAL_MS", defaults.tick_interval_ms),
+            universe_size=_env("SIM_UNIVERSE_SIZE", defaults.universe_size, int),
+        )
+
+
+def _seed(*parts) -> int:
+    """Stable 32 bit seed from strings and numbers."""
+    return zlib.crc32("|".join(str(part) for part in parts).encode())
+
+
+@lru_cache(maxsize=1)
+def business_days() -> np.ndarray:
+    """Business days of the simulation calendar."""
+    days = np.arange(CALENDAR_START, CALENDAR_END, dtype="datetime64[D]")
+    return days[np.is_busday(days)]
+
+
+def parse_security(security: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Split a security into root, exchange and yellow key.
+
+    Returns:
+        Tuple of (root, exchange, yellow key), or None if not recognised
+    """
+    parts = security.replace("<", " ").replace(">", " ").split()
+    if len(parts) < 2 or parts[-1].lower() not in YELLOW_KEYS:
+        return None
+    yellow_key = parts[-1].lower()
+    exchange = parts[1].upper() if len(parts) > 2 else ""
+    return parts[0].upper(), exchange, yellow_key
+
+
+class MarketSimulator:
+    """
+    Seeded market model: instruments, daily histories, reference data and
+    intraday ticks.
+
+    Every security gets a geometric random walk over a fixed business day
+    calendar, seeded by the security and the simulation seed, so any date
+    range of any ticker is reproducible and consistent with every other
+    range of the same ticker. Currencies follow their own walks and
+    currency overrides are applied on the fly.
+    """
+
+    def __init__(self, settings: SimulationSettings):
+        """
+        Initialize the simulator.
+
+        Args:
+            settings: Simulation settings
+        """
+        self.settings = settings
+        self._universe: Optional[List[Dict]] = None
+        self._live: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._profile = lru_cache(maxsize=65536)(self._make_profile)
+        self._walk = lru_cache(maxsize=4096)(self._make_walk)
+        self._fx_walk = lru_cache(maxsize=64)(self._make_fx_walk)
+
+    # Instruments
+
+    def profile(self, security: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the static description of a security.
+
+        Returns:
+            Dict of instrument attributes, or None if the security is unknown
+        """
+        return self._profile(security)
+
+    def _make_profile(self, security: str) -> Optional[Dict[str, Any]]:
+        """Derive the attributes of a security from its seed."""
+        parsed = parse_security(security)
+        if parsed is None:
+            return None
+        root, exchange, yellow_key = parsed
+        rng = np.random.default_rng(_seed(self.settings.seed, "profile", security))
+        if rng.random() < self.settings.security_failure_rate:
+            return None
+
+        if yellow_key == "curncy":
+            if len(root) != 6 or root[:3] not in FX_BASE_RATES or root[3:] not in FX_BASE_RATES:
+                return None
+            return {"security": security, "root": root, "yellow_key": yellow_key, "type": "Currency",
+                    "name": f"{root[:3]}-{root[3:]} X-RATE", "currency": root[3:], "exchange": "",
+                    "country": "", "sector": "", "is_fund": False, "inception": 0}
+
+        is_fund = root in KNOWN_FUND_ROOTS or "ETF" in root or (yellow_key == "equity" and rng.random() < 0.2)
+        country = EXCHANGE_COUNTRIES.get(exchange, "US")
+        days = len(business_days())
+        inception = 0 if rng.random() < 0.7 else int(rng.integers(0, days // 2))
+        return {
+            "security": security,
+            "root": root,
+            "yellow_key": yellow_key,
+            "type": "ETP" if is_fund else {"equity": "Common Stock", "index": "Index"}.get(yellow_key, yellow_key.title()),
+            "name": self._instrument_name(root, rng, is_fund),
+            "currency": EXCHANGE_CURRENCIES.get(exchange, "USD"),
+            "exchange": exchange,
+            "country": country,
+            "sector": "" if is_fund else SECTORS[int(rng.integers(len(SECTORS)))],
+            "is_fund": is_fund,
+            "isin": f"{country}{_seed(security) % 10**10:010d}",
+            "inception": inception,
+            "start_price": float(np.exp(rng.uniform(np.log(5), np.log(400)))),
+            "drift": float(rng.normal(0.07, 0.05)),
+            "volatility": float(rng.uniform(0.12, 0.45)) * (0.6 if is_fund else 1.0),
+            "dividend_yield": float(rng.uniform(0.0, 0.04)),
+        }
+
+    @staticmethod
+    def _instrument_name(root: str, rng, is_fund: bool) -> str:
+        """Generate a company or fund name."""
+        first = _NAME_PARTS[int(rng.integers(len(_NAME_PARTS)))]
+        if is_fund:
+            return f"{first} {root.title()} UCITS ETF"
+        return f"{first} {root.title()} {_NAME_SUFFIXES[int(rng.integers(len(_NAME_SUFFIXES)))]}"
+
+    def universe(self) -> List[Dict]:
+        """Instruments available to instrument search."""
+        if self._universe is None:
+            rng = np.random.default_rng(_seed(self.settings.seed, "universe"))
+            letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+            universe, seen = [], set()
+            while len(universe) < self.settings.universe_size:
+                root = "".join(rng.choice(letters, int(rng.integers(2, 5))))
+                exchange = _UNIVERSE_EXCHANGES[int(rng.integers(len(_UNIVERSE_EXCHANGES)))]
+                security = f"{root} {exchange} Equity"
+                profile = self.profile(security)
+                if security in seen or profile is None:
+                    continue
+                seen.add(security)
+                universe.append(profile)
+            self._universe = universe
+        return self._universe
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Search the universe like //blp/instruments.
+
+        Returns:
+            List of {'security', 'description'} results, tickers in the
+            'ROOT EXCH<equity>' form Bloomberg uses
+        """
+        query = query.strip().upper()
+        if not query:
+            return []
+        ranked = []
+        for profile in self.universe():
+            name = profile["name"].upper()
+            if profile["root"].startswith(query):
+                ranked.append((0 if profile["root"] == query else 1, profile))
+            elif query in name:
+                ranked.append((2, profile))
+        ranked.sort(key=lambda item: (item[0], item[1]["root"]))
+        return [
+            {"security": f"{p['root']} {p['exchange']}<{p['yellow_key']}>", "description": p["name"]}
+            for _, p in ranked[:max_results]
+        ]
+
+    # Histories
+
+    def _make_walk(self, security: str) -> Optional[np.ndarray]:
+        """Daily closing prices of a security over the whole calendar."""
+        profile = self.profile(security)
+        if profile is None:
+            return None
+        if profile["yellow_key"] == "curncy":
+            root = profile["root"]
+            return self._fx_walk(root[:3]) / self._fx_walk(root[3:])
+        rng = np.random.default_rng(_seed(self.settings.seed, "walk", security))
+        daily_vol = profile["volatility"] / np.sqrt(252)
+        returns = rng.normal(profile["drift"] / 252 - daily_vol ** 2 / 2, daily_vol, len(business_days()))
+        returns[0] = 0.0
+        prices = profile["start_price"] * np.exp(np.cumsum(returns))
+        if profile["currency"] == "GBp":
+            prices *= 100
+        prices[:profile["inception"]] = np.nan
+        return prices
+
+    def _make_fx_walk(self, currency: str) -> np.ndarray:
+        """USD value of one unit of a currency over the whole calendar."""
+        if currency == "USD":
+            return np.ones(len(business_days()))
+        rng = np.random.default_rng(_seed(self.settings.seed, "fx", currency))
+        daily_vol = FX_VOLATILITY / np.sqrt(252)
+        returns = rng.normal(0.0, daily_vol, len(business_days()))
+        returns[0] = 0.0
+        return FX_BASE_RATES[currency] * np.exp(np.cumsum(returns))
+
+    def fx_factor(self, from_currency: str, to_currency: str) -> np.ndarray:
+        """Daily factor converting amounts in one currency into another."""
+        scale = 1.0
+        if from_currency == "GBp":
+            from_currency, scale = "GBP", scale / 100
+        if to_currency == "GBp":
+            to_currency, scale = "GBP", scale * 100
+        if from_currency == to_currency:
+            return np.full(len(business_days()), scale)
+        return scale * self._fx_walk(from_currency) / self._fx_walk(to_currency)
+
+    def history(self, security: str, fields: List[str], start: date, end: date,
+                currency: Optional[str] = None) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        Daily values of a security between two dates, inclusive.
+
+        Dates after today are never returned.
+
+        Args:
+            security: Bloomberg security identifier
+            fields: Historical fields; unsupported ones are left out
+            start: First date
+            end: Last date
+            currency: Optional currency override for price fields
+
+        Returns:
+            Tuple of datetime64[D] dates and values by field, or None if the
+            security is unknown
+        """
+        prices = self._walk(security)
+        if prices is None:
+            return None
+        profile = self.profile(security)
+        days = business_days()
+        end = min(np.datetime64(end, "D"), np.datetime64(date.today(), "D"))
+        lo = max(int(np.searchsorted(days, np.datetime64(start, "D"))), profile["inception"])
+        hi = int(np.searchsorted(days, end, side="right"))
+        if hi <= lo:
+            return days[:0], {field: np.empty(0) for field in fields if field in HISTORICAL_FIELDS}
+
+        close = prices[lo:hi]
+        if currency and profile["yellow_key"] != "curncy" and currency != profile["currency"]:
+            close = close * self.fx_factor(profile["currency"], currency)[lo:hi]
+
+        values = {}
+        for field in fields:
+            if field not in HISTORICAL_FIELDS or (field == "FUND_NET_ASSET_VAL" and not profile["is_fund"]):
+                continue
+            if field in ("PX_LAST", "FUND_NET_ASSET_VAL"):
+                values[field] = close
+            elif field.startswith("TOT_RETURN_INDEX"):
+                payout = 1.0 if field == "TOT_RETURN_INDEX_GROSS_DVDS" else 0.85
+                carry = np.exp(payout * profile.get("dividend_yield", 0.0) * np.arange(lo, hi) / 252)
+                values[field] = close * carry
+            elif field == "PX_VOLUME":
+                rng = np.random.default_rng(_seed(self.settings.seed, "volume", security))
+                volume = rng.lognormal(13, 0.5, len(days))
+                values[field] = np.round(volume[lo:hi])
+            else:
+                rng = np.random.default_rng(_seed(self.settings.seed, field, security))
+                spread = np.abs(rng.normal(0, profile.get("volatility", 0.1) / np.sqrt(252) / 2, len(days)))[lo:hi]
+                values[field] = close * {"PX_OPEN": 1.0, "PX_HIGH": 1.0 + spread, "PX_LOW": 1.0 - spread}[field]
+        return days[lo:hi], values
+
+    def last_price(self, security: str) -> Optional[float]:
+        """Latest price, including intraday moves of subscribed securities."""
+        with self._lock:
+            if security in self._live:
+                return self._live[security]
+        prices = self._walk(security)
+        if prices is None:
+            return None
+        today = int(np.searchsorted(business_days(), np.datetime64(date.today(), "D"), side="right")) - 1
+        return float(prices[today])
+
+    def tick(self, security: str, rng) -> Optional[float]:
+        """Move the live price of a security by one intraday step."""
+        price = self.last_price(security)
+        if price is None or np.isnan(price):
+            return None
+        volatility = self.profile(security).get("volatility", FX_VOLATILITY)
+        price *= float(np.exp(rng.normal(0.0, volatility / np.sqrt(252 * 6.5 * 3600 / 5))))
+        with self._lock:
+            self._live[security] = price
+        return price
+
+    # Reference data
+
+    def reference(self, security: str, field: str) -> Any:
+        """
+        Value of a reference field.
+
+        Returns:
+            The value (a list of row dicts for bulk fields), or None when the
+            field does not apply to the security
+        """
+        profile = self.profile(security)
+        if field in BULK_FIELDS:
+            return self._bulk(profile, field) if profile["is_fund"] else None
+
+        price = self.last_price(security)
+        spread = (price or 0.0) * 0.0005
+        values = {
+            "NAME": profile["name"],
+            "CRNCY": profile["currency"],
+            "SECURITY_TYP": profile["type"],
+            "EXCH_CODE": profile["exchange"],
+            "ID_ISIN": profile.get("isin"),
+            "COUNTRY_OF_DOMICILE": profile["country"],
+            "GICS_SECTOR_NAME": profile["sector"] or None,
+            "PX_LAST": price,
+            "PX_BID": price - spread if price else None,
+            "PX_ASK": price + spread if price else None,
+            "FUND_NET_ASSET_VAL": price if profile["is_fund"] else None,
+            "FUND_TOTAL_ASSETS": round(_seed(security, "aum") % 50000 + 100.0, 1) if profile["is_fund"] else None,
+        }
+        return values.get(field)
+
+    def _bulk(self, profile: Dict, field: str) -> List[Dict[str, Any]]:
+        """Rows of a fund breakdown, weights in percent of the fund."""
+        rng = np.random.default_rng(_seed(self.settings.seed, field, profile["security"]))
+        label, value = BULK_FIELDS[field]
+        if field == "HB_INDUSTRY_SECTOR_ALLOCATION":
+            categories = INDUSTRY_SECTORS
+        elif field == "FUND_SECTOR_ALLOCATION":
+            categories = SECTORS
+        elif field == "FUND_GEO_ALLOCATION":
+            categories = ["U.S.", "Canada", "United Kingdom", "Germany", "France", "Japan", "Switzerland"]
+        elif field == "FUND_REGION_BREAKDOWN":
+            categories = sorted(set(REGIONS.values()))
+        elif field == "FUND_CURRENCY_BREAKDOWN":
+            categories = list(FX_BASE_RATES)
+        elif field == "FUND_HOLDING_CLASS_LONG":
+            categories = ASSET_CLASSES
+        else:
+            categories = [p["security"] for p in self.universe()[:10]]
+        weights = rng.dirichlet(np.full(len(categories), 0.7)) * 100
+        return [
+            {label: category, value: round(float(weight), 6)}
+            for category, weight in sorted(zip(categories, weights), key=lambda item: -item[1])
+            if weight >= 0.01
+        ]
+
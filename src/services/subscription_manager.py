@@ -0,0 +1,364 @@
+"""
+Real-time market data subscriptions over //blp/mktdata.
+File: src/services/subscription_manager.py
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from services.data_provider import blpapi
+
+logger = logging.getLogger(__name__)
+
+MKTDATA_SERVICE = "//blp/mktdata"
+
+# Fields kept in the last-price table
+SUBSCRIPTION_FIELDS = ["LAST_PRICE", "BID", "ASK"]
+
+_INITIAL_ROWS = 64
+
+# Owners that neither subscribe nor poll for this long release their tickers
+SUBSCRIPTION_LEASE_SECONDS = 10 * 60
+
+
+class SubscriptionManager:
+    """
+    Keeps a last-price table up to date from //blp/mktdata subscriptions.
+
+    The manager runs its own session and event thread, separate from the
+    request/response session, so a burst of ticks never delays historical
+    or reference requests. Each tick overwrites its cell in place and
+    stamps the row with a new version number; readers ask for the rows
+    changed since the version they last saw, so however fast ticks arrive
+    each reader gets at most one update per row per poll.
+
+    Tickers are subscribed on behalf of owners, e.g. browser sessions, and
+    reference counted: a ticker is unsubscribed when no owner holds it.
+    Owners release their tickers with release(), or by not subscribing or
+    polling for SUBSCRIPTION_LEASE_SECONDS.
+
+    While the connection is down the session reconnects by itself and
+    keeps its subscriptions. If it terminates, the next start() replaces
+    it, stopping the old event thread, and subscribes the same tickers on
+    the new session.
+    """
+
+    def __init__(self, fields: Optional[List[str]] = None, host: str = "localhost", port: int = 8194,
+                 poll_timeout_ms: int = 500, lease_seconds: float = SUBSCRIPTION_LEASE_SECONDS,
+                 clock=time.monotonic):
+        """
+        Initialize the manager.
+
+        Args:
+            fields: Market data fields to subscribe to
+            host: Bloomberg API host
+            port: Bloomberg API port
+            poll_timeout_ms: How long each nextEvent call may block
+            lease_seconds: Idle time after which an owner's tickers are released
+            clock: Time source, for tests
+        """
+        self.fields = list(fields or SUBSCRIPTION_FIELDS)
+        self.host = host
+        self.port = port
+        self.poll_timeout_ms = poll_timeout_ms
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+        self.session = None
+        self.is_connected = False
+        self.version = 0
+
+        self._names = []
+        self._rows: Dict[str, int] = {}
+        self._tickers: List[str] = []
+        self._values = np.full((_INITIAL_ROWS, len(self.fields)), np.nan)
+        self._row_versions = np.zeros(_INITIAL_ROWS, dtype="int64")
+        self._subscribed: Dict[str, blpapi.CorrelationId] = {}
+        # Tickers and last use of each owner, and the number of owners per ticker
+        self._owners: Dict[Hashable, Set[str]] = {}
+        self._leases: Dict[Hashable, float] = {}
+        self._counts: Counter = Counter()
+        self._lock = threading.RLock()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """
+        Start the market data session and its event thread.
+
+        A running session is kept, also while it waits to reconnect. A
+        session that terminated or failed to start is replaced, and the
+        tickers it was subscribed to are subscribed again on the new one.
+
+        Returns:
+            bool: True if the session is running
+        """
+        if self.session is not None and self._running.is_set():
+            return True
+        if blpapi is None:
+            logger.error("No data provider available for market data")
+            return False
+        if self.session is not None:
+            logger.info("Replacing the market data session")
+            self._close_session()
+        self._names = [blpapi.Name(field) for field in self.fields]
+        try:
+            options = blpapi.SessionOptions()
+            options.setServerHost(self.host)
+            options.setServerPort(self.port)
+            self.session = blpapi.Session(options)
+            if not self.session.start():
+                logger.error("Failed to start market data session.")
+                return False
+            if not self.session.openService(MKTDATA_SERVICE):
+                logger.error(f"Failed to open {MKTDATA_SERVICE} service.")
+                self.session.stop()
+                return False
+        except Exception as e:
+            logger.error(f"Error starting market data session: {str(e)}")
+            return False
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._pump, name="bloomberg-mktdata-pump", daemon=True)
+        self._thread.start()
+        self.is_connected = True
+        logger.info("Market data session started")
+
+        # Subscriptions belong to the session they were made on
+        with self._lock:
+            replay = list(self._subscribed)
+            self._subscribed.clear()
+        if replay:
+            self._subscribe(replay)
+        return True
+
+    def stop(self):
+        """Cancel all subscriptions and stop the session."""
+        self._close_session()
+        with self._lock:
+            self._subscribed.clear()
+            self._owners.clear()
+            self._leases.clear()
+            self._counts.clear()
+
+    def _close_session(self):
+        """Stop the event thread, then the session."""
+        self._running.clear()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2 * self.poll_timeout_ms / 1000)
+        self._thread = None
+        if self.session:
+            try:
+                self.session.stop()
+            except Exception as e:
+                logger.error(f"Error stopping market data session: {str(e)}")
+        self.session = None
+        self.is_connected = False
+
+    def subscribe(self, tickers: Iterable[str], owner: Hashable = None):
+        """
+        Set the tickers an owner subscribes to.
+
+        Tickers the owner no longer holds are unsubscribed unless another
+        owner holds them, new tickers are subscribed and tickers already
+        subscribed are left alone. Starts the session on first use.
+
+        Args:
+            tickers: Bloomberg security identifiers
+            owner: Key of the subscriber, e.g. a session store key
+        """
+        if not self.start():
+            return
+        with self._lock:
+            self._hold(owner, set(tickers))
+            self._sync()
+
+    def release(self, owner: Hashable):
+        """Drop the tickers of an owner, unsubscribing those no one else holds."""
+        with self._lock:
+            if owner not in self._owners:
+                return
+            self._hold(owner, None)
+            if self.session is not None and self._running.is_set():
+                self._sync()
+
+    def _hold(self, owner: Hashable, tickers: Optional[Set[str]]):
+        """Replace the tickers of an owner, or remove it, and expire idle owners."""
+        previous = self._owners.pop(owner, set())
+        self._leases.pop(owner, None)
+        self._counts.subtract(previous)
+        if tickers is not None:
+            self._owners[owner] = tickers
+            self._leases[owner] = self._clock()
+            self._counts.update(tickers)
+        expired = self._clock() - self.lease_seconds
+        for idle in [key for key, used in self._leases.items() if used < expired]:
+            self._leases.pop(idle)
+            released = self._owners.pop(idle)
+            self._counts.subtract(released)
+            logger.info(f"Released {len(released)} subscriptions of an idle owner")
+        self._counts = +self._counts
+
+    def _sync(self):
+        """Subscribe the session to the tickers held by any owner, and only those."""
+        added = [ticker for ticker in self._counts if ticker not in self._subscribed]
+        removed = [ticker for ticker in self._subscribed if ticker not in self._counts]
+        if removed:
+            unsubscriptions = blpapi.SubscriptionList()
+            for ticker in removed:
+                unsubscriptions.add(ticker, correlationId=self._subscribed.pop(ticker))
+            self.session.unsubscribe(unsubscriptions)
+            logger.info(f"Unsubscribed from {len(removed)} securities")
+        if added:
+            self._subscribe(added)
+
+    def _subscribe(self, tickers: List[str]):
+        """Subscribe the session to tickers."""
+        with self._lock:
+            subscriptions = blpapi.SubscriptionList()
+            for ticker in tickers:
+                correlation_id = blpapi.CorrelationId(self._row(ticker))
+                subscriptions.add(ticker, self.fields, correlationId=correlation_id)
+                self._subscribed[ticker] = correlation_id
+            self.session.subscribe(subscriptions)
+        logger.info(f"Subscribed to {len(tickers)} securities")
+
+    def last_prices(self, tickers: Optional[Iterable[str]] = None, field: str = "LAST_PRICE") -> Dict[str, float]:
+        """
+        Return the latest value of a field.
+
+        Args:
+            tickers: Securities to return, defaults to all
+            field: Subscribed field
+
+        Returns:
+            Dict[str, float]: Values by ticker; tickers without a tick yet
+            are left out
+        """
+        column = self.fields.index(field)
+        with self._lock:
+            rows = self._rows if tickers is None else {t: self._rows[t] for t in tickers if t in self._rows}
+            values = {ticker: self._values[row, column] for ticker, row in rows.items()}
+        return {ticker: float(value) for ticker, value in values.items() if not np.isnan(value)}
+
+    def changes_since(self, version: int, field: str = "LAST_PRICE",
+                      owner: Hashable = None) -> Tuple[int, Dict[str, float]]:
+        """
+        Return the values that changed after a version.
+
+        Args:
+            version: Version returned by the previous call, or 0
+            field: Subscribed field
+            owner: Subscriber polling, whose lease is renewed
+
+        Returns:
+            Tuple of the current version and the changed values by ticker
+        """
+        column = self.fields.index(field)
+        with self._lock:
+            if owner in self._leases:
+                self._leases[owner] = self._clock()
+            count = len(self._tickers)
+            changed = np.flatnonzero(self._row_versions[:count] > version)
+            values = self._values[changed, column]
+            current = self.version
+        changes = {
+            self._tickers[row]: float(value) for row, value in zip(changed, values) if not np.isnan(value)
+        }
+        return current, changes
+
+    def _row(self, ticker: str) -> int:
+        """Return the table row of a ticker, adding one if needed."""
+        with self._lock:
+            row = self._rows.get(ticker)
+            if row is not None:
+                return row
+            row = len(self._tickers)
+            if row == len(self._row_versions):
+                self._values = np.vstack([self._values, np.full_like(self._values, np.nan)])
+                self._row_versions = np.concatenate([self._row_versions, np.zeros_like(self._row_versions)])
+            self._rows[ticker] = row
+            self._tickers.append(ticker)
+            return row
+
+    def _pump(self):
+        """Read events from the session and apply ticks to the table."""
+        while self._running.is_set():
+            try:
+                event = self.session.nextEvent(self.poll_timeout_ms)
+                event_type = event.eventType()
+                if event_type == blpapi.Event.TIMEOUT:
+                    continue
+                for msg in event:
+                    if event_type == blpapi.Event.SUBSCRIPTION_DATA:
+                        self._apply(msg)
+                    elif event_type == blpapi.Event.SUBSCRIPTION_STATUS:
+                        self._status(msg)
+                    elif event_type == blpapi.Event.SESSION_STATUS:
+                        self._session_status(msg)
+            except Exception as e:
+                logger.error(f"Error in market data event pump: {str(e)}")
+
+    def _session_status(self, msg):
+        """Track the connection of the session."""
+        message_type = msg.messageType()
+        if message_type == blpapi.Name("SessionConnectionUp"):
+            if not self.is_connected:
+                logger.info("Market data connection restored")
+            self.is_connected = True
+        elif message_type == blpapi.Name("SessionConnectionDown"):
+            logger.warning("Market data connection lost, waiting for it to reconnect")
+            self.is_connected = False
+        elif message_type == blpapi.Name("SessionTerminated"):
+            if self._running.is_set():
+                logger.error("Market data session terminated")
+            self.is_connected = False
+            # The session is gone; start() replaces it
+            self._running.clear()
+
+    def _apply(self, msg):
+        """Write the fields of one tick into the table."""
+        updates = [
+            (column, msg.getElementAsFloat(name))
+            for column, name in enumerate(self._names)
+            if msg.hasElement(name, True)
+        ]
+        if not updates:
+            return
+        with self._lock:
+            self.version += 1
+            for correlation_id in msg.correlationIds():
+                row = correlation_id.value()
+                for column, value in updates:
+                    self._values[row, column] = value
+                self._row_versions[row] = self.version
+
+    def _status(self, msg):
+        """Log subscription failures and terminations."""
+        if msg.messageType() in (blpapi.Name("SubscriptionFailure"), blpapi.Name("SubscriptionTerminated")):
+            for correlation_id in msg.correlationIds():
+                ticker = self._tickers[correlation_id.value()]
+                with self._lock:
+                    self._subscribed.pop(ticker, None)
+                logger.error(f"Subscription to {ticker} ended: {msg}")
+
+
+# Create a singleton instance
+_subscription_manager = None
+
+
+def get_subscription_manager() -> SubscriptionManager:
+    """
+    Get or create the subscription manager singleton instance.
+
+    Returns:
+        SubscriptionManager: The subscription manager instance
+    """
+    global _subscription_manager
+    if _subscription_manager is None:
+        _subscription_manager = SubscriptionManager()
+    return _subscription_manager
@@ -0,0 +1,270 @@
+"""
+In-process metrics: counters, latency histograms and timing spans.
+File: src/services/telemetry.py
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of histogram buckets
+LATENCY_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS_BYTES = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+METRICS_PATH = "/metrics"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    """Canonical, hashable form of a label set."""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render labels in the Prometheus text format."""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Add to the count of a label set."""
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        """Current counts by label set."""
+        with self._lock:
+            return dict(self._values)
+
+    def total(self, **labels) -> float:
+        """Sum of the counts whose labels include the given ones."""
+        wanted = set(_labels(labels))
+        return sum(value for key, value in self.values().items() if wanted <= set(key))
+
+    def export(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value:g}" for key, value in sorted(self.values().items())]
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS_SECONDS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Record one observation."""
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), count and sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def series(self) -> Dict[Labels, Dict]:
+        """Bucket counts, count and sum by label set."""
+        with self._lock:
+            return {
+                key: {"buckets": list(counts), "count": count, "sum": total}
+                for key, (counts, count, total) in self._series.items()
+            }
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        Estimate a quantile from the buckets, as Prometheus' histogram_quantile does.
+
+        Args:
+            q: Quantile between 0 and 1
+            labels: Label set to read
+
+        Returns:
+            Optional[float]: Estimated value, or None without observations
+        """
+        series = self.series().get(_labels(labels))
+        if not series or not series["count"]:
+            return None
+        rank = q * series["count"]
+        seen = 0
+        for i, count in enumerate(series["buckets"]):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def export(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], series["buckets"]):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:g}")
+        return lines
+
+
+class Telemetry:
+    """
+    Registry of the application's metrics.
+
+    Metrics are created on first use and kept for the lifetime of the
+    process; export() renders all of them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a counter."""
+        return self._get(name, lambda: Counter(name, description))
+
+    def histogram(self, name: str, description: str = "",
+                  buckets: Sequence[float] = LATENCY_BUCKETS_SECONDS) -> Histogram:
+        """Get or create a histogram."""
+        return self._get(name, lambda: Histogram(name, description, buckets))
+
+    def _get(self, name: str, create):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = create()
+            elif not metric.description:
+                # Readers may ask for a metric before the code recording it
+                metric.description = create().description
+            return metric
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Time a block of code into the pf_span_seconds histogram.
+
+        Args:
+            name: Span name, e.g. 'history.fetch'
+            labels: Additional labels
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram("pf_span_seconds", "Duration of instrumented code spans").observe(
+                time.perf_counter() - start, span=name, **labels
+            )
+
+    def export(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.export())
+        return "\n".join(lines) + "\n"
+
+
+def callback_name(output: str) -> str:
+    """
+    Short label for a callback from its output string.
+
+    Multi-output callbacks are named by their first output and the number
+    of further outputs, e.g. 'perf-requests.children (+8)'.
+    """
+    outputs = [part for part in output.strip(".").split("...") if part]
+    if len(outputs) <= 1:
+        return output
+    return f"{outputs[0]} (+{len(outputs) - 1})"
+
+
+def instrument_dash_app(app, telemetry: Optional["Telemetry"] = None):
+    """
+    Record callback timings and response sizes and serve /metrics.
+
+    Callbacks are identified by their output, as Dash sends it with each
+    _dash-update-component request.
+
+    Args:
+        app: The Dash app
+        telemetry: Registry to record into, defaults to the shared instance
+    """
+    from flask import Response, g, request
+
+    telemetry = telemetry or get_telemetry()
+    server = app.server
+    callback_seconds = telemetry.histogram("pf_callback_seconds", "Dash callback execution time")
+    callback_bytes = telemetry.histogram("pf_callback_response_bytes", "Dash callback response size", SIZE_BUCKETS_BYTES)
+    callback_errors = telemetry.counter("pf_callback_errors_total", "Dash callbacks that failed")
+
+    @server.before_request
+    def start_timer():
+        g.telemetry_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        if request.path.endswith("_dash-update-component") and hasattr(g, "telemetry_start"):
+            try:
+                output = callback_name((request.get_json(silent=True) or {}).get("output", "unknown"))
+            except Exception:
+                output = "unknown"
+            callback_seconds.observe(time.perf_counter() - g.telemetry_start, callback=output)
+            if not response.direct_passthrough:
+                callback_bytes.observe(response.calculate_content_length() or 0, callback=output)
+            if response.status_code >= 400:
+                callback_errors.inc(callback=output, status=response.status_code)
+        return response
+
+    @server.route(METRICS_PATH)
+    def metrics():
+        return Response(telemetry.export(), mimetype="text/plain; version=0.0.4")
+
+
+# Create a singleton instance
+_telemetry = None
+
+
+def get_telemetry() -> Telemetry:
+    """
+    Get or create the telemetry singleton instance.
+
+    Returns:
+        Telemetry: The metrics registry
+    """
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = Telemetry()
+    return _telemetry
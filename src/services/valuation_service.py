@@ -0,0 +1,195 @@
+"""
+Daily valuation series of saved portfolios, materialised incrementally.
+File: src/services/valuation_service.py
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.fx_engine import FX_LOOKBACK_DAYS, PIVOT_CURRENCY
+from utils.valuation_engine import ledger_arrays, money_weighted_return, time_weighted_returns
+
+logger = logging.getLogger(__name__)
+
+# Field positions are valued at
+VALUATION_FIELD = "PX_LAST"
+
+# Currency of the stored valuations, as the monitor shows market values
+VALUATION_CURRENCY = PIVOT_CURRENCY
+
+
+class ValuationService:
+    """
+    Values portfolios day by day from their trade ledger, cached prices
+    and FX curves.
+
+    Valuations are stored in the portfolio database. An update revalues
+    the last stored day (it may have been valued intraday) and appends the
+    days after it, so the work per update is proportional to the number of
+    new days rather than to the length of the history. Recording or
+    deleting a trade drops the valuations from its trade date on.
+    """
+
+    def __init__(self, portfolio_service, client, fx_engine):
+        """
+        Args:
+            portfolio_service: PortfolioService storing trades and valuations
+            client: BloombergClient providing get_historical_fields()
+            fx_engine: FXEngine providing conversion factors
+        """
+        self._portfolios = portfolio_service
+        self._client = client
+        self._fx = fx_engine
+
+    def update(self, portfolio_id: int, as_of: Optional[date] = None) -> int:
+        """
+        Bring the stored valuations of a portfolio up to a date.
+
+        Args:
+            portfolio_id: Portfolio to value
+            as_of: Last day to value, defaults to today
+
+        Returns:
+            int: Number of days valued
+        """
+        engine = self._portfolios.position_engine(portfolio_id)
+        positions = engine.positions()
+        if not positions:
+            return 0
+
+        # Continue from the day before the last stored one
+        stored = self._portfolios.latest_valuations(portfolio_id, 2)
+        if len(stored) == 2:
+            opening = stored[0]
+            start = pd.Timestamp(stored[1]["as_of"])
+        else:
+            opening = None
+            start = pd.Timestamp(min(str(position.trades[0]["trade_date"]) for position in positions))
+        end = pd.Timestamp(as_of or date.today())
+        index = pd.bdate_range(start, end, name="date")
+        if index.empty:
+            return 0
+
+        tickers = [position.ticker for position in positions]
+        currencies = [position.currency for position in positions]
+        prices = self._prices(tickers, positions, index)
+        if prices is None:
+            return 0
+        factors = self._fx.factors(currencies, VALUATION_CURRENCY, index)
+
+        # Only the trades after the opening valuation are read; the
+        # quantities held before them are the current ones less those trades
+        since = (pd.Timestamp(opening["as_of"]) + timedelta(days=1)).date().isoformat() if opening else ""
+        recent = [position.trades_since(since) for position in positions]
+        held = np.array([
+            position.quantity - sum(float(trade["quantity"]) for trade in trades)
+            for position, trades in zip(positions, recent)
+        ])
+        quantities, flows = ledger_arrays([trade for trades in recent for trade in trades], tickers, index, held)
+        values = np.nansum(quantities * prices * factors, axis=1)
+        opening_value = opening["market_value"] if opening else 0.0
+        returns = time_weighted_returns(values, flows, opening_value)
+        twr_index = (opening["twr_index"] if opening else 1.0) * np.cumprod(1.0 + returns)
+        invested = (opening["cost_basis"] if opening else 0.0) + np.cumsum(flows)
+
+        self._portfolios.save_valuations(portfolio_id, [
+            {"as_of": day, "market_value": value, "cost_basis": cost, "net_flow": flow, "twr_index": twr}
+            for day, value, cost, flow, twr in zip(
+                index.date, values.tolist(), invested.tolist(), flows.tolist(), twr_index.tolist()
+            )
+        ])
+        # Closing prices of the last day value the holdings until live prices arrive
+        self._portfolios.save_price_snapshots(
+            {"ticker": ticker, "as_of": index[-1], "price": price, "currency": currency, "fx_rate": fx_rate}
+            for ticker, price, currency, fx_rate in zip(tickers, prices[-1].tolist(), currencies, factors[-1].tolist())
+        )
+        logger.info(f"Valued portfolio {portfolio_id} on {len(index)} days from {index[0].date()}")
+        return len(index)
+
+    def _prices(self, tickers, positions, index: pd.DatetimeIndex) -> Optional[np.ndarray]:
+        """
+        (dates x tickers) local currency closing prices, from the history cache.
+
+        Prices are carried forward over holidays; securities without any
+        history are valued at their last trade price.
+        """
+        start = (index[0] - timedelta(days=FX_LOOKBACK_DAYS)).strftime("%Y%m%d")
+        cube = self._client.get_historical_fields(tickers, [VALUATION_FIELD], start, index[-1].strftime("%Y%m%d"))
+        if cube.empty:
+            logger.warning("No prices available to value the portfolio")
+            return None
+
+        closes = cube.xs(VALUATION_FIELD, axis=1, level="field").reindex(columns=tickers)
+        closes = closes.reindex(closes.index.union(index)).ffill().reindex(index).bfill().to_numpy()
+        missing = np.isnan(closes).all(axis=0)
+        if missing.any():
+            logger.warning(f"No price history for {np.asarray(tickers)[missing].tolist()}, "
+                           f"valued at their last trade price")
+            fallback = np.array([position.last_price for position in positions], dtype=np.float64)
+            closes = np.where(np.isnan(closes), fallback, closes)
+        return closes
+
+    def history(self, portfolio_id: int, start=None) -> pd.DataFrame:
+        """
+        Stored valuations of a portfolio.
+
+        Returns:
+            pd.DataFrame: Date indexed market_value, invested (net amount
+            invested), net_flow, pnl and twr_index
+        """
+        rows = self._portfolios.get_valuations(portfolio_id, start)
+        frame = pd.DataFrame(rows, columns=["as_of", "market_value", "cost_basis", "net_flow", "twr_index"])
+        frame.index = pd.DatetimeIndex(frame.pop("as_of"), name="date")
+        frame = frame.rename(columns={"cost_basis": "invested"})
+        frame["pnl"] = frame["market_value"] - frame["invested"]
+        return frame
+
+    def performance(self, portfolio_id: int) -> Dict[str, Any]:
+        """
+        Performance of a portfolio since its first trade.
+
+        Returns:
+            Dict: market_value, invested, pnl, day_return, twr (cumulative)
+            and mwr (annualized, None when undefined) as of the last stored
+            day, or an empty dict without valuations
+        """
+        frame = self.history(portfolio_id)
+        if frame.empty:
+            return {}
+        last = frame.iloc[-1]
+        twr = frame["twr_index"].to_numpy()
+        return {
+            "as_of": frame.index[-1].date().isoformat(),
+            "market_value": float(last["market_value"]),
+            "invested": float(last["invested"]),
+            "pnl": float(last["pnl"]),
+            "day_return": float(twr[-1] / twr[-2] - 1) if len(twr) > 1 else 0.0,
+            "twr": float(twr[-1] - 1),
+            "mwr": money_weighted_return(
+                frame.index, frame["net_flow"].to_numpy(), frame.index[-1], float(last["market_value"])
+            ),
+        }
+
+
+# Create a singleton instance
+_valuation_service = None
+
+
+def get_valuation_service() -> ValuationService:
+    """
+    Get or create the valuation service singleton instance.
+
+    Returns:
+        ValuationService: The service, backed by the portfolio database and Bloomberg client
+    """
+    global _valuation_service
+    if _valuation_service is None:
+        from services.bloomberg_client import get_bloomberg_client
+        from services.fx_engine import get_fx_engine
+        from services.portfolio_service import get_portfolio_service
+        _valuation_service = ValuationService(get_portfolio_service(), get_bloomberg_client(), get_fx_engine())
+    return _valuation_service
@@ -0,0 +1,106 @@
+"""
+Shared fixtures for the benchmark suite, run against the simulated provider.
+File: src/tests/conftest.py
+
+Run with:
+    pytest src/tests --benchmark-autosave
+    pytest src/tests --benchmark-compare --benchmark-compare-fail=median:15%
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app imports modules relative to src, and the provider is chosen at import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_PROVIDER", "simulated")
+
+from services import simulated_blpapi  # noqa: E402
+from services.simulator import MarketSimulator, SimulationSettings  # noqa: E402
+
+# Last day of simulated history used by the benchmarks, fixed so results
+# do not drift with the calendar
+AS_OF = date(2024, 12, 31)
+
+
+def securities(count: int):
+    """Tickers of a simulated portfolio."""
+    return [f"B{i:04d} US Equity" for i in range(count)]
+
+
+def make_security_data(count: int, years: int = 5):
+    """Simulated total return histories as the client returns them."""
+    simulator = MarketSimulator(SimulationSettings(seed=7))
+    start = date(AS_OF.year - years, AS_OF.month, AS_OF.day)
+    data = {}
+    for security in securities(count):
+        dates, values = simulator.history(security, ["TOT_RETURN_INDEX_GROSS_DVDS"], start, AS_OF)
+        data[security] = pd.DataFrame(
+            {"value": values["TOT_RETURN_INDEX_GROSS_DVDS"]},
+            index=pd.DatetimeIndex(dates, name="date")
+        )
+    return data
+
+
+def make_trades(count: int, tickers):
+    """Random buys and sells spread over five years."""
+    rng = np.random.default_rng(7)
+    start = AS_OF - timedelta(days=5 * 365)
+    return [
+        {
+            "ticker": tickers[int(rng.integers(len(tickers)))],
+            "trade_date": start + timedelta(days=int(rng.integers(5 * 365))),
+            "quantity": float(rng.choice([-1, 1, 1]) * rng.integers(1, 500)),
+            "price": float(rng.uniform(20, 500)),
+        }
+        for _ in range(count)
+    ]
+
+
+def make_holdings(count):
+    """Holdings rows shaped like the monitor's holdings store."""
+    return [
+        {
+            "ticker": ticker, "name": f"Holding {i}", "quantity": 100 + i, "avg_cost": 50.0 + i % 7,
+            "current_price": 55.0 + i % 11, "market_value": (100 + i) * (55.0 + i % 11),
+            "pnl_local": (i % 9 - 4) * 100.0, "pnl_usd": (i % 9 - 4) * 100.0, "pnl_percent": (i % 9 - 4) * 1.5,
+            "weight": 100 / count,
+        }
+        for i, ticker in enumerate(securities(count))
+    ]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def simulation():
+    """Simulated provider without artificial latency, so benchmarks measure our code."""
+    simulated_blpapi.configure(latency_ms=0, latency_per_1000_points_ms=0, latency_jitter=0, seed=7)
+    return simulated_blpapi.settings
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Connected client whose caches live in a temporary directory."""
+    from services.bloomberg_client import BloombergClient
+    from services.data_manager import HistoricalDataCache, TimeSeriesStore
+    from services.instrument_index import InstrumentIndex
+    from services.reference_cache import ReferenceDataCache
+    from services.search_cache import SearchCache
+
+    client = BloombergClient()
+    client._history_cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path / "store")))
+    client._search_cache = SearchCache(path=None)
+    client._instrument_index = InstrumentIndex(path=None)
+    client._reference_cache = ReferenceDataCache(path=None)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+@pytest.fixture(scope="session")
+def security_data_100():
+    """Five years of history for 100 securities."""
+    return make_security_data(100)
@@ -0,0 +1,222 @@
+"""
+Benchmarks of the Bloomberg client data path against the simulated provider.
+File: src/tests/test_bloomberg_client.py
+"""
+
+import pytest
+
+from services import simulated_blpapi
+from services.data_manager import HistoricalDataCache, TimeSeriesStore
+from services.historical_decoder import block_to_frame, decode_historical_message
+from services.instrument_index import InstrumentIndex
+from services.simulator import MarketSimulator, SimulationSettings
+from tests.conftest import securities
+
+
+@pytest.mark.parametrize("count", [10, 100])
+def test_historical_fetch(benchmark, client, tmp_path, count):
+    """Fetch, decode and store five years of history with an empty cache."""
+    tickers = securities(count)
+    weights = {ticker: 100 / count for ticker in tickers}
+    stores = iter(range(10**6))
+
+    def empty_cache():
+        client._history_cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path / f"store{next(stores)}")))
+
+    result = benchmark.pedantic(
+        client.get_historical_data, args=(tickers, weights, "20200101", "20241231"),
+        setup=empty_cache, rounds=5
+    )
+    assert len(result) == count + 1
+
+
+def test_historical_fields(benchmark, client, tmp_path):
+    """Fetch three fields of 100 securities into a cube, one request per batch for all fields."""
+    tickers = securities(100)
+    fields = ["PX_LAST", "TOT_RETURN_INDEX_GROSS_DVDS", "PX_VOLUME"]
+    stores = iter(range(10**6))
+
+    def empty_cache():
+        client._history_cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path / f"store{next(stores)}")))
+
+    cube = benchmark.pedantic(
+        client.get_historical_fields, args=(tickers, fields, "20200101", "20241231"),
+        setup=empty_cache, rounds=3
+    )
+    assert cube.shape[1] == 300
+
+
+def test_historical_cached(benchmark, client):
+    """Serve history that is already in the cache."""
+    tickers = securities(100)
+    weights = {ticker: 1.0 for ticker in tickers}
+    client.get_historical_data(tickers, weights, "20200101", "20241231")
+
+    result = benchmark(client.get_historical_data, tickers, weights, "20200101", "20241231")
+    assert len(result) == 101
+
+
+def test_offline_partial_history(client):
+    """Without a connection, the cached part of a longer range is served rather than nothing."""
+    from services.bloomberg_client import BloombergClient
+    tickers = securities(3)
+    weights = {ticker: 1.0 for ticker in tickers}
+    cached = client.get_historical_data(tickers, weights, "20240101", "20240301")
+
+    offline = BloombergClient()
+    offline._history_cache = client._history_cache
+    offline._reference_cache = client._reference_cache
+    result = offline.get_historical_data(tickers, weights, "20240101", "20240305")
+    assert set(result) == set(cached)
+    assert all(len(result[ticker]) == len(cached[ticker]) for ticker in tickers)
+
+
+def test_security_error_not_refetched(client):
+    """A security Bloomberg rejects is remembered, so the next request is served from the cache."""
+    tickers = securities(3) + ["NOTATICKER"]
+    sends = []
+    send = client._dispatcher.send
+    client._dispatcher.send = lambda *args, **kwargs: sends.append(args) or send(*args, **kwargs)
+
+    first = client.get_historical_fields(tickers, ["PX_LAST"], "20240101", "20240301")
+    count = len(sends)
+    second = client.get_historical_fields(tickers, ["PX_LAST"], "20240101", "20240301")
+    assert count == 1 and len(sends) == count
+    assert first.shape[1] == second.shape[1] == 3
+
+
+def test_cancel_after_failed_send(client):
+    """Cancelling while a batch failed to send still cancels the others and raises JobCancelled."""
+    import threading
+    from services.job_manager import JobCancelled
+    cancel = threading.Event()
+    sends = iter(range(10**6))
+    send = client._dispatcher.send
+
+    def flaky_send(*args, **kwargs):
+        if next(sends) == 0:
+            raise RuntimeError("send failed")
+        cancel.set()
+        return send(*args, **kwargs)
+
+    client._dispatcher.send = flaky_send
+    with pytest.raises(JobCancelled):
+        client.get_historical_fields(securities(200), ["PX_LAST"], "20100101", "20241231", cancel_event=cancel)
+
+
+def test_reconnect_after_session_lost(client):
+    """A session that goes down marks the client disconnected; the next request connects a new one."""
+    import time
+    session = client.session
+    session._events.put(simulated_blpapi.Event(
+        simulated_blpapi.Event.SESSION_STATUS, [simulated_blpapi.Message("SessionConnectionDown", {}, [])]
+    ))
+    deadline = time.monotonic() + 5
+    while client.is_connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not client.is_connected
+
+    cube = client.get_historical_fields(securities(3), ["PX_LAST"], "20240101", "20240301")
+    assert client.is_connected and client.session is not session
+    assert cube.shape[1] == 3
+
+
+def test_currency_switch(benchmark, client):
+    """Serve cached local currency history in another base currency from the FX curves."""
+    tickers = [f"B{i:04d} {['US', 'LN', 'GY'][i % 3]} Equity" for i in range(100)]
+    weights = {ticker: 1.0 for ticker in tickers}
+    client.get_historical_data(tickers, weights, "20200101", "20241231", "USD")
+    client.get_historical_data(tickers, weights, "20200101", "20241231", "CHF")
+
+    result = benchmark(client.get_historical_data, tickers, weights, "20200101", "20241231", "CHF")
+    assert len(result) == 101
+
+
+def test_decode_historical_message(benchmark):
+    """Decode one HistoricalDataResponse message of five years into a cache frame."""
+    session = simulated_blpapi.Session()
+    request = {
+        "securities": ["B0000 US Equity"], "fields": ["TOT_RETURN_INDEX_GROSS_DVDS"],
+        "startDate": "20200101", "endDate": "20241231",
+    }
+    _, payloads, _ = session._historical(request)
+    msg = simulated_blpapi.Message("HistoricalDataResponse", payloads[0], [])
+
+    field = "TOT_RETURN_INDEX_GROSS_DVDS"
+    block = benchmark(decode_historical_message, msg, [field])
+    assert block.security == "B0000 US Equity" and len(block_to_frame(block, field)) > 1000
+
+
+@pytest.mark.parametrize("fields", [
+    ["TOT_RETURN_INDEX_GROSS_DVDS"],
+    ["PX_LAST", "PX_OPEN", "PX_HIGH", "PX_LOW", "TOT_RETURN_INDEX_GROSS_DVDS"],
+], ids=["1-field", "5-fields"])
+def test_decode_points_per_second(benchmark, fields):
+    """Decode ten years of history for several fields, reporting points decoded per second."""
+    session = simulated_blpapi.Session()
+    request = {"securities": ["B0000 US Equity"], "fields": fields, "startDate": "20150101", "endDate": "20241231"}
+    _, payloads, points = session._historical(request)
+    msg = simulated_blpapi.Message("HistoricalDataResponse", payloads[0], [])
+
+    block = benchmark(decode_historical_message, msg, fields)
+    benchmark.extra_info["points"] = points
+    benchmark.extra_info["points_per_second"] = round(points / benchmark.stats.stats.mean)
+    assert len(block.dates) > 2500 and set(block.values) == set(fields)
+
+
+def test_reference_data(benchmark, client):
+    """Request reference and bulk fields for 250 securities with an empty cache."""
+    from services.reference_cache import ReferenceDataCache
+    tickers = securities(250)
+    fields = ["NAME", "CRNCY", "HB_INDUSTRY_SECTOR_ALLOCATION", "FUND_GEO_ALLOCATION"]
+
+    def empty_cache():
+        client._reference_cache = ReferenceDataCache(path=None)
+
+    result = benchmark.pedantic(client.get_reference_data, args=(tickers, fields), setup=empty_cache, rounds=5)
+    assert len(result) == 250
+
+
+@pytest.fixture(scope="module")
+def instrument_index():
+    """Local index of 20,000 simulated instruments."""
+    universe = MarketSimulator(SimulationSettings(seed=7, universe_size=20000)).universe()
+    index = InstrumentIndex(path=None)
+    index.add([
+        {"ticker": p["security"], "name": p["name"], "exchange": p["exchange"], "currency": p["currency"]}
+        for p in universe
+    ], persist=False)
+    return index
+
+
+@pytest.mark.parametrize("query", ["AB", "global", "meridian labs", "ABC US Equity"])
+def test_local_search(benchmark, instrument_index, query):
+    """Answer a search from the local instrument index."""
+    results = benchmark(instrument_index.search, query, 20)
+    assert isinstance(results, list)
+
+
+def test_bloomberg_search(benchmark, client):
+    """Search round trip through the dispatcher, bypassing the caches."""
+    from services.search_cache import SearchCache
+
+    def empty_caches():
+        client._search_cache = SearchCache(path=None)
+        client._instrument_index = InstrumentIndex(path=None)
+
+    results = benchmark.pedantic(client.search_securities, args=("AB", 20), setup=empty_caches, rounds=20)
+    assert results
+
+
+def test_search_cache_put(benchmark, tmp_path):
+    """Cache a search result in a full cache; the file is written once per burst, not per search."""
+    from services.search_cache import SearchCache
+    cache = SearchCache(path=str(tmp_path / "search_cache.json"))
+    results = [{"ticker": ticker, "name": f"Instrument {i}"} for i, ticker in enumerate(securities(20))]
+    for i in range(cache.max_entries):
+        cache.put(f"query {i}", 20, results)
+    queries = iter(range(10**6))
+
+    benchmark(lambda: cache.put(f"search {next(queries)}", 20, results))
+    cache.flush()
+    assert len(SearchCache(path=cache.path)._entries) == cache.max_entries
@@ -0,0 +1,74 @@
+"""
+Benchmarks of the portfolio analytics and chart construction.
+File: src/tests/test_calculations.py
+"""
+
+import pytest
+import plotly.io as pio
+
+from components.portfolio.charts import create_performance_figure, create_rolling_figure
+from utils.calculations import calculate_metrics, calculate_rolling
+from utils.portfolio_engine import calculate_portfolio_timeseries
+from tests.conftest import make_security_data
+
+
+@pytest.fixture(scope="module", params=[10, 100, 1000])
+def constituents(request):
+    """Security data and equal weights for a portfolio of N constituents."""
+    data = make_security_data(request.param)
+    weights = {security: 100 / len(data) for security in data}
+    return data, weights
+
+
+@pytest.mark.parametrize("rebalance", ["none", "monthly"])
+def test_portfolio_timeseries(benchmark, constituents, rebalance):
+    """Portfolio value series from constituent histories."""
+    data, weights = constituents
+    portfolio = benchmark(calculate_portfolio_timeseries, data, weights, rebalance)
+    assert len(portfolio) > 1000
+
+
+@pytest.fixture(scope="module")
+def portfolio_data(security_data_100):
+    """Histories of 10 securities plus their portfolio, as the builder receives them."""
+    data = dict(list(security_data_100.items())[:10])
+    weights = {security: 10.0 for security in data}
+    data["portfolio"] = calculate_portfolio_timeseries(data, weights, "none")
+    return data, weights
+
+
+def test_metrics(benchmark, portfolio_data):
+    """Metrics table values for all periods."""
+    data, _ = portfolio_data
+    securities = {k: v for k, v in data.items() if k != "portfolio"}
+    metrics = benchmark(calculate_metrics, securities, data["portfolio"])
+    assert len(metrics) == 11
+
+
+def test_rolling_analytics(benchmark, portfolio_data):
+    """Rolling volatility, Sharpe, beta and drawdown for all windows."""
+    data, _ = portfolio_data
+    securities = {k: v for k, v in data.items() if k != "portfolio"}
+    analytics = benchmark(calculate_rolling, securities, data["portfolio"])
+    assert set(analytics) == {30, 90, 252}
+
+
+def test_performance_figure(benchmark, portfolio_data):
+    """Build and serialize the performance chart of a generated portfolio."""
+    data, weights = portfolio_data
+    securities = [k for k in data if k != "portfolio"]
+
+    def build():
+        return pio.to_json(create_performance_figure(data, securities, weights, "USD"), validate=False)
+
+    payload = benchmark(build)
+    assert len(payload) < 500_000
+
+
+def test_rolling_figure(benchmark, portfolio_data):
+    """Build and serialize the rolling analytics chart; the analytics are computed once per job."""
+    data, _ = portfolio_data
+    securities = {k: v for k, v in data.items() if k != "portfolio"}
+    analytics = calculate_rolling(securities, data["portfolio"], windows=[90])[90]
+    payload = benchmark(lambda: pio.to_json(create_rolling_figure(analytics, "volatility"), validate=False))
+    assert payload
@@ -0,0 +1,93 @@
+"""
+Benchmarks of the local history store.
+File: src/tests/test_data_manager.py
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from services.data_manager import HistoricalDataCache, SeriesKey, TimeSeriesStore, missing_ranges
+
+FIELD = "TOT_RETURN_INDEX_GROSS_DVDS"
+
+
+def key(security):
+    return SeriesKey(security, FIELD, "USD", "DAILY")
+
+
+def test_store_ranges(benchmark, tmp_path, security_data_100):
+    """Write five years of history for 100 securities into an empty store."""
+    stores = iter(range(10**6))
+
+    def empty_cache():
+        return (HistoricalDataCache(TimeSeriesStore(str(tmp_path / f"store{next(stores)}"))),), {}
+
+    def store_all(cache):
+        for security, df in security_data_100.items():
+            cache.store_range(key(security), df, date(2019, 12, 31), date(2024, 12, 31))
+
+    benchmark.pedantic(store_all, setup=empty_cache, rounds=5)
+
+
+def test_append_day(benchmark, tmp_path, security_data_100):
+    """Append the latest day to 100 cached series, the daily refresh path."""
+    cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path / "store")))
+    for security, df in security_data_100.items():
+        cache.store_range(key(security), df.iloc[:-1], df.index[0].date(), df.index[-2].date())
+
+    def append_all():
+        for security, df in security_data_100.items():
+            cache.store_range(key(security), df.iloc[-1:], df.index[-1].date(), df.index[-1].date())
+
+    benchmark.pedantic(append_all, rounds=1, iterations=1)
+
+
+@pytest.fixture(scope="module")
+def warm_cache(tmp_path_factory, security_data_100):
+    """Cache holding five years of history for 100 securities."""
+    cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path_factory.mktemp("store"))))
+    for security, df in security_data_100.items():
+        cache.store_range(key(security), df, date(2019, 12, 31), date(2024, 12, 31))
+    return cache
+
+
+def test_load(benchmark, warm_cache, security_data_100):
+    """Load one year of 100 cached series."""
+    def load_all():
+        return [warm_cache.load(key(security), "20240101", "20241231") for security in security_data_100]
+
+    frames = benchmark(load_all)
+    assert all(len(frame) > 200 for frame in frames)
+
+
+def test_missing(benchmark, warm_cache, security_data_100):
+    """Find the ranges still to fetch for 100 series."""
+    def missing_all():
+        return [warm_cache.missing(key(security), "20150101", "20241231") for security in security_data_100]
+
+    gaps = benchmark(missing_all)
+    assert all(len(gap) == 1 for gap in gaps)
+
+
+def test_missing_ranges(benchmark):
+    """Gap computation over a fragmented coverage list."""
+    coverage = [(date(2000 + i // 12, i % 12 + 1, 1), date(2000 + i // 12, i % 12 + 1, 20)) for i in range(240)]
+    gaps = benchmark(missing_ranges, coverage, date(2000, 1, 1), date(2019, 12, 31))
+    assert len(gaps) == 240
+
+
+def test_today_not_covered(tmp_path):
+    """The current day is stored but fetched again, so its final close replaces the intraday value."""
+    cache = HistoricalDataCache(TimeSeriesStore(str(tmp_path / "store")))
+    today = date.today()
+    start = today - timedelta(days=10)
+
+    def frame(value):
+        return pd.DataFrame({"value": [1.0, value]}, index=pd.DatetimeIndex([start, today], name="date"))
+
+    cache.store_range(key("B0000 US Equity"), frame(2.0), start, today)
+    assert cache.missing(key("B0000 US Equity"), start, today) == [(today, today)]
+    cache.store_range(key("B0000 US Equity"), frame(3.0).iloc[1:], today, today)
+    assert cache.load(key("B0000 US Equity"))["value"].tolist() == [1.0, 3.0]
@@ -0,0 +1,82 @@
+"""
+Benchmarks of page component rendering.
+File: src/tests/test_layouts.py
+"""
+
+import json
+
+import pytest
+from plotly.utils import PlotlyJSONEncoder
+
+from callbacks import portfolio_monitor_callbacks
+from callbacks.portfolio_monitor_callbacks import holdings_table_patch, live_price_patch
+from layouts.portfolio_monitor import holdings_table_rows
+from tests.conftest import make_holdings
+
+
+@pytest.mark.parametrize("count", [20, 200])
+def test_holdings_table(benchmark, count):
+    """Build and serialize the holdings table rows, as sent to the browser when a portfolio loads."""
+    holdings = make_holdings(count)
+    payload = benchmark(lambda: json.dumps(holdings_table_rows(holdings), cls=PlotlyJSONEncoder))
+    assert len(payload) > count * 100
+
+
+def test_live_price_patch(benchmark):
+    """Patch the cells of 10 repriced holdings out of 500, as sent on a live price update."""
+    holdings = make_holdings(500)
+    prices = {holding["ticker"]: holding["current_price"] * 1.01 for holding in holdings[::50]}
+    payload = benchmark(lambda: json.dumps(live_price_patch(holdings, prices)[0], cls=PlotlyJSONEncoder))
+    full = json.dumps(holdings_table_rows(holdings), cls=PlotlyJSONEncoder)
+    assert len(payload) * 20 < len(full)
+
+
+def apply_patch(rows, patch):
+    """Apply the list operations of a Patch to rows, as the browser does."""
+    rows = [dict(row) for row in rows]
+    for operation in patch.to_plotly_json()["operations"]:
+        location, params = operation["location"], operation["params"]
+        if operation["operation"] == "Delete":
+            del rows[location[0]]
+        elif operation["operation"] == "Insert":
+            rows.insert(params["index"], params["value"])
+        else:
+            rows[location[0]][location[1]] = params["value"]
+    return rows
+
+
+def test_holdings_table_patch(benchmark):
+    """Patch the rows of 500 holdings after a trade: one position bought, one closed and one opened."""
+    holdings = make_holdings(500)
+    rows = holdings_table_rows(holdings)
+    traded = dict(holdings[10], quantity=holdings[10]["quantity"] + 50, market_value=1.0)
+    opened = dict(holdings[0], ticker="NEW US Equity", name="New holding")
+    new_rows = holdings_table_rows(holdings[:10] + [traded] + holdings[11:250] + [opened] + holdings[251:])
+
+    patch = benchmark(holdings_table_patch, rows, new_rows)
+    payload = json.dumps(patch, cls=PlotlyJSONEncoder)
+    assert len(payload) * 50 < len(json.dumps(new_rows, cls=PlotlyJSONEncoder))
+    assert apply_patch(rows, patch) == new_rows
+    assert holdings_table_patch(rows, rows) is None
+
+
+def test_reference_refresh_deduplicated(monkeypatch):
+    """A look-through refresh is not queued again while one runs for the same holdings."""
+    import threading
+    import time
+    from services.job_manager import get_job_manager
+    release = threading.Event()
+    monkeypatch.setattr(portfolio_monitor_callbacks, "refresh_reference_data", lambda job, *args: release.wait(5))
+    tickers = [holding["ticker"] for holding in make_holdings(4)]
+
+    first = portfolio_monitor_callbacks.submit_reference_refresh(tickers[:3])
+    assert first is not None
+    assert portfolio_monitor_callbacks.submit_reference_refresh(tickers[:3]) is None
+    second = portfolio_monitor_callbacks.submit_reference_refresh(tickers)
+    assert get_job_manager().get(second).description == "Refresh look-through data for 1 holdings"
+
+    release.set()
+    job = get_job_manager().get(first)
+    while not job.is_finished:
+        time.sleep(0.01)
+    assert portfolio_monitor_callbacks.submit_reference_refresh(tickers[:3]) is not None
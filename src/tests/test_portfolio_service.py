@@ -0,0 +1,73 @@
+"""
+Benchmarks of the portfolio database.
+File: src/tests/test_portfolio_service.py
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from services.mock_data import seed_portfolios
+from services.portfolio_service import PortfolioService
+from tests.conftest import AS_OF, make_trades, securities
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Portfolio database in a temporary directory."""
+    service = PortfolioService(str(tmp_path / "portfolios.db"))
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def large_portfolio(service):
+    """A portfolio of 50 securities with 5,000 trades and a year of valuations."""
+    tickers = securities(50)
+    portfolio_id = service.save_portfolio(
+        "Large", [{"ticker": ticker, "weight": 2.0} for ticker in tickers]
+    )
+    service.add_trades(portfolio_id, make_trades(5000, tickers))
+    service.save_valuations(portfolio_id, [
+        {"as_of": AS_OF - timedelta(days=i), "market_value": 1e6 + i} for i in range(365)
+    ])
+    return portfolio_id
+
+
+def test_load_portfolio(benchmark, service, large_portfolio):
+    """Load a portfolio with its constituents, 5,000 trades and cached valuation."""
+    portfolio = benchmark(service.load_portfolio, large_portfolio)
+    assert len(portfolio["trades"]) == 5000 and portfolio["valuation"]["as_of"] == AS_OF.isoformat()
+
+
+def test_security_trades(benchmark, service, large_portfolio):
+    """Read the trades of one security through the (portfolio, ticker, date) index."""
+    trades = benchmark(service.get_trades, large_portfolio, "B0007 US Equity")
+    assert trades and all(t["ticker"] == "B0007 US Equity" for t in trades)
+
+
+def test_list_portfolios(benchmark, service):
+    """List the saved portfolios for the selector."""
+    seed_portfolios(service)
+    for i in range(100):
+        service.save_portfolio(f"Portfolio {i}", [{"ticker": "B0000 US Equity", "weight": 100.0}])
+    portfolios = benchmark(service.list_portfolios)
+    assert len(portfolios) == 103
+
+
+def test_add_trades(benchmark, tmp_path):
+    """Record 1,000 trades in one transaction."""
+    services = []
+
+    def new_portfolio():
+        service = PortfolioService(str(tmp_path / f"portfolios{len(services)}.db"))
+        services.append(service)
+        return (service, service.save_portfolio("P", []), make_trades(1000, securities(20))), {}
+
+    ids = benchmark.pedantic(
+        lambda service, portfolio_id, trades: service.add_trades(portfolio_id, trades),
+        setup=new_portfolio, rounds=10
+    )
+    assert len(ids) == 1000
+    for service in services:
+        service.close()
@@ -0,0 +1,140 @@
+"""
+Known-answer tests and benchmarks of the position engine.
+File: src/tests/test_position_engine.py
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.position_engine import PositionEngine
+from tests.conftest import AS_OF, make_trades, securities
+
+
+def trade(trade_id, trade_date, quantity, price, **extra):
+    """One ledger entry of B0000 US Equity."""
+    return {
+        "id": trade_id, "ticker": "B0000 US Equity", "trade_date": trade_date,
+        "quantity": quantity, "price": price, **extra,
+    }
+
+
+def test_average_and_fifo_realised():
+    """A sale across two lots realises against the average cost, or the oldest lot first."""
+    engine = PositionEngine([
+        trade(1, "2024-01-02", 100, 10.0),
+        trade(2, "2024-02-01", 100, 20.0),
+        trade(3, "2024-03-01", -150, 30.0),
+    ])
+    average = engine.valuation({"B0000 US Equity": 40.0}, method="average").iloc[0]
+    fifo = engine.valuation({"B0000 US Equity": 40.0}, method="fifo").iloc[0]
+
+    # 150 * (30 - 15); the remaining 50 keep the average cost of 15
+    assert average["realised_usd"] == pytest.approx(2250)
+    assert average["avg_cost"] == pytest.approx(15) and average["pnl_usd"] == pytest.approx(1250)
+    # 100 * (30 - 10) + 50 * (30 - 20); the remaining 50 are the lot bought at 20
+    assert fifo["realised_usd"] == pytest.approx(2500)
+    assert fifo["avg_cost"] == pytest.approx(20) and fifo["pnl_usd"] == pytest.approx(1000)
+    assert engine.position("B0000 US Equity").open_lots() == [
+        {"trade_date": "2024-02-01", "quantity": 50.0, "unit_cost": 20.0, "unit_cost_usd": 20.0}
+    ]
+
+
+@pytest.mark.parametrize("method", ["average", "fifo"])
+def test_flip_to_short(method):
+    """Selling more than is held closes the long and opens a short at the sale price."""
+    engine = PositionEngine([trade(1, "2024-01-02", 100, 10.0), trade(2, "2024-02-01", -150, 12.0)])
+    row = engine.valuation({"B0000 US Equity": 11.0}, method=method).iloc[0]
+
+    assert row["quantity"] == -50 and row["avg_cost"] == pytest.approx(12)
+    assert row["realised_usd"] == pytest.approx(200)
+    # Short 50 opened at 12, now at 11
+    assert row["pnl_usd"] == pytest.approx(50) and row["pnl_percent"] == pytest.approx(100 / 12)
+
+
+@pytest.mark.parametrize("method", ["average", "fifo"])
+def test_fees_and_fx(method):
+    """Fees raise the cost of a buy and reduce the proceeds of a sale; USD P&L uses each trade's rate."""
+    engine = PositionEngine([
+        trade(1, "2024-01-02", 100, 10.0, fees=50.0, fx_rate=1.2, currency="EUR"),
+        trade(2, "2024-02-01", -100, 12.0, fees=20.0, fx_rate=1.25),
+    ])
+    row = engine.valuation(method=method, open_only=False).iloc[0]
+
+    # Proceeds 1,200 - 20 against a cost of 1,000 + 50
+    assert row["realised_local"] == pytest.approx(130)
+    # 1,180 * 1.25 - 1,050 * 1.2
+    assert row["realised_usd"] == pytest.approx(215)
+    assert row["quantity"] == 0 and row["cost_basis"] == 0
+
+
+def test_minor_currency():
+    """Local P&L of a security quoted in pence is reported in pounds."""
+    engine = PositionEngine([trade(1, "2024-01-02", 100, 500.0, fx_rate=0.0125, currency="GBp")])
+    row = engine.valuation({"B0000 US Equity": 550.0}, {"GBp": 0.013}).iloc[0]
+
+    assert row["pnl_local"] == pytest.approx(50)
+    assert row["market_value"] == pytest.approx(715) and row["pnl_usd"] == pytest.approx(90)
+
+
+@pytest.mark.parametrize("method", ["average", "fifo"])
+def test_backdated_trade(method):
+    """A trade dated before earlier ones is replayed in date order, as if it had been entered first."""
+    trades = [
+        trade(1, "2024-01-02", 100, 10.0),
+        trade(2, "2024-03-01", -50, 20.0),
+        trade(3, "2024-02-01", 100, 16.0),
+    ]
+    engine = PositionEngine(trades[:2])
+    engine.apply(trades[2])
+    row = engine.valuation({"B0000 US Equity": 20.0}, method=method).iloc[0]
+
+    # Average cost 13 when sold; FIFO sells from the lot bought at 10
+    assert row["realised_usd"] == pytest.approx({"average": 350, "fifo": 500}[method])
+    assert row["quantity"] == 150 and engine.trade_count == 3
+    expected = PositionEngine(trades).valuation({"B0000 US Equity": 20.0}, method=method)
+    pd.testing.assert_frame_equal(engine.valuation({"B0000 US Equity": 20.0}, method=method), expected)
+
+
+@pytest.fixture(scope="module")
+def ledger():
+    """5,000 trades of 50 securities in ledger order."""
+    trades = make_trades(5000, securities(50))
+    for trade_id, trade in enumerate(trades, start=1):
+        trade.update(id=trade_id, trade_date=trade["trade_date"].isoformat())
+    return sorted(trades, key=lambda t: (t["trade_date"], t["id"]))
+
+
+def test_replay_ledger(benchmark, ledger):
+    """Build the positions of a portfolio from its full ledger."""
+    engine = benchmark(PositionEngine, ledger)
+    assert engine.trade_count == 5000 and len(engine.positions()) == 50
+
+
+def test_append_trade(benchmark, ledger):
+    """Append one trade to a portfolio with 5,000 trades; only its position is updated."""
+    engine = PositionEngine(ledger)
+    trade_ids = iter(range(len(ledger) + 1, 10 ** 9))
+    trade_date = (AS_OF + timedelta(days=1)).isoformat()
+
+    def append():
+        return engine.apply({
+            "id": next(trade_ids), "ticker": "B0007 US Equity", "trade_date": trade_date,
+            "quantity": 10.0, "price": 100.0,
+        })
+
+    position = benchmark(append)
+    assert position.ticker == "B0007 US Equity" and engine.trade_count > 5000
+
+
+@pytest.mark.parametrize("method", ["average", "fifo"])
+def test_valuation(benchmark, method):
+    """Value 500 positions and compute their realised and unrealised P&L."""
+    tickers = securities(500)
+    engine = PositionEngine(make_trades(20000, tickers))
+    rng = np.random.default_rng(11)
+    prices = {ticker: float(price) for ticker, price in zip(tickers, rng.uniform(20, 500, len(tickers)))}
+    frame = benchmark(engine.valuation, prices, {"USD": 1.0}, method)
+    assert len(frame) == len(engine.positions(open_only=True))
@@ -0,0 +1,38 @@
+"""
+Benchmarks of the server-side session store.
+File: src/tests/test_session_store.py
+"""
+
+import json
+
+from services.session_store import SessionStore, estimate_size
+from tests.conftest import make_holdings
+
+
+def test_store_roundtrip(benchmark):
+    """Replace and read back 500 holdings under one handle; the page receives only the handle."""
+    store = SessionStore()
+    holdings = make_holdings(500)
+    handle = store.put(holdings)
+
+    def roundtrip():
+        return store.get(store.put(holdings, handle))
+
+    assert benchmark(roundtrip) is holdings
+    assert store.stats()["entries"] == 1
+    assert len(json.dumps(store.put(holdings, handle))) * 1000 < len(json.dumps(holdings))
+
+
+def test_store_eviction():
+    """Entries are evicted least recently used first and expire when idle."""
+    now = [0.0]
+    holdings = make_holdings(20)
+    store = SessionStore(max_bytes=3 * estimate_size(holdings), ttl_seconds=60, clock=lambda: now[0])
+    first, second, third = (store.put(holdings) for _ in range(3))
+    store.get(first)
+    store.put(holdings)
+    assert store.get(second) is None and store.get(first) is holdings and store.get(third) is holdings
+
+    now[0] = 61.0
+    assert store.get(first, []) == [] and store.put([], third)["version"] == 2
+    assert store.stats()["entries"] == 1
@@ -0,0 +1,97 @@
+"""
+Tests of the market data subscription manager against the simulated provider.
+File: src/tests/test_subscription_manager.py
+"""
+
+import time
+
+import pytest
+
+from services import simulated_blpapi
+from services.subscription_manager import SubscriptionManager
+from tests.conftest import securities
+
+
+def wait_until(condition, timeout=5.0):
+    """Poll a condition until it holds or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def session_status(manager, message_type):
+    """Deliver a session status message to the manager's event thread."""
+    manager.session._events.put(simulated_blpapi.Event(
+        simulated_blpapi.Event.SESSION_STATUS, [simulated_blpapi.Message(message_type, {}, [])]
+    ))
+
+
+@pytest.fixture
+def manager():
+    """Manager subscribed to five simulated securities."""
+    tick_interval_ms = simulated_blpapi.settings.tick_interval_ms
+    simulated_blpapi.configure(tick_interval_ms=20)
+    manager = SubscriptionManager(poll_timeout_ms=50)
+    manager.subscribe(securities(5))
+    yield manager
+    manager.stop()
+    simulated_blpapi.configure(tick_interval_ms=tick_interval_ms)
+
+
+def test_connection_down_and_up(manager):
+    """A dropped connection that comes back keeps the session and its subscriptions."""
+    session = manager.session
+    session_status(manager, "SessionConnectionDown")
+    assert wait_until(lambda: not manager.is_connected)
+    # Subscribing while disconnected waits for the session rather than replacing it
+    manager.subscribe(securities(6))
+    assert manager.session is session
+    session_status(manager, "SessionConnectionUp")
+    assert wait_until(lambda: manager.is_connected)
+    assert manager.session is session and set(manager._subscribed) == set(securities(6))
+
+
+def test_restart_after_termination(manager):
+    """A terminated session is replaced on the next subscribe, with one event thread and its tickers."""
+    thread = manager._thread
+    session_status(manager, "SessionTerminated")
+    assert wait_until(lambda: not manager.is_connected)
+
+    manager.subscribe(securities(5))
+    assert not thread.is_alive() and manager._thread is not thread
+    assert set(manager._subscribed) == set(securities(5))
+    version = manager.version
+    assert wait_until(lambda: manager.changes_since(version)[1])
+
+
+def test_owners_share_tickers(manager):
+    """A ticker stays subscribed while any owner holds it."""
+    manager.subscribe(securities(3), owner="first")
+    manager.subscribe(securities(5)[2:], owner="second")
+    manager.release(None)
+    assert set(manager._subscribed) == set(securities(5))
+
+    # The first owner loads another portfolio; the second keeps its tickers
+    manager.subscribe(["B0100 US Equity"], owner="first")
+    assert set(manager._subscribed) == set(securities(5)[2:]) | {"B0100 US Equity"}
+    manager.release("second")
+    assert set(manager._subscribed) == {"B0100 US Equity"}
+
+
+def test_idle_owner_released(manager):
+    """An owner that stops polling releases its tickers when its lease runs out."""
+    now = [0.0]
+    manager._clock = lambda: now[0]
+    manager.lease_seconds = 60
+    manager.subscribe(securities(3), owner="idle")
+    manager.subscribe(["B0100 US Equity"], owner="polling")
+    manager.release(None)
+
+    now[0] = 50.0
+    manager.changes_since(0, owner="polling")
+    now[0] = 100.0
+    manager.subscribe(["B0100 US Equity"], owner="polling")
+    assert set(manager._subscribed) == {"B0100 US Equity"}
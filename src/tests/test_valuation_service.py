@@ -0,0 +1,105 @@
+"""
+Known-answer tests and benchmarks of the daily portfolio valuation.
+File: src/tests/test_valuation_service.py
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.fx_engine import FXEngine
+from services.portfolio_service import PortfolioService
+from services.valuation_service import ValuationService
+from tests.conftest import AS_OF, make_trades, securities
+from utils.valuation_engine import DAYS_PER_YEAR, ledger_arrays, money_weighted_return, time_weighted_returns
+
+
+def test_ledger_arrays():
+    """Quantities and flows of a ledger with a weekend trade, a trade before the index and a sale."""
+    index = pd.bdate_range("2024-01-01", "2024-01-10")
+    trades = [
+        # Before the index: counts on its first date
+        {"ticker": "A", "trade_date": "2023-12-15", "quantity": 10, "price": 100.0},
+        # Saturday: counts on Monday 8 January, with fees and its own FX rate
+        {"ticker": "B", "trade_date": "2024-01-06", "quantity": 5, "price": 20.0, "fees": 2.0, "fx_rate": 1.1},
+        # Sale: a negative flow net of fees
+        {"ticker": "A", "trade_date": "2024-01-09", "quantity": -4, "price": 110.0, "fees": 1.0},
+        # After the index: left out
+        {"ticker": "A", "trade_date": "2024-02-01", "quantity": 100, "price": 120.0},
+    ]
+    quantities, flows = ledger_arrays(trades, ["A", "B"], index, opening=np.array([1.0, 0.0]))
+
+    assert quantities[:, 0].tolist() == [11, 11, 11, 11, 11, 11, 7, 7]
+    assert quantities[:, 1].tolist() == [0, 0, 0, 0, 0, 5, 5, 5]
+    assert np.allclose(flows, [1000, 0, 0, 0, 0, 112.2, -439, 0])
+
+
+def test_time_weighted_returns():
+    """Flows count at the start of their day; a day with nothing invested returns zero."""
+    values = np.array([100.0, 110.0, 165.0, 0.0])
+    flows = np.array([100.0, 0.0, 50.0, -165.0])
+    assert np.allclose(time_weighted_returns(values, flows), [0, 0.1, 5 / 160, 0])
+    assert np.allclose(time_weighted_returns(np.array([210.0]), np.array([0.0]), opening_value=200.0), [0.05])
+
+
+def test_money_weighted_return():
+    """Annualized IRR of one and of two flows, and None without flows."""
+    dates = pd.DatetimeIndex(["2022-01-01", "2023-01-01"])
+    end_date = pd.Timestamp("2024-01-01")
+
+    one = money_weighted_return(dates, np.array([1000.0, 0.0]), end_date, 1100.0)
+    assert one == pytest.approx(1.1 ** (DAYS_PER_YEAR / 730) - 1)
+
+    flows = np.array([1000.0, 500.0])
+    years = (end_date - dates).days.to_numpy() / DAYS_PER_YEAR
+    end_value = float(np.sum(flows * 1.05 ** years))
+    assert money_weighted_return(dates, flows, end_date, end_value) == pytest.approx(0.05)
+    assert money_weighted_return(dates, np.zeros(2), end_date, 0.0) is None
+
+
+@pytest.fixture
+def valuations(client, tmp_path):
+    """Valuation service over a portfolio of 20 securities with 2,000 trades."""
+    portfolios = PortfolioService(str(tmp_path / "portfolios.db"))
+    tickers = securities(20)
+    portfolio_id = portfolios.save_portfolio("Valued", [{"ticker": ticker, "weight": 5.0} for ticker in tickers])
+    portfolios.add_trades(portfolio_id, make_trades(2000, tickers))
+    service = ValuationService(portfolios, client, FXEngine(client))
+    # Warm the price cache, so the benchmarks measure the valuation
+    service.update(portfolio_id, AS_OF)
+    yield service, portfolios, portfolio_id
+    portfolios.close()
+
+
+def test_full_valuation(benchmark, valuations):
+    """Value five years of a portfolio from its first trade."""
+    service, portfolios, portfolio_id = valuations
+
+    def clear():
+        portfolios.delete_valuations(portfolio_id)
+
+    days = benchmark.pedantic(service.update, args=(portfolio_id, AS_OF), setup=clear, rounds=5)
+    assert days > 1200
+
+
+def test_incremental_valuation(benchmark, valuations):
+    """Bring the valuations of a portfolio up to date after a month; matches a full revaluation."""
+    service, portfolios, portfolio_id = valuations
+    full = service.history(portfolio_id)
+
+    def rewind():
+        portfolios.delete_valuations(portfolio_id, AS_OF - timedelta(days=30))
+
+    days = benchmark.pedantic(service.update, args=(portfolio_id, AS_OF), setup=rewind, rounds=5)
+    assert days <= 23
+    incremental = service.history(portfolio_id)
+    assert np.allclose(incremental[["market_value", "invested", "twr_index"]], full[["market_value", "invested", "twr_index"]])
+
+
+def test_performance(benchmark, valuations):
+    """Read the stored series and compute the TWR and annualized MWR."""
+    service, _, portfolio_id = valuations
+    performance = benchmark(service.performance, portfolio_id)
+    assert performance["as_of"] == AS_OF.isoformat() and "mwr" in performance
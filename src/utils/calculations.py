@@ -0,0 +1,301 @@
+"""
+Vectorized performance metrics for portfolios and instruments.
+File: src/utils/calculations.py
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_engine import align_prices
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.025
+
+METRICS = ["annualized_return", "volatility", "sharpe_ratio", "max_drawdown"]
+PERIODS = ["YTD", "1Y", "3Y", "5Y"]
+
+# A period counts as covered if the data starts at most this close after its start
+PERIOD_START_TOLERANCE = np.timedelta64(7, "D")
+
+
+def period_anchors(as_of: pd.Timestamp, periods: List[str] = PERIODS) -> List[pd.Timestamp]:
+    """
+    Return the date each period is measured from.
+
+    Args:
+        as_of: Last date of the analysis
+        periods: Period labels, 'YTD' or '<n>Y'
+
+    Returns:
+        List[pd.Timestamp]: One anchor date per period
+    """
+    anchors = []
+    for period in periods:
+        if period == "YTD":
+            anchors.append(pd.Timestamp(as_of.year - 1, 12, 31))
+        else:
+            anchors.append(as_of - pd.DateOffset(years=int(period[:-1])))
+    return anchors
+
+
+def metrics_grid(dates: pd.DatetimeIndex, prices: np.ndarray, anchors: List[pd.Timestamp],
+                 first_dates: Optional[np.ndarray] = None,
+                 risk_free_rate: float = RISK_FREE_RATE) -> np.ndarray:
+    """
+    Compute every metric for every period and instrument in one pass.
+
+    Return and volatility come from cumulative sums of log returns and
+    squared log returns, so each period is a difference of two rows.
+    Drawdowns use a running maximum over a (periods, dates, instruments)
+    block in which the rows before each period's start are masked out.
+    Returns of periods shorter than a year are not annualized, but the
+    Sharpe ratio always uses the annualized return.
+
+    Args:
+        dates: Sorted dates of the price matrix
+        prices: Gap free matrix of shape (dates, instruments)
+        anchors: Start date of each period; all periods end on the last date
+        first_dates: First real observation of each instrument, used to
+            blank out periods an instrument does not cover
+        risk_free_rate: Annual risk free rate for the Sharpe ratio
+
+    Returns:
+        np.ndarray: Shape (len(METRICS), periods, instruments), NaN where
+        a period is not covered by the data
+    """
+    n_dates, n_instruments = prices.shape
+    grid = np.full((len(METRICS), len(anchors), n_instruments), np.nan)
+    if n_dates < 2 or n_instruments == 0:
+        return grid
+
+    date_values = np.asarray(dates.values, dtype="datetime64[ns]")
+    anchor_values = np.array([np.datetime64(a, "ns") for a in anchors])
+    covered = anchor_values + PERIOD_START_TOLERANCE >= date_values[0]
+    starts = np.clip(np.searchsorted(date_values, anchor_values, side="right") - 1, 0, n_dates - 2)
+
+    # Only rows from the earliest period start onwards are needed
+    first = int(starts.min())
+    window = prices[first:]
+    starts = starts - first
+
+    # Sums of log returns and squared log returns from each start to the end
+    log_returns = np.diff(np.log(window), axis=0)
+    cum = np.zeros((window.shape[0], n_instruments))
+    cum_sq = np.zeros((window.shape[0], n_instruments))
+    np.cumsum(log_returns, axis=0, out=cum[1:])
+    np.cumsum(log_returns ** 2, axis=0, out=cum_sq[1:])
+    n = (window.shape[0] - 1 - starts)[:, None]
+    total = cum[-1] - cum[starts]
+    total_sq = cum_sq[-1] - cum_sq[starts]
+
+    years = ((date_values[-1] - date_values[first + starts]) / np.timedelta64(1, "D") / 365.25)[:, None]
+    growth = np.exp(total)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        annualized = growth ** (1 / np.maximum(years, 1e-9)) - 1
+        variance = np.maximum(total_sq - total ** 2 / n, 0) / np.maximum(n - 1, 1)
+        volatility = np.sqrt(variance * TRADING_DAYS_PER_YEAR)
+        sharpe = (annualized - risk_free_rate) / volatility
+
+    # Running peak from each period's start; earlier rows are NaN and ignored by fmax
+    rows = np.arange(window.shape[0])[None, :, None]
+    masked = np.where(rows >= starts[:, None, None], window[None], np.nan)
+    peaks = np.fmax.accumulate(masked, axis=1)
+    with np.errstate(invalid="ignore"):
+        drawdown = np.nanmin(masked / peaks, axis=1) - 1
+
+    grid[0] = np.where(years >= 1, annualized, growth - 1)
+    grid[1], grid[2], grid[3] = volatility, sharpe, drawdown
+
+    available = np.broadcast_to(covered[:, None], grid.shape[1:]).copy()
+    if first_dates is not None:
+        available &= np.asarray(first_dates, dtype="datetime64[ns]")[None, :] <= anchor_values[:, None] + PERIOD_START_TOLERANCE
+    grid[:, ~available] = np.nan
+    return grid
+
+
+def instrument_matrix(security_data: Dict[str, pd.DataFrame], portfolio: Optional[pd.DataFrame] = None):
+    """
+    Align instruments and the portfolio into one price matrix.
+
+    Args:
+        security_data: Mapping of security to a date indexed DataFrame with a 'value' column
+        portfolio: Portfolio DataFrame with a 'portfolio_value' column
+
+    Returns:
+        Tuple of the date index, instrument names ('Portfolio' first, if
+        given), the gap free price matrix and each instrument's first
+        observation date
+    """
+    data = {s: df for s, df in security_data.items() if not df.empty}
+    dates, securities, prices = align_prices(data)
+    first_dates = [data[s].index[0] for s in securities]
+    names = securities
+
+    if portfolio is not None and not portfolio.empty:
+        values = portfolio["portfolio_value"].reindex(dates).ffill().bfill().to_numpy(dtype="float64")
+        prices = np.column_stack([values, prices])
+        first_dates = [portfolio.index[0]] + first_dates
+        names = ["Portfolio"] + securities
+
+    return dates, names, prices, np.array(first_dates, dtype="datetime64[ns]")
+
+
+def calculate_metrics(security_data: Dict[str, pd.DataFrame], portfolio: Optional[pd.DataFrame] = None,
+                      periods: List[str] = PERIODS) -> pd.DataFrame:
+    """
+    Calculate performance metrics for a set of instruments and their portfolio.
+
+    Args:
+        security_data: Mapping of security to a date indexed DataFrame with a 'value' column
+        portfolio: Portfolio DataFrame with a 'portfolio_value' column
+        periods: Period labels, 'YTD' or '<n>Y'
+
+    Returns:
+        pd.DataFrame: One row per instrument ('Portfolio' first) and
+        (period, metric) columns
+    """
+    dates, names, prices, first_dates = instrument_matrix(security_data, portfolio)
+    columns = pd.MultiIndex.from_product([periods, METRICS], names=["period", "metric"])
+    if len(dates) == 0:
+        return pd.DataFrame(index=names, columns=columns, dtype="float64")
+
+    grid = metrics_grid(dates, prices, period_anchors(dates[-1], periods), first_dates)
+    # (metrics, periods, instruments) -> (instruments, periods * metrics)
+    table = grid.transpose(2, 1, 0).reshape(len(names), -1)
+    return pd.DataFrame(table, index=names, columns=columns)
+
+
+ROLLING_WINDOWS = [30, 90, 252]
+ROLLING_METRICS = ["volatility", "sharpe_ratio", "beta", "drawdown"]
+
+
+class RollingAnalytics:
+    """
+    Rolling volatility, Sharpe ratio, beta and drawdown for one window length.
+
+    The full history is computed from differences of cumulative sums of
+    log returns, squared log returns and cross products with the
+    benchmark, so every window costs the same regardless of its length.
+    """
+
+    def __init__(self, names: List[str], window: int, benchmark: int = 0,
+                 risk_free_rate: float = RISK_FREE_RATE):
+        """
+        Initialize empty analytics.
+
+        Args:
+            names: Instrument names, one per price column
+            window: Window length in observations
+            benchmark: Column of the benchmark used for beta
+            risk_free_rate: Annual risk free rate for the Sharpe ratio
+        """
+        self.names = list(names)
+        self.window = window
+        self.benchmark = benchmark
+        self.risk_free_rate = risk_free_rate
+        self._dates = np.empty(0, dtype="datetime64[ns]")
+        self._series = {metric: np.empty((0, len(self.names))) for metric in ROLLING_METRICS}
+
+    @classmethod
+    def from_prices(cls, dates: pd.DatetimeIndex, prices: np.ndarray, names: List[str], window: int,
+                    benchmark: int = 0, first_dates: Optional[np.ndarray] = None,
+                    risk_free_rate: float = RISK_FREE_RATE) -> "RollingAnalytics":
+        """
+        Compute the analytics for a full price history.
+
+        Args:
+            dates: Sorted dates of the price matrix
+            prices: Gap free matrix of shape (dates, instruments)
+            names: Instrument names, one per price column
+            window: Window length in observations
+            benchmark: Column of the benchmark used for beta
+            first_dates: First real observation of each instrument; values
+                before a full window of real data are left blank
+            risk_free_rate: Annual risk free rate for the Sharpe ratio
+
+        Returns:
+            RollingAnalytics: The computed analytics
+        """
+        analytics = cls(names, window, benchmark, risk_free_rate)
+        n_dates, n_instruments = prices.shape
+        series = {metric: np.full((n_dates, n_instruments), np.nan) for metric in ROLLING_METRICS}
+
+        if n_dates > window:
+            returns = np.diff(np.log(prices), axis=0)
+            bench = returns[:, benchmark:benchmark + 1]
+            sums = []
+            for values in (returns, returns ** 2, returns * bench):
+                cum = np.zeros((n_dates, n_instruments))
+                np.cumsum(values, axis=0, out=cum[1:])
+                sums.append(cum[window:] - cum[:-window])
+            stats = analytics._statistics(*sums)
+            for metric, values in zip(ROLLING_METRICS[:3], stats):
+                series[metric][window:] = values
+
+        peaks = pd.DataFrame(prices).rolling(window, min_periods=window).max().to_numpy()
+        series["drawdown"] = prices / peaks - 1
+
+        if first_dates is not None:
+            first_rows = np.searchsorted(np.asarray(dates.values, dtype="datetime64[ns]"),
+                                         np.asarray(first_dates, dtype="datetime64[ns]"))
+            blank = np.arange(n_dates)[:, None] < (first_rows + window)[None, :]
+            for values in series.values():
+                values[blank] = np.nan
+
+        analytics._dates = np.asarray(dates.values, dtype="datetime64[ns]").copy()
+        analytics._series = series
+        return analytics
+
+    def frame(self, metric: str) -> pd.DataFrame:
+        """
+        Return one rolling metric as a DataFrame.
+
+        Args:
+            metric: One of ROLLING_METRICS
+
+        Returns:
+            pd.DataFrame: Date indexed, one column per instrument
+        """
+        return pd.DataFrame(self._series[metric], index=pd.DatetimeIndex(self._dates, name="date"),
+                            columns=self.names)
+
+    def _statistics(self, sum_r, sum_sq, sum_cross):
+        """Volatility, Sharpe ratio and beta from window sums (instruments on the last axis)."""
+        w = self.window
+        b = self.benchmark
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sum_r / w
+            variance = np.maximum(sum_sq - sum_r * mean, 0) / (w - 1)
+            covariance = (sum_cross - sum_r * mean[..., b, None]) / (w - 1)
+            volatility = np.sqrt(variance * TRADING_DAYS_PER_YEAR)
+            sharpe = (mean * TRADING_DAYS_PER_YEAR - self.risk_free_rate) / volatility
+            beta = covariance / variance[..., b, None]
+        return volatility, sharpe, beta
+
+
+def calculate_rolling(security_data: Dict[str, pd.DataFrame], portfolio: Optional[pd.DataFrame] = None,
+                      windows: List[int] = ROLLING_WINDOWS) -> Dict[int, RollingAnalytics]:
+    """
+    Calculate rolling analytics for a set of instruments and their portfolio.
+
+    Beta is measured against the portfolio when one is given, otherwise
+    against the first instrument.
+
+    Args:
+        security_data: Mapping of security to a date indexed DataFrame with a 'value' column
+        portfolio: Portfolio DataFrame with a 'portfolio_value' column
+        windows: Window lengths in observations
+
+    Returns:
+        Dict[int, RollingAnalytics]: Analytics per window length
+    """
+    dates, names, prices, first_dates = instrument_matrix(security_data, portfolio)
+    return {
+        window: RollingAnalytics.from_prices(dates, prices, names, window, first_dates=first_dates)
+        for window in windows
+    }
@@ -0,0 +1,61 @@
+"""
+Downsampling of time series for charting.
+File: src/utils/downsampling.py
+"""
+
+import numpy as np
+
+
+def minmax_indices(values: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Select the points of a series worth drawing at a given resolution.
+
+    The series is cut into equal buckets and the minimum and maximum of
+    each are kept, together with the first and last point. Peaks and
+    troughs, and so drawdowns, survive exactly; at most 2 * buckets + 2
+    points remain.
+
+    Args:
+        values: Series values; NaNs are allowed
+        buckets: Number of buckets, typically the chart width in pixels
+
+    Returns:
+        np.ndarray: Sorted positions of the points to keep
+    """
+    n = len(values)
+    if n <= 2 * buckets + 2:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(buckets, size)
+    nan = np.isnan(blocks)
+    lows = np.argmin(np.where(nan, np.inf, blocks), axis=1)
+    highs = np.argmax(np.where(nan, -np.inf, blocks), axis=1)
+
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate([[0, n - 1], offsets + lows, offsets + highs])
+    return np.unique(keep[keep < n])
+
+
+def downsample(x: np.ndarray, y: np.ndarray, buckets: int, x_range=None):
+    """
+    Downsample a series, optionally restricted to a visible range.
+
+    Args:
+        x: Sorted x values (e.g. datetime64 dates)
+        y: Series values
+        buckets: Number of buckets, typically the chart width in pixels
+        x_range: Optional (start, end) of the visible range; one point on
+            each side is kept so lines run to the edges of the chart
+
+    Returns:
+        Tuple of the kept x and y values
+    """
+    if x_range is not None:
+        start = max(np.searchsorted(x, x_range[0], side="left") - 1, 0)
+        end = min(np.searchsorted(x, x_range[1], side="right") + 1, len(x))
+        x, y = x[start:end], y[start:end]
+    keep = minmax_indices(y, buckets)
+    return x[keep], y[keep]
@@ -0,0 +1,168 @@
+"""
+Look-through exposure aggregation for portfolio holdings.
+File: src/utils/exposures.py
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Bulk fields with fund breakdowns per exposure dimension, in order of
+# preference, and the scalar fields or holding keys used for direct holdings
+EXPOSURE_DIMENSIONS = {
+    "sector": {
+        "breakdowns": ["HB_INDUSTRY_SECTOR_ALLOCATION", "FUND_SECTOR_ALLOCATION"],
+        "fields": ["GICS_SECTOR_NAME"],
+        "keys": ["sector"],
+    },
+    "region": {
+        "breakdowns": ["FUND_REGION_BREAKDOWN", "FUND_GEO_ALLOCATION"],
+        "fields": ["COUNTRY_OF_DOMICILE"],
+        "keys": ["region", "country"],
+    },
+    "currency": {
+        "breakdowns": ["FUND_CURRENCY_BREAKDOWN"],
+        "fields": ["CRNCY"],
+        "keys": ["currency"],
+    },
+    "asset_class": {
+        "breakdowns": ["FUND_HOLDING_CLASS_LONG"],
+        "fields": ["SECURITY_TYP"],
+        "keys": ["asset_class"],
+    },
+}
+
+LOOKTHROUGH_FIELDS = sorted({
+    field for spec in EXPOSURE_DIMENSIONS.values() for field in spec["breakdowns"] + spec["fields"]
+})
+
+OTHER = "Other"
+
+
+def breakdown_weights(table: pd.DataFrame) -> Optional[pd.Series]:
+    """
+    Read a fund breakdown into category weights that sum to one.
+
+    The category is the first text column and the weight (in percent of
+    the fund) the first numeric column. Any unallocated remainder is
+    assigned to 'Other'.
+
+    Args:
+        table: Decoded bulk field
+
+    Returns:
+        Optional[pd.Series]: Weights by category, or None if unusable
+    """
+    if table is None or table.empty:
+        return None
+    labels = next((c for c in table.columns if table[c].dtype == object), None)
+    values = next((c for c in table.columns if pd.api.types.is_numeric_dtype(table[c])), None)
+    if labels is None or values is None:
+        return None
+
+    weights = table.groupby(labels)[values].sum() / 100.0
+    total = weights.sum()
+    if total <= 0:
+        return None
+    if total > 1:
+        weights /= total
+    elif total < 1 - 1e-6:
+        weights[OTHER] = weights.get(OTHER, 0.0) + 1 - total
+    return weights
+
+
+class ExposureEngine:
+    """
+    Maps portfolio weights to sector, region, currency and asset class
+    exposures.
+
+    Each holding is a row of one sparse (holdings x categories) matrix
+    whose column blocks are the exposure dimensions. Funds spread across
+    the categories of their look-through breakdown; direct holdings put
+    their whole weight on a single category. Exposures for any weight
+    vector are then one sparse matrix-vector product.
+    """
+
+    def __init__(self, securities: List[str], reference_data: Dict[str, Dict[str, Any]],
+                 holdings_info: Optional[Dict[str, Dict]] = None):
+        """
+        Build the exposure matrix.
+
+        Args:
+            securities: Holdings in weight vector order
+            reference_data: Reference values by security and field, bulk
+                fields as DataFrames
+            holdings_info: Optional holding attributes (e.g. 'sector',
+                'region') used when no reference data is available
+        """
+        self.securities = list(securities)
+        holdings_info = holdings_info or {}
+
+        rows, cols, data = [], [], []
+        self.categories: Dict[str, List[str]] = {}
+        self._offsets: Dict[str, int] = {}
+        offset = 0
+        for dimension, spec in EXPOSURE_DIMENSIONS.items():
+            index: Dict[str, int] = {}
+            for i, security in enumerate(self.securities):
+                weights = self._classify(spec, reference_data.get(security, {}), holdings_info.get(security, {}))
+                for category, weight in weights.items():
+                    column = index.setdefault(str(category), len(index))
+                    rows.append(i)
+                    cols.append(offset + column)
+                    data.append(weight)
+            self.categories[dimension] = list(index)
+            self._offsets[dimension] = offset
+            offset += len(index)
+
+        self.matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(self.securities), offset))
+        # Transposed once so that each product is a row-major mat-vec
+        self._matrix_t = self.matrix.T.tocsr()
+
+    def exposures(self, weights) -> Dict[str, pd.Series]:
+        """
+        Compute exposures for a weight vector.
+
+        Args:
+            weights: Holding weights in security order, or a mapping of
+                security to weight (e.g. market values)
+
+        Returns:
+            Dict[str, pd.Series]: Exposure by category for each dimension,
+            as fractions of the total weight, largest first
+        """
+        if isinstance(weights, dict):
+            weights = [weights.get(security, 0.0) for security in self.securities]
+        weights = np.asarray(weights, dtype="float64")
+        total = weights.sum()
+        if total != 0:
+            weights = weights / total
+
+        flat = self._matrix_t @ weights
+        result = {}
+        for dimension, categories in self.categories.items():
+            start = self._offsets[dimension]
+            series = pd.Series(flat[start:start + len(categories)], index=categories)
+            result[dimension] = series[series.abs() > 1e-12].sort_values(ascending=False)
+        return result
+
+    def _classify(self, spec: Dict, values: Dict[str, Any], info: Dict) -> Dict[str, float]:
+        """Return category weights of one holding for one dimension."""
+        for field in spec["breakdowns"]:
+            table = values.get(field)
+            if isinstance(table, pd.DataFrame):
+                weights = breakdown_weights(table)
+                if weights is not None:
+                    return weights.to_dict()
+        for field in spec["fields"]:
+            if values.get(field):
+                return {values[field]: 1.0}
+        for key in spec["keys"]:
+            if info.get(key):
+                return {info[key]: 1.0}
+        return {OTHER: 1.0}
@@ -0,0 +1,38 @@
+"""
+Display formatting helpers.
+File: src/utils/formatters.py
+"""
+
+import math
+
+
+def format_percent(value: float, decimals: int = 2) -> str:
+    """
+    Format a fraction as a percentage.
+
+    Args:
+        value: Fraction, e.g. 0.0123 for 1.23%
+        decimals: Number of decimal places
+
+    Returns:
+        str: Formatted percentage, or '-' for missing values
+    """
+    if value is None or math.isnan(value):
+        return "-"
+    return f"{value * 100:.{decimals}f}%"
+
+
+def format_ratio(value: float, decimals: int = 2) -> str:
+    """
+    Format a ratio such as the Sharpe ratio.
+
+    Args:
+        value: Ratio
+        decimals: Number of decimal places
+
+    Returns:
+        str: Formatted ratio, or '-' for missing values
+    """
+    if value is None or math.isnan(value):
+        return "-"
+    return f"{value:.{decimals}f}"
@@ -0,0 +1,181 @@
+"""
+Vectorized portfolio time series calculations.
+File: src/utils/portfolio_engine.py
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REBALANCE_FREQUENCIES = ["none", "daily", "monthly", "quarterly"]
+
+
+def align_prices(security_data: Dict[str, pd.DataFrame], column: str = "value") -> Tuple[pd.DatetimeIndex, List[str], np.ndarray]:
+    """
+    Align a set of price series into one dates x securities matrix.
+
+    Missing values are forward filled; values before a security's first
+    observation are back filled so that it is held flat until it starts
+    trading.
+
+    Args:
+        security_data: Mapping of security to a date indexed DataFrame
+        column: Column holding the prices
+
+    Returns:
+        Tuple of the union date index, the security order and a float64
+        price matrix of shape (dates, securities)
+    """
+    securities = list(security_data.keys())
+    date_arrays = [np.asarray(security_data[s].index.values, dtype="datetime64[ns]") for s in securities]
+    if not date_arrays:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0))
+
+    # Securities mostly share a handful of calendars, so the union and the
+    # row lookups are only computed once per distinct calendar
+    distinct = []
+    by_shape: Dict[tuple, List[int]] = {}
+    calendar_of = []
+    for dates in date_arrays:
+        shape = (len(dates), dates[0], dates[-1]) if len(dates) else (0,)
+        candidates = by_shape.setdefault(shape, [])
+        match = next((i for i in candidates if np.array_equal(distinct[i], dates)), None)
+        if match is None:
+            match = len(distinct)
+            distinct.append(dates)
+            candidates.append(match)
+        calendar_of.append(match)
+    all_dates = distinct[0] if len(distinct) == 1 else np.unique(np.concatenate(distinct))
+    calendar_rows = [np.searchsorted(all_dates, dates) for dates in distinct]
+
+    # Column-major so that each security is written to contiguous memory
+    prices = np.full((len(all_dates), len(securities)), np.nan, order="F")
+    for j, security in enumerate(securities):
+        frame = security_data[security]
+        rows = slice(None) if len(distinct) == 1 else calendar_rows[calendar_of[j]]
+        prices[rows, j] = frame.to_numpy(dtype="float64")[:, frame.columns.get_loc(column)]
+
+    return pd.DatetimeIndex(all_dates), securities, fill_gaps(prices)
+
+
+def fill_gaps(prices: np.ndarray) -> np.ndarray:
+    """
+    Forward fill NaNs down each column, then back fill leading NaNs.
+
+    Args:
+        prices: Matrix of shape (dates, securities)
+
+    Returns:
+        np.ndarray: Filled matrix (columns without any value stay NaN)
+    """
+    valid = ~np.isnan(prices)
+    gaps = ~valid.all(axis=0)
+    if prices.size == 0 or not gaps.any():
+        return prices
+
+    # Only columns that actually contain gaps are touched
+    subset, valid = prices[:, gaps], valid[:, gaps]
+    rows = np.arange(prices.shape[0])[:, None]
+    last_valid = np.maximum.accumulate(np.where(valid, rows, 0), axis=0)
+    filled = np.take_along_axis(subset, last_valid, axis=0)
+    first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+    leading = rows < first_valid
+    prices = prices.copy(order="F")
+    prices[:, gaps] = np.where(leading, filled[first_valid, np.arange(subset.shape[1])], filled)
+    return prices
+
+
+def rebalance_points(dates: pd.DatetimeIndex, frequency: str = "none") -> np.ndarray:
+    """
+    Return the row positions at which the portfolio is rebalanced.
+
+    Args:
+        dates: Sorted date index of the price matrix
+        frequency: 'none' (buy and hold), 'daily', 'monthly' or 'quarterly'
+
+    Returns:
+        np.ndarray: Sorted row positions, always starting with 0
+    """
+    if len(dates) == 0:
+        return np.empty(0, dtype=np.int64)
+    if frequency == "daily":
+        return np.arange(len(dates))
+    if frequency == "monthly":
+        period = dates.year * 12 + dates.month
+    elif frequency == "quarterly":
+        period = dates.year * 4 + (dates.month - 1) // 3
+    else:
+        return np.zeros(1, dtype=np.int64)
+    period = np.asarray(period)
+    return np.concatenate([[0], np.flatnonzero(np.diff(period)) + 1])
+
+
+def compute_portfolio(prices: np.ndarray, weights: np.ndarray, rebalance_idx: np.ndarray, base: float = 100.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute weighted, rebased portfolio values from a price matrix.
+
+    Between rebalancing dates holdings drift with prices; on each
+    rebalancing date they are reset to the target weights.
+
+    Args:
+        prices: Gap free matrix of shape (dates, securities)
+        weights: Target weights as fractions, shape (securities,)
+        rebalance_idx: Sorted row positions of rebalancing dates, starting with 0
+        base: Value of a fully invested portfolio on the first date
+
+    Returns:
+        Tuple of per-security contributions (dates, securities) and
+        portfolio values (dates,)
+    """
+    weights = np.asarray(weights, dtype="float64")
+    total_weight = weights.sum()
+    if prices.size == 0 or total_weight == 0:
+        return np.zeros_like(prices), np.zeros(prices.shape[0])
+
+    # Growth of each completed segment, chained into segment start values
+    start_prices = prices[rebalance_idx]
+    growth = (start_prices[1:] / start_prices[:-1]) @ weights / total_weight
+    segment_value = base * total_weight * np.concatenate([[1.0], np.cumprod(growth)])
+
+    # Units held in each segment; every row is priced with its segment's units
+    units = weights * (segment_value / total_weight)[:, None] / start_prices
+    if len(rebalance_idx) > 1:
+        segment = np.searchsorted(rebalance_idx, np.arange(prices.shape[0]), side="right") - 1
+        units = units[segment]
+
+    contributions = prices * units
+    return contributions, contributions.sum(axis=1)
+
+
+def calculate_portfolio_timeseries(security_data: Dict[str, pd.DataFrame], weights: Dict[str, float], rebalance: str = "none") -> pd.DataFrame:
+    """
+    Calculate weighted portfolio timeseries with rebased values.
+
+    Each security is rebased to 100 at the start date and weighted, so the
+    sum of the security columns is the portfolio value.
+
+    Args:
+        security_data: Mapping of security to a date indexed DataFrame with a 'value' column
+        weights: Dictionary mapping securities to their weights (in percent)
+        rebalance: Rebalancing frequency, one of REBALANCE_FREQUENCIES
+
+    Returns:
+        pd.DataFrame: One column per weighted security plus 'portfolio_value'
+    """
+    missing = [s for s in security_data if s not in weights]
+    if missing:
+        logger.warning(f"Securities {missing} not found in weights dictionary {weights}")
+    data = {s: df for s, df in security_data.items() if s in weights}
+
+    dates, securities, prices = align_prices(data)
+    weight_vector = np.array([weights[s] / 100.0 for s in securities])
+    contributions, values = compute_portfolio(prices, weight_vector, rebalance_points(dates, rebalance))
+
+    portfolio_df = pd.DataFrame(contributions, index=dates, columns=securities)
+    portfolio_df["portfolio_value"] = values
+    logger.info(f"Portfolio calculation complete. Shape: {portfolio_df.shape}, rebalancing: {rebalance}")
+    return portfolio_df
@@ -0,0 +1,272 @@
+"""
+Incremental positions, cost basis and P&L from a trade ledger.
+File: src/utils/position_engine.py
+"""
+
+import bisect
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.fx_engine import split_currency
+
+logger = logging.getLogger(__name__)
+
+COST_METHODS = ["average", "fifo"]
+
+# Quantities smaller than this are treated as a closed position
+QUANTITY_EPSILON = 1e-9
+
+
+def trade_key(trade: Dict[str, Any]):
+    """Order of trades in the ledger: trade date, then id."""
+    return (str(trade["trade_date"]), trade.get("id") or 0)
+
+
+class Position:
+    """
+    Running position of one security.
+
+    The quantity, average cost and FIFO lots are updated trade by trade.
+    Prices, costs and realised P&L are in the quote currency of the
+    security (e.g. GBp); the _usd amounts convert each trade at its own
+    fx_rate. Fees are part of the cost of buys and reduce the proceeds of
+    sales. Selling more than is held opens a short position.
+    """
+
+    __slots__ = (
+        "ticker", "currency", "quantity", "cost", "cost_usd", "realised", "realised_usd",
+        "lots", "fifo_cost", "fifo_cost_usd", "fifo_realised", "fifo_realised_usd",
+        "last_price", "last_fx_rate", "trades", "_keys",
+    )
+
+    def __init__(self, ticker: str, currency: str = "USD"):
+        self.ticker = ticker
+        self.currency = currency
+        self.trades: List[Dict[str, Any]] = []
+        self._keys = []
+        self._reset()
+
+    def _reset(self):
+        self.quantity = 0.0
+        # Average cost basis of the open quantity and P&L realised against it
+        self.cost = self.cost_usd = 0.0
+        self.realised = self.realised_usd = 0.0
+        # Open lots, oldest first: [quantity, unit cost, unit cost in USD, trade date]
+        self.lots = deque()
+        self.fifo_cost = self.fifo_cost_usd = 0.0
+        self.fifo_realised = self.fifo_realised_usd = 0.0
+        self.last_price = self.last_fx_rate = None
+
+    def apply(self, trade: Dict[str, Any]):
+        """
+        Add a trade to the position.
+
+        Trades in ledger order update the running state directly. A trade
+        dated before the last one applied replays the trades of this
+        position only.
+
+        Args:
+            trade: Dict with trade_date, quantity (negative for sales), price
+                and optionally id, fx_rate and fees
+        """
+        key = trade_key(trade)
+        if self._keys and key < self._keys[-1]:
+            index = bisect.bisect_right(self._keys, key)
+            self._keys.insert(index, key)
+            self.trades.insert(index, trade)
+            self._reset()
+            for earlier in self.trades:
+                self._update(earlier)
+            return
+        self._keys.append(key)
+        self.trades.append(trade)
+        self._update(trade)
+
+    def _update(self, trade: Dict[str, Any]):
+        quantity = float(trade["quantity"])
+        price = float(trade["price"])
+        fx_rate = float(trade.get("fx_rate") or 1.0)
+        self.last_price, self.last_fx_rate = price, fx_rate
+        if abs(quantity) < QUANTITY_EPSILON:
+            return
+        unit = price + float(trade.get("fees") or 0) / quantity
+        unit_usd = unit * fx_rate
+
+        # Average cost: a trade against the position realises P&L on the
+        # quantity it closes at the average cost, any excess opens at its price
+        opened = quantity
+        if self.quantity and (self.quantity > 0) != (quantity > 0):
+            closed = -quantity if abs(quantity) <= abs(self.quantity) else self.quantity
+            average, average_usd = self.cost / self.quantity, self.cost_usd / self.quantity
+            self.realised += closed * (unit - average)
+            self.realised_usd += closed * (unit_usd - average_usd)
+            self.quantity -= closed
+            self.cost -= closed * average
+            self.cost_usd -= closed * average_usd
+            opened = quantity + closed
+            if abs(self.quantity) < QUANTITY_EPSILON:
+                self.quantity = self.cost = self.cost_usd = 0.0
+        if abs(opened) >= QUANTITY_EPSILON:
+            self.quantity += opened
+            self.cost += opened * unit
+            self.cost_usd += opened * unit_usd
+
+        # FIFO: consume the oldest opposite lots; each lot is consumed once,
+        # so a trade costs amortized O(1)
+        remaining = quantity
+        lots = self.lots
+        while lots and abs(remaining) >= QUANTITY_EPSILON and (lots[0][0] > 0) != (remaining > 0):
+            lot = lots[0]
+            taken = lot[0] if abs(lot[0]) <= abs(remaining) else -remaining
+            self.fifo_realised += taken * (unit - lot[1])
+            self.fifo_realised_usd += taken * (unit_usd - lot[2])
+            self.fifo_cost -= taken * lot[1]
+            self.fifo_cost_usd -= taken * lot[2]
+            lot[0] -= taken
+            remaining += taken
+            if abs(lot[0]) < QUANTITY_EPSILON:
+                lots.popleft()
+        if not lots:
+            self.fifo_cost = self.fifo_cost_usd = 0.0
+        if abs(remaining) >= QUANTITY_EPSILON:
+            lots.append([remaining, unit, unit_usd, str(trade["trade_date"])])
+            self.fifo_cost += remaining * unit
+            self.fifo_cost_usd += remaining * unit_usd
+
+    def trades_since(self, trade_date: str) -> List[Dict[str, Any]]:
+        """Trades dated on or after a day (ISO date), found by bisection."""
+        return self.trades[bisect.bisect_left(self._keys, (trade_date,)):]
+
+    def open_lots(self) -> List[Dict[str, Any]]:
+        """FIFO lots still open, oldest first."""
+        return [
+            {"trade_date": lot[3], "quantity": lot[0], "unit_cost": lot[1], "unit_cost_usd": lot[2]}
+            for lot in self.lots
+        ]
+
+
+class PositionEngine:
+    """
+    Positions of a portfolio, maintained incrementally from its trades.
+
+    Appending a trade updates only the position of its security, without
+    replaying the ledger. P&L for all positions is computed in one
+    vectorized pass by valuation().
+    """
+
+    def __init__(self, trades: Optional[Iterable[Dict[str, Any]]] = None,
+                 currencies: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            trades: Trades to start from, in any order
+            currencies: Quote currency by ticker, for trades without one
+        """
+        self._positions: Dict[str, Position] = {}
+        self._currencies = dict(currencies or {})
+        self.trade_count = 0
+        if trades:
+            self.apply_many(sorted(trades, key=trade_key))
+
+    def apply(self, trade: Dict[str, Any]) -> Position:
+        """
+        Add one trade.
+
+        Returns:
+            Position: The updated position of the trade's security
+        """
+        ticker = trade["ticker"]
+        position = self._positions.get(ticker)
+        if position is None:
+            currency = trade.get("currency") or self._currencies.get(ticker) or "USD"
+            position = self._positions[ticker] = Position(ticker, currency)
+        position.apply(trade)
+        self.trade_count += 1
+        return position
+
+    def apply_many(self, trades: Iterable[Dict[str, Any]]):
+        """Add trades in the order given."""
+        for trade in trades:
+            self.apply(trade)
+
+    def position(self, ticker: str) -> Optional[Position]:
+        """Position of a security, if it was ever traded."""
+        return self._positions.get(ticker)
+
+    def positions(self, open_only: bool = False) -> List[Position]:
+        """Positions in the order their securities were first traded."""
+        positions = list(self._positions.values())
+        if open_only:
+            positions = [p for p in positions if abs(p.quantity) >= QUANTITY_EPSILON]
+        return positions
+
+    def valuation(self, prices: Optional[Dict[str, float]] = None,
+                  fx_rates: Optional[Dict[str, float]] = None,
+                  method: str = "average", open_only: bool = True) -> pd.DataFrame:
+        """
+        Value the positions and compute their P&L.
+
+        Args:
+            prices: Current price by ticker in the quote currency; positions
+                without one are valued at their last trade price
+            fx_rates: USD per quoted unit by currency; currencies without one
+                use the rate of the position's last trade
+            method: Cost basis method, 'average' or 'fifo'
+            open_only: Leave out closed positions
+
+        Returns:
+            pd.DataFrame: One row per position, indexed by ticker, with
+            quantity, avg_cost, avg_fx_rate, current_price, fx_rate,
+            market_value and cost_basis (USD), pnl_local (in the major
+            currency), pnl_usd, pnl_percent, realised_local, realised_usd and
+            weight (percent of total market value)
+        """
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown cost method: {method}")
+        prices = prices or {}
+        fx_rates = fx_rates or {}
+        positions = self.positions(open_only)
+        count = len(positions)
+        fifo = method == "fifo"
+
+        def column(values):
+            return np.fromiter(values, dtype=np.float64, count=count)
+
+        quantity = column(p.quantity for p in positions)
+        cost = column((p.fifo_cost if fifo else p.cost) for p in positions)
+        cost_usd = column((p.fifo_cost_usd if fifo else p.cost_usd) for p in positions)
+        realised = column((p.fifo_realised if fifo else p.realised) for p in positions)
+        realised_usd = column((p.fifo_realised_usd if fifo else p.realised_usd) for p in positions)
+        price = column(prices.get(p.ticker, p.last_price) for p in positions)
+        fx_rate = column(fx_rates.get(p.currency, p.last_fx_rate) for p in positions)
+        scale = column(split_currency(p.currency)[1] for p in positions)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            open_ = np.abs(quantity) >= QUANTITY_EPSILON
+            avg_cost = np.where(open_, cost / quantity, 0.0)
+            avg_fx_rate = np.where(cost != 0, cost_usd / cost, fx_rate)
+            value = quantity * price
+            market_value = value * fx_rate
+            pnl_percent = np.where(avg_cost != 0, (price / avg_cost - 1) * 100 * np.sign(quantity), 0.0)
+            total = np.abs(market_value).sum()
+            weight = market_value / total * 100 if total else np.zeros(count)
+
+        return pd.DataFrame({
+            "currency": [p.currency for p in positions],
+            "quantity": quantity,
+            "avg_cost": avg_cost,
+            "avg_fx_rate": avg_fx_rate,
+            "current_price": price,
+            "fx_rate": fx_rate,
+            "market_value": market_value,
+            "cost_basis": cost_usd,
+            "pnl_local": (value - cost) * scale,
+            "pnl_usd": market_value - cost_usd,
+            "pnl_percent": pnl_percent,
+            "realised_local": realised * scale,
+            "realised_usd": realised_usd,
+            "weight": weight,
+        }, index=pd.Index([p.ticker for p in positions], name="ticker"))
@@ -0,0 +1,120 @@
+"""
+Vectorized daily valuation of a trade ledger: values, flows, TWR and MWR.
+File: src/utils/valuation_engine.py
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Days per year of the annualized money-weighted return
+DAYS_PER_YEAR = 365.25
+
+
+def ledger_arrays(trades: List[Dict[str, Any]], tickers: List[str], index: pd.DatetimeIndex,
+                  opening: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily quantities held and net flows of a ledger.
+
+    Trades count from their trade date, or the next date of the index if
+    that is not in it (e.g. a weekend); trades before the first date count
+    on the first date and trades after the last one are left out.
+
+    Args:
+        trades: Dicts with ticker, trade_date, quantity, price and
+            optionally fx_rate (USD per quoted unit) and fees
+        tickers: Column order of the quantities
+        index: Dates to return
+        opening: Quantities held before the trades given, zero if None
+
+    Returns:
+        Tuple of the (dates x tickers) quantities at the close of each date
+        and the USD amount invested on each date (negative for sales)
+    """
+    columns = {ticker: i for i, ticker in enumerate(tickers)}
+    count = len(trades)
+    column = np.fromiter((columns[t["ticker"]] for t in trades), dtype=np.int64, count=count)
+    quantity = np.fromiter((float(t["quantity"]) for t in trades), dtype=np.float64, count=count)
+    price = np.fromiter((float(t["price"]) for t in trades), dtype=np.float64, count=count)
+    fees = np.fromiter((float(t.get("fees") or 0) for t in trades), dtype=np.float64, count=count)
+    fx_rate = np.fromiter((float(t.get("fx_rate") or 1.0) for t in trades), dtype=np.float64, count=count)
+    dates = pd.DatetimeIndex([str(t["trade_date"]) for t in trades]).values.astype("datetime64[D]")
+
+    row = np.searchsorted(index.values.astype("datetime64[D]"), dates, side="left")
+    opening = np.zeros(len(tickers)) if opening is None else np.asarray(opening, dtype=np.float64)
+
+    inside = row < len(index)
+    changes = np.zeros((len(index), len(tickers)))
+    np.add.at(changes, (row[inside], column[inside]), quantity[inside])
+    flows = np.zeros(len(index))
+    np.add.at(flows, row[inside], ((quantity * price + fees) * fx_rate)[inside])
+
+    return opening + np.cumsum(changes, axis=0), flows
+
+
+def time_weighted_returns(values: np.ndarray, flows: np.ndarray, opening_value: float = 0.0) -> np.ndarray:
+    """
+    Daily time-weighted returns.
+
+    Flows are assumed to happen at the start of the day they are booked,
+    so the return of a day is its gain over the opening value plus the
+    day's flows. Days without capital at risk have a zero return.
+
+    Args:
+        values: Market value at the close of each day
+        flows: Net amount invested on each day
+        opening_value: Market value at the close of the day before the first
+
+    Returns:
+        np.ndarray: Return of each day
+    """
+    previous = np.concatenate(([opening_value], values[:-1]))
+    invested = previous + flows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = (values - invested) / invested
+    return np.where(np.abs(invested) > 1e-9, returns, 0.0)
+
+
+def money_weighted_return(dates: pd.DatetimeIndex, flows: np.ndarray, end_date: pd.Timestamp,
+                          end_value: float) -> Optional[float]:
+    """
+    Annualized money-weighted return (IRR) of a series of flows.
+
+    Solves sum(flow * (1 + r) ** (years to end_date)) = end_value by
+    bisection, evaluating all flows at once for each candidate rate.
+
+    Args:
+        dates: Dates of the flows
+        flows: Amounts invested (negative for withdrawals)
+        end_date: Valuation date
+        end_value: Market value on the valuation date
+
+    Returns:
+        Optional[float]: The annual rate, or None if there are no flows or
+        no rate matches
+    """
+    invested = flows != 0
+    if not invested.any():
+        return None
+    years = ((pd.Timestamp(end_date) - dates[invested]).days.to_numpy() / DAYS_PER_YEAR)
+    amounts = flows[invested]
+
+    def surplus(rate):
+        return end_value - np.sum(amounts * np.power(1.0 + rate, years))
+
+    low, high = -0.9999, 100.0
+    if np.sign(surplus(low)) == np.sign(surplus(high)):
+        return None
+    for _ in range(200):
+        middle = (low + high) / 2
+        if np.sign(surplus(middle)) == np.sign(surplus(low)):
+            low = middle
+        else:
+            high = middle
+        if high - low < 1e-10:
+            break
+    return (low + high) / 2